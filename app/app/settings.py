@@ -49,6 +49,8 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "user",
     "recipe",
+    "job",
+    "batch",
 ]
 
 MIDDLEWARE = [
@@ -59,6 +61,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.ReadYourWritesMiddleware",
 ]
 
 ROOT_URLCONF = "app.urls"
@@ -87,11 +90,84 @@ WSGI_APPLICATION = "app.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        # postgresql backend with CONN_HEALTH_CHECKS support
+        "ENGINE": "core.backends.postgresql",
         "HOST": os.environ.get("DB_HOST"),
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        # keep connections open between requests for this many seconds,
+        # 0 opens a new connection per request
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        # ping a reused connection before its first query in a request
+        "CONN_HEALTH_CHECKS": bool(
+            int(os.environ.get("DB_CONN_HEALTH_CHECKS", 1))
+        ),
+    }
+}
+
+# Behind a transaction pooler (e.g. pgbouncer pool_mode=transaction) the
+# server connection can change between transactions, so server side cursors
+# can't be used. The database default timezone must be UTC as well (checked
+# by `migrate`, see core.checks): the SET Django would run otherwise stays on
+# the pooled server connection.
+DB_POOL_MODE = os.environ.get("DB_POOL_MODE", "session")
+if DB_POOL_MODE == "transaction":
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+# Optional read replica, safe requests read from it unless the client wrote
+# within the last REPLICA_STICKY_SECONDS. To try it locally point
+# DB_REPLICA_HOST (and DB_REPLICA_NAME) at a second database.
+if os.environ.get("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.environ.get("DB_REPLICA_HOST"),
+        "NAME": os.environ.get("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        # tests run against the primary
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Optional user sharding, DB_SHARDS lists extra shards as name@host pairs
+# (host defaults to DB_HOST). Recipes, tags and ingredients of a user live
+# on one of SHARD_DATABASES, see core.sharding.
+SHARD_DATABASES = ["default"]
+for index, shard in enumerate(
+    filter(None, os.environ.get("DB_SHARDS", "").split(",")), start=1
+):
+    name, _, host = shard.partition("@")
+    DATABASES[f"shard_{index}"] = {
+        **DATABASES["default"],
+        "NAME": name,
+        "HOST": host or DATABASES["default"]["HOST"],
+    }
+    SHARD_DATABASES.append(f"shard_{index}")
+
+DATABASE_ROUTERS = [
+    "core.routers.ShardRouter",
+    "core.routers.PrimaryReplicaRouter",
+]
+
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# read-your-writes pinning of token clients, facet and autocomplete
+# invalidation rely on a backend shared by all uWSGI workers and the job
+# worker: docker-compose-deploy.yml runs redis
+# (CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# CACHE_LOCATION=redis://cache:6379/0), LocMem is for development
+
+# uWSGI processes serving requests (scripts/run.sh), more than one needs a
+# shared backend (checked at startup, see core.checks)
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", 1))
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
     }
 }
 
@@ -137,6 +213,63 @@ MEDIA_URL = "/static/media/"
 STATIC_ROOT = "/vol/web/static"
 MEDIA_ROOT = "/vol/web/media"
 
+# Recipe image uploads
+# keep in line with client_max_body_size in proxy/default.conf.tpl
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get("RECIPE_IMAGE_MAX_UPLOAD_SIZE", 10 * 1024 * 1024)
+)
+# limit of a whole batch upload request, see location in proxy config
+RECIPE_IMAGE_BATCH_MAX_UPLOAD_SIZE = int(
+    os.environ.get("RECIPE_IMAGE_BATCH_MAX_UPLOAD_SIZE", 100 * 1024 * 1024)
+)
+# images declaring more pixels are rejected before being decoded
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get("RECIPE_IMAGE_MAX_PIXELS", 25_000_000)
+)
+# chunked upload sessions, parts are kept outside of MEDIA_ROOT
+RECIPE_UPLOAD_CHUNK_SIZE = int(
+    os.environ.get("RECIPE_UPLOAD_CHUNK_SIZE", 1024 * 1024)
+)
+RECIPE_UPLOAD_SESSION_ROOT = os.environ.get(
+    "RECIPE_UPLOAD_SESSION_ROOT", "/vol/web/upload_sessions"
+)
+# unfinished sessions and their chunks are deleted after this many seconds
+RECIPE_UPLOAD_SESSION_TTL = int(
+    os.environ.get("RECIPE_UPLOAD_SESSION_TTL", 24 * 3600)
+)
+
+# facet counts are cached per user until their recipes change
+RECIPE_FACETS_CACHE_TIMEOUT = int(
+    os.environ.get("RECIPE_FACETS_CACHE_TIMEOUT", 300)
+)
+# entries of the in-process tag/ingredient autocomplete cache
+RECIPE_AUTOCOMPLETE_CACHE_SIZE = int(
+    os.environ.get("RECIPE_AUTOCOMPLETE_CACHE_SIZE", 10000)
+)
+# and seconds they are served for, even without a version bump
+RECIPE_AUTOCOMPLETE_CACHE_TTL = float(
+    os.environ.get("RECIPE_AUTOCOMPLETE_CACHE_TTL", 60)
+)
+# recipe views are counted in memory and written every this many seconds
+# by each process (recipe.popularity)
+RECIPE_VIEWS_FLUSH_INTERVAL = float(
+    os.environ.get("RECIPE_VIEWS_FLUSH_INTERVAL", 10)
+)
+# a view counts half as much in the trending score after this many seconds
+RECIPE_TRENDING_HALF_LIFE = int(
+    os.environ.get("RECIPE_TRENDING_HALF_LIFE", 3 * 24 * 3600)
+)
+
+# Background jobs (core.jobs, run by `manage.py run_worker`)
+JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", 1))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1))
+# defaults of tasks not setting their own, timeout in seconds
+JOB_TIMEOUT = int(os.environ.get("JOB_TIMEOUT", 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+# failed attempt n is retried after BACKOFF * 2 ** (n - 1) seconds, capped
+JOB_RETRY_BACKOFF = int(os.environ.get("JOB_RETRY_BACKOFF", 10))
+JOB_RETRY_BACKOFF_MAX = int(os.environ.get("JOB_RETRY_BACKOFF_MAX", 3600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
@@ -24,7 +24,13 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from core.admin import shard_sites
+
 urlpatterns = [
+    *[
+        path(f"admin/shards/{alias}/", site.urls)
+        for alias, site in shard_sites.items()
+    ],
     path("admin/", admin.site.urls),
     path("api/schema/", SpectacularAPIView.as_view(), name="api-schema"),
     path(
@@ -34,6 +40,8 @@ urlpatterns = [
     ),
     path("api/user/", include("user.urls")),
     path("api/recipe/", include("recipe.urls")),
+    path("api/job/", include("job.urls")),
+    path("api/batch/", include("batch.urls")),
 ]
 
 # By default django development server doesn't serve media files.
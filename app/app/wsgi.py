@@ -10,7 +10,13 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.db import connections
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
 
 application = get_wsgi_application()
+
+# uWSGI loads the application in the master then forks the workers (no
+# --lazy-apps in scripts/run.sh). Close any connection opened while loading
+# so workers never share a database socket inherited from the master.
+connections.close_all()
@@ -0,0 +1,136 @@
+"""
+Batched API requests.
+
+Each sub-request is built from the batch request, with its own method, path
+and JSON body, and passed to the view its path resolves to in the URLconf,
+without going through the middleware again. The user and token the batch
+request was authenticated with are forced on the sub-requests (the hook DRF
+offers for tests), so each view checks its permissions without looking the
+token up again.
+
+With atomic, the sub-requests run in one transaction on the user's shard
+(and `default`, holding users): the first one failing stops the batch and
+rolls the earlier ones back. A sub-view raising an exception DRF doesn't
+handle fails its sub-request with a 500 rather than the whole batch. When
+they are all reads, the transaction is a
+REPEATABLE READ snapshot, the responses agree with each other even while
+the data changes.
+"""
+import io
+import json
+import logging
+from contextlib import ExitStack
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+
+from core.middleware import SAFE_METHODS
+from core.sharding import shard_for_user
+
+logger = logging.getLogger(__name__)
+
+# at most this many sub-requests per batch
+MAX_BATCH_SIZE = 20
+
+# paths a sub-request may resolve to
+API_PREFIX = "/api/"
+
+
+def _sub_request(request, method, path, body):
+    """Return a WSGI request for a sub-request of request."""
+    path_info, _, query_string = path.partition("?")
+    payload = b"" if body is None else json.dumps(body).encode()
+    environ = {
+        key: value
+        for key, value in request.META.items()
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH")
+    }
+    environ.update({
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": query_string,
+        "wsgi.input": io.BytesIO(payload),
+        "CONTENT_LENGTH": str(len(payload)),
+    })
+    if body is not None:
+        environ["CONTENT_TYPE"] = "application/json"
+    sub_request = WSGIRequest(environ)
+    sub_request.user = request.user
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def _not_found():
+    return {
+        "status": status.HTTP_404_NOT_FOUND,
+        "body": {"detail": "Not found."},
+    }
+
+
+def dispatch(request, method, path, body=None):
+    """Run one sub-request of request, returning its status and body."""
+    if not path.startswith(API_PREFIX):
+        return _not_found()
+    sub_request = _sub_request(request, method, path, body)
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        return _not_found()
+    if match.view_name == "batch:batch":
+        # batches don't nest
+        return _not_found()
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        # the results of the other sub-requests are kept
+        logger.exception("Batched %s %s failed", method, path)
+        return {
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "body": {"detail": "A server error occurred."},
+        }
+    return {
+        "status": response.status_code,
+        "body": getattr(response, "data", None),
+    }
+
+
+def run_batch(request, sub_requests, atomic=False):
+    """Run the sub_requests of request in order, returning their results.
+
+    sub_requests are dicts of method, path and body. With atomic, the
+    sub-requests after a failed one are not run and get a 424 status.
+    """
+    if not atomic:
+        return [dispatch(request, **sub) for sub in sub_requests]
+
+    read_only = all(sub["method"] in SAFE_METHODS for sub in sub_requests)
+    aliases = dict.fromkeys(["default", shard_for_user(request.user)])
+    results = []
+    with ExitStack() as stack:
+        for alias in aliases:
+            # isolation can only be set by the outermost transaction
+            snapshot = read_only and not connections[alias].in_atomic_block
+            stack.enter_context(transaction.atomic(using=alias))
+            if snapshot:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+        failed = False
+        for sub in sub_requests:
+            if failed:
+                results.append({
+                    "status": status.HTTP_424_FAILED_DEPENDENCY,
+                    "body": {"detail": "Not run, an earlier request failed."},
+                })
+                continue
+            results.append(dispatch(request, **sub))
+            failed = results[-1]["status"] >= 400
+
+        if failed:
+            for alias in aliases:
+                transaction.set_rollback(True, using=alias)
+    return results
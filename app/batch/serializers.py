@@ -0,0 +1,40 @@
+"""
+Serializers for the batch API.
+"""
+from rest_framework import serializers
+
+from batch.dispatch import MAX_BATCH_SIZE
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """One API call of a batch."""
+
+    method = serializers.ChoiceField(
+        choices=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    path = serializers.CharField(
+        help_text="Path and query string, e.g. /api/recipe/tags/")
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of API calls."""
+
+    requests = serializers.ListField(
+        child=SubRequestSerializer(),
+        min_length=1,
+        max_length=MAX_BATCH_SIZE,
+    )
+    atomic = serializers.BooleanField(default=False)
+
+
+class SubResponseSerializer(serializers.Serializer):
+    """Result of one API call of a batch."""
+
+    status = serializers.IntegerField()
+    body = serializers.JSONField(allow_null=True)
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    """Results of a batch, in the order of its requests."""
+
+    responses = SubResponseSerializer(many=True)
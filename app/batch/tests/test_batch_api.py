@@ -0,0 +1,182 @@
+"""
+Tests for the batch API.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+BATCH_URL = reverse("batch:batch")
+
+
+def create_user(email="user@example.com"):
+    return get_user_model().objects.create_user(
+        email=email, password="test123", name="Test Name")
+
+
+class PublicBatchApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to run a batch."""
+        res = APIClient().post(BATCH_URL, {"requests": [
+            {"method": "GET", "path": "/api/user/me/"},
+        ]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_batch(self):
+        """Test the sub-requests run in order with the batch user."""
+        Tag.objects.create(user=create_user("other@example.com"), name="Hot")
+
+        res = self.client.post(BATCH_URL, {"requests": [
+            {"method": "POST", "path": "/api/recipe/recipes/", "body": {
+                "title": "Soup", "time_minutes": 10, "price": "2.50",
+                "tags": [{"name": "Vegan"}],
+            }},
+            {"method": "GET", "path": "/api/user/me/"},
+            {"method": "GET", "path": "/api/recipe/tags/?assigned_only=1"},
+            {"method": "GET", "path": "/api/recipe/recipes/0/"},
+        ]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        responses = res.data["responses"]
+        self.assertEqual(
+            [response["status"] for response in responses],
+            [201, 200, 200, 404],
+        )
+        self.assertEqual(responses[0]["body"]["title"], "Soup")
+        self.assertEqual(responses[1]["body"]["email"], self.user.email)
+        self.assertEqual(
+            [tag["name"] for tag in responses[2]["body"]], ["Vegan"])
+
+    def test_authenticates_once(self):
+        """Test the token is looked up once for all the sub-requests."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(BATCH_URL, {"requests": [
+                {"method": "GET", "path": "/api/user/me/"},
+                {"method": "GET", "path": "/api/recipe/tags/"},
+                {"method": "GET", "path": "/api/recipe/ingredients/"},
+            ]}, format="json")
+
+        token_queries = [
+            query for query in queries
+            if Token._meta.db_table in query["sql"]
+        ]
+        self.assertEqual(len(token_queries), 1)
+
+    def test_rejected_paths(self):
+        """Test paths outside the API, unknown or nested batches fail."""
+        res = self.client.post(BATCH_URL, {"requests": [
+            {"method": "GET", "path": "/admin/"},
+            {"method": "GET", "path": "/api/unknown/"},
+            {"method": "POST", "path": "/api/batch/", "body": {}},
+        ]}, format="json")
+
+        self.assertEqual(
+            [response["status"] for response in res.data["responses"]],
+            [404, 404, 404],
+        )
+
+    def test_batch_size(self):
+        """Test empty and oversized batches are rejected."""
+        me = {"method": "GET", "path": "/api/user/me/"}
+        for requests in ([], [me] * 21):
+            res = self.client.post(
+                BATCH_URL, {"requests": requests}, format="json")
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_atomic_rollback(self):
+        """Test a failed sub-request rolls back the earlier ones."""
+        res = self.client.post(BATCH_URL, {"atomic": True, "requests": [
+            {"method": "POST", "path": "/api/recipe/recipes/", "body": {
+                "title": "Soup", "time_minutes": 10, "price": "2.50",
+            }},
+            {"method": "POST", "path": "/api/recipe/recipes/", "body": {}},
+            {"method": "GET", "path": "/api/user/me/"},
+        ]}, format="json")
+
+        self.assertEqual(
+            [response["status"] for response in res.data["responses"]],
+            [201, 400, 424],
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+    @patch("user.views.ManageUserView.get", side_effect=ValueError)
+    def test_view_exception(self, _):
+        """Test a sub-view raising only fails its sub-request."""
+        soup = {"method": "POST", "path": "/api/recipe/recipes/", "body": {
+            "title": "Soup", "time_minutes": 10, "price": "2.50",
+        }}
+        requests = [
+            soup,
+            {"method": "GET", "path": "/api/user/me/"},
+            {"method": "GET", "path": "/api/recipe/tags/"},
+        ]
+        with self.assertLogs("batch.dispatch", "ERROR"):
+            res = self.client.post(
+                BATCH_URL, {"requests": requests}, format="json")
+
+        self.assertEqual(
+            [response["status"] for response in res.data["responses"]],
+            [201, 500, 200],
+        )
+
+        with self.assertLogs("batch.dispatch", "ERROR"):
+            res = self.client.post(
+                BATCH_URL, {"atomic": True, "requests": requests},
+                format="json")
+
+        self.assertEqual(
+            [response["status"] for response in res.data["responses"]],
+            [201, 500, 424],
+        )
+        self.assertEqual(Recipe.objects.count(), 1)
+
+
+class SnapshotBatchApiTests(TransactionTestCase):
+    """Test read-only atomic batches outside a test transaction."""
+
+    def test_read_only_snapshot(self):
+        """Test read-only atomic batches run in one REPEATABLE READ."""
+        user = create_user()
+        client = APIClient()
+        client.force_authenticate(user)
+        requests = [
+            {"method": "GET", "path": "/api/recipe/tags/"},
+            {"method": "GET", "path": "/api/recipe/recipes/"},
+        ]
+
+        for sub in (requests, requests + [
+                {"method": "DELETE", "path": "/api/recipe/tags/0/"}]):
+            with CaptureQueriesContext(connection) as queries:
+                res = client.post(
+                    BATCH_URL, {"atomic": True, "requests": sub},
+                    format="json")
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            snapshots = [
+                query for query in queries
+                if "REPEATABLE READ" in query["sql"]
+            ]
+            self.assertEqual(len(snapshots), 1 if sub is requests else 0)
@@ -0,0 +1,29 @@
+"""
+Views for the batch API.
+"""
+from drf_spectacular.utils import extend_schema
+from rest_framework import authentication, generics, permissions
+from rest_framework.response import Response
+
+from batch.dispatch import run_batch
+from batch.serializers import BatchResponseSerializer, BatchSerializer
+
+
+class BatchView(generics.GenericAPIView):
+    """Run several API calls of the authenticated user in one request."""
+
+    serializer_class = BatchSerializer
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(responses=BatchResponseSerializer)
+    def post(self, request, *args, **kwargs):
+        """Run the requests in order, returning all their responses."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = run_batch(
+            request,
+            serializer.validated_data["requests"],
+            atomic=serializer.validated_data["atomic"],
+        )
+        return Response({"responses": results})
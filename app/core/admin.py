@@ -1,11 +1,13 @@
 """
 Django admin customization.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
-from core import models
+from core import models, sharding
+from core.purge import schedule_user_deletion
 
 
 class UserAdmin(BaseUserAdmin):
@@ -50,8 +52,127 @@ class UserAdmin(BaseUserAdmin):
         ),
     )
 
+    # deleting a user only deactivates it, the data is purged in background
+    # by `purge_users` (see core.purge)
+    def delete_model(self, request, obj):
+        schedule_user_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            schedule_user_deletion(user)
+
+    def get_deleted_objects(self, objs, request):
+        # don't collect every related object for the confirmation page
+        return [str(obj) for obj in objs], {"users": len(objs)}, set(), []
+
+
+class UserDeletionAdmin(admin.ModelAdmin):
+    """Define the admin pages to follow user deletions."""
+
+    ordering = ["-requested_at"]
+    list_display = [
+        "email", "status", "deleted", "total", "attempts", "requested_at"]
+    list_filter = ["status"]
+    readonly_fields = [
+        "user",
+        "email",
+        "total",
+        "deleted",
+        "error",
+        "attempts",
+        "retry_at",
+        "requested_at",
+        "finished_at",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+class JobAdmin(admin.ModelAdmin):
+    """Define the admin pages to follow background jobs."""
+
+    ordering = ["-id"]
+    list_display = ["id", "name", "status", "attempts", "run_at", "user"]
+    list_filter = ["status", "name"]
+    readonly_fields = [
+        "name",
+        "kwargs",
+        "user",
+        "attempts",
+        "max_attempts",
+        "timeout",
+        "locked_until",
+        "result",
+        "error",
+        "created_at",
+        "started_at",
+        "finished_at",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+class ShardAdminSite(admin.AdminSite):
+    """Admin pages of the recipes, tags and ingredients of one shard."""
+
+    def __init__(self, shard):
+        super().__init__(name=f"admin_{shard}")
+        self.shard = shard
+        self.site_header = _("Shard %(shard)s") % {"shard": shard}
+
+
+class ShardModelAdmin(admin.ModelAdmin):
+    """Admin pages of a sharded model, on the shard of their admin site.
+
+    The sharded models are only routed with a shard active (see
+    core.routers), the views and their template rendering run with the
+    shard of the site, `default` for the main site.
+    """
+
+    @property
+    def shard(self):
+        return getattr(self.admin_site, "shard", "default")
+
+    def _on_shard(self, view, request, *args, **kwargs):
+        with sharding.use_shard(self.shard):
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+    def changelist_view(self, request, extra_context=None):
+        return self._on_shard(
+            super().changelist_view, request, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url="",
+                        extra_context=None):
+        return self._on_shard(
+            super().changeform_view, request, object_id, form_url,
+            extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        return self._on_shard(
+            super().delete_view, request, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        return self._on_shard(
+            super().history_view, request, object_id, extra_context)
+
+
+SHARDED_ADMIN_MODELS = [models.Recipe, models.Tag, models.Ingredient]
 
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.UserDeletion, UserDeletionAdmin)
+admin.site.register(models.Job, JobAdmin)
+admin.site.register(SHARDED_ADMIN_MODELS, ShardModelAdmin)
+
+# the other shards get their own site, under admin/shards/<alias>/
+shard_sites = {
+    alias: ShardAdminSite(alias)
+    for alias in settings.SHARD_DATABASES
+    if alias != "default"
+}
+for shard_site in shard_sites.values():
+    shard_site.register(SHARDED_ADMIN_MODELS, ShardModelAdmin)
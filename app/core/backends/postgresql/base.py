@@ -0,0 +1,48 @@
+"""
+PostgreSQL database backend with health checks for persistent connections.
+
+Backport of the CONN_HEALTH_CHECKS option of Django 4.1: with CONN_MAX_AGE
+set, a connection reused from an earlier request is pinged before its first
+query in the new request and replaced if the server dropped it, instead of
+failing that request.
+"""
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Postgres wrapper checking reused connections once per request."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = self.settings_dict.get(
+            "CONN_HEALTH_CHECKS", False
+        )
+        self.health_check_done = False
+
+    def connect(self):
+        super().connect()
+        # a brand new connection doesn't need checking
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # called on request start and end, check again on next use
+        if self.connection is not None:
+            self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def close_if_health_check_failed(self):
+        """Close the existing connection if it fails a health check."""
+        if (
+            self.connection is None
+            or not self.health_check_enabled
+            or self.health_check_done
+        ):
+            return
+
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,512 @@
+"""
+Benchmark scenarios run by the `benchmark` management command.
+
+Each scenario is a function taking the parsed command options and returning
+a list of (label, timings) rows, timings being seconds per iteration.
+"""
+import itertools
+import json
+import statistics
+import time
+import uuid
+
+from django.core.signals import request_finished, request_started
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+
+from core.models import Ingredient, Recipe, RecipeBand, RecipeFeature, Tag
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    """Register a benchmark scenario under the function name."""
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def measure(func, iterations):
+    """Call func `iterations` times and return the duration of each call."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    """Return mean, p50 and p95 of timings in milliseconds."""
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "mean": statistics.mean(ordered) * 1000,
+        "p50": statistics.median(ordered) * 1000,
+        "p95": p95 * 1000,
+    }
+
+
+def _simulated_request():
+    """Run one cheap query inside the request lifecycle signals."""
+    request_started.send(sender=None)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    finally:
+        request_finished.send(sender=None)
+
+
+@scenario
+def connections(options):
+    """Per request latency with and without persistent connections.
+
+    Like a cheap endpoint (e.g. /api/user/me/), each simulated request runs
+    a single query between the request_started and request_finished signals,
+    which is where Django opens, checks and closes connections.
+    """
+    settings_dict = connection.settings_dict
+    original = (settings_dict["CONN_MAX_AGE"], connection.health_check_enabled)
+    max_age = original[0] or 60
+    modes = [
+        ("CONN_MAX_AGE=0", 0, False),
+        (f"CONN_MAX_AGE={max_age}", max_age, False),
+        (f"CONN_MAX_AGE={max_age} + health checks", max_age, True),
+    ]
+    rows = []
+    try:
+        for label, conn_max_age, health_checks in modes:
+            connection.close()
+            settings_dict["CONN_MAX_AGE"] = conn_max_age
+            connection.health_check_enabled = health_checks
+            # warm up, opens the connection kept by persistent modes
+            _simulated_request()
+            rows.append(
+                (label, measure(_simulated_request, options["iterations"])))
+    finally:
+        connection.close()
+        settings_dict["CONN_MAX_AGE"], connection.health_check_enabled = (
+            original)
+
+    return rows
+
+
+def seed_recipes(users, recipes_per_user, tags_per_user=20,
+                 ingredients_per_user=50, ingredients_per_recipe=5):
+    """Insert synthetic users, each with recipes linked to their tags and
+    ingredients."""
+    from recipe.arrays import refresh_arrays
+
+    run = uuid.uuid4().hex[:8]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO core_user (password, is_superuser, email, name, "
+            "is_active, is_staff, shard) "
+            "SELECT '!', false, 'bench-' || %s || '-' || n || '@example.com', "
+            "'bench', true, false, '' FROM generate_series(1, %s) n "
+            "RETURNING id",
+            [run, users],
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "INSERT INTO core_tag (name, user_id) "
+            "SELECT 'Tag ' || n, u.id "
+            "FROM unnest(%s::bigint[]) u(id), generate_series(1, %s) n",
+            [user_ids, tags_per_user],
+        )
+        cursor.execute(
+            "INSERT INTO core_recipe (title, description, time_minutes, "
+            "price, link, user_id, image_color, image_placeholder, tag_ids, "
+            "tag_names, ingredient_ids, ingredient_names) "
+            "SELECT 'Recipe ' || n, '', 5 + n %% 120, (n %% 5000) / 100.0, "
+            "'', u.id, '', '', '{}', '{}', '{}', '{}' "
+            "FROM unnest(%s::bigint[]) u(id), generate_series(1, %s) n",
+            [user_ids, recipes_per_user],
+        )
+        cursor.execute(
+            "INSERT INTO core_recipe_tags (recipe_id, tag_id) "
+            "SELECT r.id, t.id FROM core_recipe r JOIN core_tag t "
+            "ON t.user_id = r.user_id AND t.name = 'Tag ' || (1 + r.id %% %s) "
+            "WHERE r.user_id = ANY(%s)",
+            [tags_per_user, user_ids],
+        )
+        cursor.execute(
+            "INSERT INTO core_ingredient (name, user_id) "
+            "SELECT 'Ingredient ' || n, u.id "
+            "FROM unnest(%s::bigint[]) u(id), generate_series(1, %s) n",
+            [user_ids, ingredients_per_user],
+        )
+        # distinct ingredients per recipe as long as 7 * k < ingredients
+        cursor.execute(
+            "INSERT INTO core_recipe_ingredients (recipe_id, ingredient_id) "
+            "SELECT r.id, i.id FROM core_recipe r "
+            "CROSS JOIN generate_series(0, %s - 1) k "
+            "JOIN core_ingredient i ON i.user_id = r.user_id "
+            "AND i.name = 'Ingredient ' || (1 + (r.id + 7 * k) %% %s) "
+            "WHERE r.user_id = ANY(%s)",
+            [ingredients_per_recipe, ingredients_per_user, user_ids],
+        )
+        # the signals maintaining the link arrays and feature index don't
+        # see raw inserts
+        refresh_arrays(Recipe.objects.filter(user_id__in=user_ids))
+        for table, column, kind in (
+            ("core_recipe_tags", "tag_id", RecipeFeature.TAG),
+            ("core_recipe_ingredients", "ingredient_id",
+             RecipeFeature.INGREDIENT),
+        ):
+            cursor.execute(
+                "INSERT INTO core_recipefeature "
+                "(user_id, kind, feature_id, recipe_id) "
+                f"SELECT r.user_id, %s, l.{column}, l.recipe_id "
+                f"FROM {table} l JOIN core_recipe r ON r.id = l.recipe_id "
+                "WHERE r.user_id = ANY(%s)",
+                [kind, user_ids],
+            )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "ANALYZE core_recipe, core_tag, core_recipe_tags, "
+            "core_ingredient, core_recipe_ingredients, core_recipefeature"
+        )
+
+
+def _scanned_relations(queryset, prefix):
+    """Return the relations named prefix* read by the plan of queryset."""
+    plan = json.loads(queryset.explain(format="json"))
+    relations = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        relation = node.get("Relation Name", "")
+        if relation.startswith(prefix):
+            relations.add(relation)
+        nodes.extend(node.get("Plans", []))
+    return relations
+
+
+@scenario
+def recipes(options):
+    """Recipe list queries of RecipeViewSet for sample users.
+
+    Run before and after partitioning the recipe table (`partition_recipes`
+    command) to compare. With --seed-users, synthetic data is inserted first.
+    """
+    if options["seed_users"]:
+        seed_recipes(options["seed_users"], options["recipes_per_user"])
+
+    users = list(
+        Recipe.objects.values_list("user_id", flat=True)
+        .order_by("user_id").distinct()[:100]
+    )
+    tags = {
+        user_id: list(
+            Tag.objects.filter(user_id=user_id)
+            .values_list("id", flat=True)[:2]
+        )
+        for user_id in users
+    }
+    if not users:
+        raise CommandError("No recipes to query, use --seed-users.")
+
+    def list_queryset(user_id):
+        return Recipe.objects.filter(user_id=user_id).order_by("-id")
+
+    def tag_queryset(user_id):
+        return list_queryset(user_id).filter(tag_ids__overlap=tags[user_id])
+
+    queries = [("list", list_queryset), ("filter by tags", tag_queryset)]
+    rows = []
+    for label, build in queries:
+        user_cycle = itertools.cycle(users)
+        scanned = _scanned_relations(build(users[0]), "core_recipe")
+        rows.append((
+            f"{label} ({len(scanned)} recipe relations scanned)",
+            measure(lambda: list(build(next(user_cycle))),
+                    options["iterations"]),
+        ))
+
+    return rows
+
+
+@scenario
+def autocomplete(options):
+    """Tag autocomplete of recipe.autocomplete, from the database and cache.
+
+    Queries prefixes of existing tag names of sample users, seed them with
+    the recipes scenario (--seed-users) first.
+    """
+    from recipe.autocomplete import cache, find_matches
+
+    terms = [
+        (user_id, name[:length].lower())
+        for user_id, name in Tag.objects.values_list("user_id", "name")
+        .order_by("user_id", "id")[:1000]
+        for length in (1, 3, 5)
+    ]
+    if not terms:
+        raise CommandError("No tags to query, use --seed-users.")
+
+    def _complete():
+        user_id, term = next(term_cycle)
+        find_matches(Tag.objects.filter(user_id=user_id), user_id, term, 10)
+
+    rows = []
+    for label, cached in (("database", False), ("in-process cache", True)):
+        term_cycle = itertools.cycle(terms)
+        cache.clear()
+        if cached:
+            for _ in terms:
+                _complete()
+
+        def _run():
+            if not cached:
+                cache.clear()
+            _complete()
+
+        rows.append((label, measure(_run, options["iterations"])))
+    return rows
+
+
+@scenario
+def cookable(options):
+    """Recipes cookable from pantries of increasing size (recipe.pantry).
+
+    With --seed-users, synthetic data is inserted first.
+    """
+    from recipe.pantry import cookable as cookable_recipes
+
+    if options["seed_users"]:
+        seed_recipes(options["seed_users"], options["recipes_per_user"])
+
+    # latest users with ingredients, e.g. those just seeded
+    users = list(
+        Ingredient.objects.values_list("user_id", flat=True)
+        .order_by("-user_id").distinct()[:20]
+    )
+    if not users:
+        raise CommandError("No ingredients to query, use --seed-users.")
+    ingredients = {
+        user_id: list(
+            Ingredient.objects.filter(user_id=user_id)
+            .order_by("?").values_list("id", flat=True)
+        )
+        for user_id in users
+    }
+
+    rows = []
+    for size in (5, 10, 20):
+        user_cycle = itertools.cycle(users)
+
+        def _search():
+            user_id = next(user_cycle)
+            recipes = Recipe.objects.filter(user_id=user_id)
+            cookable_recipes(recipes, ingredients[user_id][:size], 1)
+
+        recipe_count = Recipe.objects.filter(user_id=users[0]).count()
+        rows.append((
+            f"pantry of {size} ({recipe_count} recipes per user)",
+            measure(_search, options["iterations"]),
+        ))
+    return rows
+
+
+@scenario
+def similar(options):
+    """Similar recipes of sample recipes (recipe.similar).
+
+    With --seed-users, synthetic data is inserted first.
+    """
+    from recipe.similar import similar_recipes
+
+    if options["seed_users"]:
+        seed_recipes(options["seed_users"], options["recipes_per_user"])
+
+    # a recipe of each of the latest users with indexed features
+    users = list(
+        RecipeFeature.objects.values_list("user_id", flat=True)
+        .order_by("-user_id").distinct()[:20]
+    )
+    if not users:
+        raise CommandError("No recipe features to query, use --seed-users.")
+    recipes = [
+        Recipe.objects.filter(user_id=user_id, features__isnull=False)
+        .order_by("-id").first()
+        for user_id in users
+    ]
+    recipe_cycle = itertools.cycle(recipes)
+
+    recipe_count = Recipe.objects.filter(user_id=users[0]).count()
+    return [(
+        f"similar recipes ({recipe_count} recipes per user)",
+        measure(lambda: similar_recipes(next(recipe_cycle)),
+                options["iterations"]),
+    )]
+
+
+@scenario
+def random(options):
+    """Random recipes of sample users, ORDER BY random() against id probes.
+
+    With --seed-users, synthetic data is inserted first.
+    """
+    from recipe.sampling import sample
+
+    if options["seed_users"]:
+        seed_recipes(options["seed_users"], options["recipes_per_user"])
+
+    # latest users with recipes, e.g. those just seeded
+    users = list(
+        Recipe.objects.values_list("user_id", flat=True)
+        .order_by("-user_id").distinct()[:20]
+    )
+    if not users:
+        raise CommandError("No recipes to query, use --seed-users.")
+    tags = {
+        user_id: list(
+            Tag.objects.filter(user_id=user_id)
+            .values_list("id", flat=True)[:2]
+        )
+        for user_id in users
+    }
+
+    def all_recipes(user_id):
+        return Recipe.objects.filter(user_id=user_id)
+
+    def tagged_recipes(user_id):
+        return all_recipes(user_id).filter(tag_ids__overlap=tags[user_id])
+
+    def by_random(user_id, build, count):
+        return list(build(user_id).order_by("?")[:count])
+
+    def by_probes(user_id, build, count):
+        return sample(build(user_id), count, within=all_recipes(user_id))
+
+    recipe_count = all_recipes(users[0]).count()
+    rows = []
+    for label, build in (("all", all_recipes), ("by tags", tagged_recipes)):
+        for count in (1, 10):
+            for method, pick in (
+                ("order by random()", by_random),
+                ("id probes", by_probes),
+            ):
+                user_cycle = itertools.cycle(users)
+                rows.append((
+                    f"{count} of {label}, {method} "
+                    f"({recipe_count} recipes per user)",
+                    measure(
+                        lambda: pick(next(user_cycle), build, count),
+                        options["iterations"],
+                    ),
+                ))
+    return rows
+
+
+@scenario
+def duplicates(options):
+    """Duplicates of sample recipes, LSH bands against comparing all.
+
+    The bands of the sample users are computed first when missing (seeded
+    recipes have none). With --seed-users, synthetic data is inserted first.
+    """
+    from recipe.duplicates import (
+        THRESHOLD,
+        features,
+        find_duplicates,
+        index_recipes,
+        similarity,
+    )
+
+    if options["seed_users"]:
+        seed_recipes(options["seed_users"], options["recipes_per_user"])
+
+    users = list(
+        Recipe.objects.values_list("user_id", flat=True)
+        .order_by("-user_id").distinct()[:5]
+    )
+    if not users:
+        raise CommandError("No recipes to query, use --seed-users.")
+    for user_id in users:
+        if not RecipeBand.objects.filter(user_id=user_id).exists():
+            index_recipes(Recipe.objects.filter(user_id=user_id))
+    recipes = [
+        Recipe.objects.filter(user_id=user_id).order_by("-id").first()
+        for user_id in users
+    ]
+
+    def by_bands(recipe):
+        return find_duplicates(
+            recipe.user_id, recipe.title, recipe.ingredient_names,
+            exclude=recipe.id)
+
+    def by_scan(recipe):
+        target = features(recipe.title, recipe.ingredient_names)
+        return [
+            other
+            for other in Recipe.objects.filter(user_id=recipe.user_id)
+            .exclude(id=recipe.id)
+            .only("title", "ingredient_names")
+            if similarity(
+                target, features(other.title, other.ingredient_names)
+            ) >= THRESHOLD
+        ]
+
+    recipe_count = Recipe.objects.filter(user_id=users[0]).count()
+    rows = []
+    for label, find in (("LSH bands", by_bands), ("compare all", by_scan)):
+        recipe_cycle = itertools.cycle(recipes)
+        rows.append((
+            f"{label} ({recipe_count} recipes per user)",
+            measure(lambda: find(next(recipe_cycle)), options["iterations"]),
+        ))
+    return rows
+
+
+@scenario
+def batch(options):
+    """A screen's API calls as separate requests against one batch request.
+
+    Requests go through the Django handler and middleware in process (the
+    test client), so the timings leave out the network round trips a batch
+    also saves. With --seed-users, synthetic data is inserted first.
+    """
+    from django.test import Client, override_settings
+    from rest_framework.authtoken.models import Token
+
+    if options["seed_users"]:
+        seed_recipes(options["seed_users"], options["recipes_per_user"])
+
+    recipe = Recipe.objects.order_by("-id").first()
+    if recipe is None:
+        raise CommandError("No recipes to query, use --seed-users.")
+    token, _ = Token.objects.get_or_create(user_id=recipe.user_id)
+    client = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+    paths = [
+        "/api/user/me/",
+        "/api/recipe/tags/",
+        "/api/recipe/ingredients/",
+        f"/api/recipe/recipes/{recipe.id}/",
+    ]
+
+    def separate():
+        for path in paths:
+            client.get(path)
+
+    def batched(atomic):
+        client.post(
+            "/api/batch/",
+            json.dumps({
+                "atomic": atomic,
+                "requests": [
+                    {"method": "GET", "path": path} for path in paths
+                ],
+            }),
+            content_type="application/json",
+        )
+
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        return [
+            (f"{len(paths)} requests", measure(
+                separate, options["iterations"])),
+            ("1 batch", measure(
+                lambda: batched(False), options["iterations"])),
+            ("1 atomic batch", measure(
+                lambda: batched(True), options["iterations"])),
+        ]
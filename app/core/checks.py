@@ -0,0 +1,65 @@
+"""
+System checks of the core app, run before `migrate` and the server start.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import connections
+
+# backends only visible to the process holding them
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Require a shared cache when several web workers run.
+
+    Facet and autocomplete invalidation (recipe.cache) and read-your-writes
+    pinning of token clients (core.middleware) are only seen by the worker
+    writing them with a process local cache.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.WEB_WORKERS > 1 and backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"{backend} is local to each of the {settings.WEB_WORKERS} "
+            "web workers, invalidations and primary pinning are lost "
+            "between them.",
+            hint=(
+                "Set CACHE_BACKEND and CACHE_LOCATION to a shared cache "
+                "(e.g. redis, see docker-compose-deploy.yml) or "
+                "WEB_WORKERS=1."
+            ),
+            id="core.E001",
+        )]
+    return []
+
+
+@register(Tags.database)
+def check_pooled_timezone(app_configs, databases=None, **kwargs):
+    """Require a UTC database default timezone behind a transaction pooler.
+
+    Only run with database checks (`migrate`, `check --database`).
+    """
+    if settings.DB_POOL_MODE != "transaction":
+        return []
+    errors = []
+    for alias in databases or []:
+        with connections[alias].cursor() as cursor:
+            # the value sessions start with, whatever Django SET since
+            cursor.execute(
+                "SELECT reset_val FROM pg_settings WHERE name = 'TimeZone'")
+            (timezone,) = cursor.fetchone()
+        if timezone not in ("UTC", "Etc/UTC"):
+            errors.append(Error(
+                f"Database {alias} defaults to timezone {timezone}, behind "
+                "a transaction pooler Django's SET TIME ZONE leaks to "
+                "other clients of the server connection.",
+                hint=(
+                    "ALTER DATABASE ... SET timezone TO 'UTC' (or ALTER "
+                    "ROLE), or unset DB_POOL_MODE."
+                ),
+                id="core.E002",
+            ))
+    return errors
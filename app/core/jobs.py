@@ -0,0 +1,169 @@
+"""
+Background jobs stored in the database.
+
+Tasks are functions registered with `@task` in a `tasks` module of an
+installed app. `enqueue` stores a Job row and `manage.py run_worker` runs
+them. Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any
+number of them can poll the table without a broker and without running a
+job twice.
+"""
+import signal
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.models import Job
+
+TASKS = {}
+
+
+class JobTimeout(Exception):
+    """Raised in a job running for longer than its timeout."""
+
+
+def task(max_attempts=None, timeout=None):
+    """Register a task under the function name.
+
+    max_attempts and timeout (seconds) default to JOB_MAX_ATTEMPTS and
+    JOB_TIMEOUT.
+    """
+    def decorator(func):
+        func.max_attempts = max_attempts
+        func.timeout = timeout
+        TASKS[func.__name__] = func
+        return func
+
+    return decorator
+
+
+def enqueue(func, user=None, delay=0, **kwargs):
+    """Queue a run of task func with JSON serializable kwargs.
+
+    Called in a transaction, the job is only visible to workers once it
+    commits.
+    """
+    if TASKS.get(func.__name__) is not func:
+        raise ValueError(f"{func.__name__} is not a registered task.")
+    return Job.objects.create(
+        name=func.__name__,
+        kwargs=kwargs,
+        user=user,
+        max_attempts=func.max_attempts or settings.JOB_MAX_ATTEMPTS,
+        timeout=func.timeout or settings.JOB_TIMEOUT,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def retry_delay(attempt):
+    """Return seconds to wait before retrying after failed attempt n."""
+    return min(
+        settings.JOB_RETRY_BACKOFF * 2 ** (attempt - 1),
+        settings.JOB_RETRY_BACKOFF_MAX,
+    )
+
+
+def claim():
+    """Mark the next due job as running and return it, None if idle.
+
+    Jobs still running past locked_until were lost with their worker and
+    are claimed again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.QUEUED, run_at__lte=now)
+                | Q(status=Job.RUNNING, locked_until__lt=now)
+            )
+            .order_by("run_at")
+            .first()
+        )
+        if job is not None:
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.started_at = now
+            # leave the worker time to record a timeout before expiring
+            job.locked_until = now + timedelta(seconds=job.timeout + 60)
+            job.save(update_fields=[
+                "status", "attempts", "started_at", "locked_until"])
+    return job
+
+
+@contextmanager
+def time_limit(seconds):
+    """Raise JobTimeout in the block once it ran for `seconds`.
+
+    Relies on SIGALRM, outside of the main thread the block is not limited.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _timeout(signum, frame):
+        raise JobTimeout(f"Job timed out after {seconds} seconds.")
+
+    previous = signal.signal(signal.SIGALRM, _timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def run(job):
+    """Run a claimed job and record its outcome, retrying failures."""
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {job.name!r}.")
+        if job.attempts > job.max_attempts:
+            raise JobTimeout("Job lost by its worker.")
+        with time_limit(job.timeout):
+            result = func(**job.kwargs)
+    except Exception:
+        job.error = traceback.format_exc()
+        job.locked_until = None
+        if func is not None and job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts))
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.locked_until = None
+        job.finished_at = timezone.now()
+    job.save(update_fields=[
+        "status", "result", "error", "run_at", "locked_until", "finished_at"])
+    return job
+
+
+def work(stopping, burst=False, poll_interval=None):
+    """Run jobs one after the other until stopping() returns True.
+
+    With burst, return as soon as no job is due.
+    """
+    autodiscover_modules("tasks")
+    poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+    while not stopping():
+        # same connection handling as between requests
+        close_old_connections()
+        job = claim()
+        if job is not None:
+            run(job)
+        elif burst:
+            return
+        else:
+            time.sleep(poll_interval)
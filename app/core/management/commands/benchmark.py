@@ -0,0 +1,34 @@
+"""
+Django command to run performance benchmarks against the configured database.
+"""
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import SCENARIOS, summarize
+
+
+class Command(BaseCommand):
+    """Django command to run a benchmark scenario."""
+
+    help = "Run a benchmark scenario and print latency per iteration."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=sorted(SCENARIOS))
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument(
+            "--seed-users",
+            type=int,
+            default=0,
+            help="insert this many synthetic users before running",
+        )
+        parser.add_argument("--recipes-per-user", type=int, default=1000)
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        func = SCENARIOS[options["scenario"]]
+        self.stdout.write(f"Running {options['scenario']} benchmark...")
+        for label, timings in func(options):
+            stats = summarize(timings)
+            self.stdout.write(
+                f"{label:<45} mean {stats['mean']:8.3f} ms"
+                f"  p50 {stats['p50']:8.3f} ms  p95 {stats['p95']:8.3f} ms"
+            )
@@ -0,0 +1,53 @@
+"""
+Django command to check the link arrays denormalized on recipes.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe.arrays import drifted, refresh_arrays
+
+
+class Command(BaseCommand):
+    """Django command comparing recipe link arrays with the links."""
+
+    help = (
+        "Report recipes whose tag/ingredient arrays differ from their "
+        "links, recompute them with --fix."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        total = 0
+        for alias in settings.SHARD_DATABASES:
+            recipes = Recipe.objects.using(alias)
+            last_id = 0
+            while True:
+                ids = list(
+                    recipes.filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", flat=True)[:options["batch_size"]]
+                )
+                if not ids:
+                    break
+                last_id = ids[-1]
+                batch = drifted(recipes.filter(id__in=ids))
+                stale = list(batch.values_list("id", flat=True))
+                if not stale:
+                    continue
+                total += len(stale)
+                self.stdout.write(
+                    f"{alias}: {len(stale)} recipes drifted, "
+                    f"ids {stale[:10]}"
+                )
+                if options["fix"]:
+                    refresh_arrays(recipes.filter(id__in=stale))
+
+        if total and not options["fix"]:
+            raise CommandError(f"{total} recipes have drifted link arrays.")
+        self.stdout.write(
+            f"{total} recipes fixed." if total else "Link arrays are in sync.")
@@ -0,0 +1,40 @@
+"""
+Django command to delete unfinished image upload sessions.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import ImageUploadSession
+from recipe.uploads import discard_orphan_chunks, expire_sessions
+
+
+class Command(BaseCommand):
+    """Django command deleting expired upload sessions and their chunks."""
+
+    help = (
+        "Delete upload sessions older than RECIPE_UPLOAD_SESSION_TTL and "
+        "chunks left without a session."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl",
+            type=int,
+            help="age in seconds, defaults to RECIPE_UPLOAD_SESSION_TTL",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        expired = 0
+        live = set()
+        for alias in settings.SHARD_DATABASES:
+            expired += expire_sessions(alias, options["ttl"])
+            live.update(
+                ImageUploadSession.objects.using(alias)
+                .values_list("id", flat=True)
+            )
+        orphans = discard_orphan_chunks(live)
+        self.stdout.write(
+            f"Deleted {expired} expired sessions and the chunks of "
+            f"{orphans} deleted sessions."
+        )
@@ -0,0 +1,49 @@
+"""
+Django command to merge tags and ingredients differing only by case.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipe.names import ITEMS, merge_duplicates
+
+
+class Command(BaseCommand):
+    """Django command merging duplicated tag and ingredient names."""
+
+    help = (
+        "Merge the tags and ingredients of a user whose names differ only "
+        "by case into the oldest one, moving their recipe links."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="duplicated names merged per transaction",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="seconds to sleep between batches",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        for alias in settings.SHARD_DATABASES:
+            for model in ITEMS:
+                total = 0
+                while True:
+                    merged = merge_duplicates(
+                        model, alias, options["batch_size"])
+                    if not merged:
+                        break
+                    total += merged
+                    if options["pause"]:
+                        time.sleep(options["pause"])
+                self.stdout.write(
+                    f"{alias}: merged {total} "
+                    f"{model._meta.verbose_name_plural}")
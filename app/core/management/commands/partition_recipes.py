@@ -0,0 +1,65 @@
+"""
+Django command to hash partition the recipe table.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import partitioning
+
+
+class Command(BaseCommand):
+    """Django command partitioning core_recipe on every shard."""
+
+    help = (
+        "Hash partition the recipe table on user_id (PostgreSQL), or turn "
+        "it back into a plain table with --merge. Writes go on while the "
+        "rows are copied."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--partitions",
+            type=int,
+            help="number of hash partitions",
+        )
+        parser.add_argument(
+            "--merge",
+            action="store_true",
+            help="merge the partitions back into a plain table",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="rows copied per transaction",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="seconds to sleep between batches",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        if options["merge"] == bool(options["partitions"]):
+            raise CommandError("Give either --partitions N or --merge.")
+        if options["partitions"] is not None and options["partitions"] < 2:
+            raise CommandError("--partitions must be at least 2.")
+        for alias in settings.SHARD_DATABASES:
+            if connections[alias].vendor != "postgresql":
+                raise CommandError(f"{alias}: partitioning needs PostgreSQL.")
+            if options["merge"]:
+                changed = partitioning.merge(
+                    alias, options["batch_size"], options["pause"])
+                done = "merged" if changed else "not partitioned"
+            else:
+                changed = partitioning.partition(
+                    alias,
+                    options["partitions"],
+                    options["batch_size"],
+                    options["pause"],
+                )
+                done = "partitioned" if changed else "already partitioned"
+            self.stdout.write(f"{alias}: {partitioning.RECIPE_TABLE} {done}")
@@ -0,0 +1,39 @@
+"""
+Django command to purge the data of deleted users.
+"""
+from django.core.management.base import BaseCommand
+
+from core.purge import claim_next, purge_user
+
+
+class Command(BaseCommand):
+    """Django command to run the queued user deletions."""
+
+    help = "Delete the data of deleted users in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="seconds to sleep between batches",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        while True:
+            deletion = claim_next()
+            if deletion is None:
+                break
+            try:
+                purge_user(
+                    deletion,
+                    batch_size=options["batch_size"],
+                    pause=options["pause"],
+                )
+            except Exception as exc:
+                self.stderr.write(f"{deletion.email}: failed, {exc}")
+                continue
+            self.stdout.write(
+                f"{deletion.email}: deleted {deletion.deleted} objects")
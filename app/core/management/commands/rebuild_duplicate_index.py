@@ -0,0 +1,44 @@
+"""
+Django command to recompute the duplicate index of recipes.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from core.sharding import shard_for_user
+from recipe.duplicates import index_recipes
+
+
+class Command(BaseCommand):
+    """Django command rebuilding the LSH bands of recipes."""
+
+    help = "Recompute the duplicate detection bands of users' recipes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="only this user id")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        users = get_user_model().objects.order_by("id")
+        if options["user"] is not None:
+            users = users.filter(id=options["user"])
+            if not users.exists():
+                raise CommandError(f"User {options['user']} not found.")
+
+        count = 0
+        for user in users.iterator():
+            recipes = Recipe.objects.using(shard_for_user(user)).filter(
+                user=user)
+            last_id = 0
+            while True:
+                ids = list(
+                    recipes.filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", flat=True)[:options["batch_size"]]
+                )
+                if not ids:
+                    break
+                last_id = ids[-1]
+                count += index_recipes(recipes.filter(id__in=ids))
+        self.stdout.write(f"Indexed {count} recipes.")
@@ -0,0 +1,31 @@
+"""
+Django command to recompute the recipe statistics of users.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sharding import shard_for_user
+from recipe.stats import rebuild
+
+
+class Command(BaseCommand):
+    """Django command rebuilding user statistics from their recipes."""
+
+    help = "Recompute the recipe statistics counters of users."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="only this user id")
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        users = get_user_model().objects.order_by("id")
+        if options["user"] is not None:
+            users = users.filter(id=options["user"])
+            if not users.exists():
+                raise CommandError(f"User {options['user']} not found.")
+
+        count = 0
+        for user in users.iterator():
+            rebuild(user, shard_for_user(user))
+            count += 1
+        self.stdout.write(f"Rebuilt statistics of {count} users.")
@@ -0,0 +1,74 @@
+"""
+Django command to run background jobs.
+"""
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import work
+
+
+class Command(BaseCommand):
+    """Django command to run queued jobs until stopped."""
+
+    help = "Run background jobs queued in the database."
+
+    stopping = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help="number of worker processes",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="exit once no job is due",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        concurrency = options["concurrency"]
+        self.stdout.write(f"Starting {concurrency} worker(s)...")
+        if concurrency == 1:
+            self.work(options["burst"])
+            return
+
+        # children must open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=self.work, args=(options["burst"],))
+            for _ in range(concurrency)
+        ]
+        for process in processes:
+            process.start()
+
+        def _terminate(signum, frame):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, _terminate)
+        for process in processes:
+            process.join()
+
+    def work(self, burst):
+        # finish the current job on SIGTERM/SIGINT, then exit
+        def _stop(signum, frame):
+            self.stopping = True
+
+        previous = [
+            (signum, signal.signal(signum, _stop))
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        ]
+        try:
+            work(lambda: self.stopping, burst=burst)
+        finally:
+            for signum, handler in previous:
+                signal.signal(signum, handler)
+        self.stdout.write("Worker stopped.")
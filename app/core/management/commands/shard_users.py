@@ -0,0 +1,98 @@
+"""
+Django command to move users between database shards.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.models import (
+    Recipe, RecipeBand, RecipeFeature, Tag, Ingredient, UserStat)
+from core.sharding import move_user, shard_for_user
+
+# ids of shard n start at n * SHARD_ID_SPAN, keeping them unique across
+# shards so users can be moved with their ids
+SHARD_ID_SPAN = 2 ** 40
+
+
+class Command(BaseCommand):
+    """Django command to migrate or rebalance users across shards."""
+
+    help = "Move a user to another shard or rebalance users across shards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="id of user to move")
+        parser.add_argument("--to", help="target shard database alias")
+        parser.add_argument(
+            "--rebalance",
+            action="store_true",
+            help="move users until every shard holds about as many users",
+        )
+        parser.add_argument(
+            "--init-sequences",
+            action="store_true",
+            help="give every shard a disjoint range of ids",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options) -> None:
+        """Entrypoint for command."""
+        if options["init_sequences"]:
+            self.init_sequences()
+        if options["user"] is not None:
+            self.move_one(options)
+        if options["rebalance"]:
+            self.rebalance(options)
+
+    def init_sequences(self):
+        """Start the id sequences of shard n at n * SHARD_ID_SPAN."""
+        models = [Recipe, Tag, Ingredient, Recipe.tags.through,
+                  Recipe.ingredients.through, RecipeFeature, RecipeBand,
+                  UserStat]
+        for index, alias in enumerate(settings.SHARD_DATABASES):
+            start = index * SHARD_ID_SPAN
+            with connections[alias].cursor() as cursor:
+                for model in models:
+                    table = model._meta.db_table
+                    cursor.execute(
+                        "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                        "GREATEST(%s, (SELECT COALESCE(MAX(id), 0) "
+                        f"FROM {connections[alias].ops.quote_name(table)})"
+                        ") + 1, false)",
+                        [table, start],
+                    )
+            self.stdout.write(f"{alias}: ids start at {start}")
+
+    def move_one(self, options):
+        target = options["to"]
+        if target not in settings.SHARD_DATABASES:
+            raise CommandError(f"Unknown shard {target!r}.")
+        try:
+            user = get_user_model().objects.get(id=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        self._move(user, target, options)
+
+    def rebalance(self, options):
+        """Move users from the fullest to the emptiest shard."""
+        users = {alias: [] for alias in settings.SHARD_DATABASES}
+        for user in get_user_model().objects.order_by("id"):
+            users.setdefault(shard_for_user(user), []).append(user)
+
+        while True:
+            fullest = max(users, key=lambda alias: len(users[alias]))
+            emptiest = min(users, key=lambda alias: len(users[alias]))
+            if len(users[fullest]) - len(users[emptiest]) <= 1:
+                break
+            user = users[fullest].pop()
+            self._move(user, emptiest, options)
+            users[emptiest].append(user)
+
+        self.stdout.write(self.style.SUCCESS("Shards balanced."))
+
+    def _move(self, user, target, options):
+        self.stdout.write(
+            f"Moving user {user.id} from {shard_for_user(user)} to {target}")
+        if not options["dry_run"]:
+            move_user(user, target, batch_size=options["batch_size"])
@@ -0,0 +1,60 @@
+"""
+Middleware for the app.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import use_primary
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+USE_PRIMARY_COOKIE = "use_primary"
+
+
+def _client_key(request):
+    """Identify the client by its credentials without a database query."""
+    credentials = request.META.get("HTTP_AUTHORIZATION")
+    if not credentials:
+        return None
+    digest = hashlib.sha256(credentials.encode()).hexdigest()
+    return f"use-primary:{digest}"
+
+
+class ReadYourWritesMiddleware:
+    """Pin reads to the primary database for a while after a client writes.
+
+    The window is tracked with a cookie and, for token clients which don't
+    keep cookies, in the cache keyed by their credentials (this needs a
+    cache shared by all workers, see CACHES).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        is_write = request.method not in SAFE_METHODS
+        client_key = _client_key(request)
+        pinned = (
+            is_write
+            or USE_PRIMARY_COOKIE in request.COOKIES
+            or (client_key is not None and cache.get(client_key, False))
+        )
+
+        with use_primary(pinned):
+            response = self.get_response(request)
+
+        if is_write and response.status_code < 400:
+            window = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                USE_PRIMARY_COOKIE,
+                "1",
+                max_age=window,
+                httponly=True,
+                samesite="Lax",
+            )
+            if client_key is not None:
+                cache.set(client_key, True, window)
+
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 4.0.10 on 2026-10-19 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0002_recipe_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_color",
+            field=models.CharField(blank=True, max_length=7),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="image_height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="image_placeholder",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="image_size",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="image_width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,15 @@
+# Partitioning of the recipe tables used to be applied here when
+# DB_RECIPE_PARTITIONS was set at migrate time, leaving databases at the
+# same migration with different schemas. It is now an explicit step, see
+# `python manage.py partition_recipes` (core.partitioning), and this
+# migration does nothing.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0005_user_shard"),
+    ]
+
+    operations = []
@@ -0,0 +1,37 @@
+# Indexes for autocomplete of tag and ingredient names.
+#
+# (user_id, lower(name) text_pattern_ops) serves case insensitive prefix
+# matches (LOWER(name) LIKE 'abc%') of one user whatever the collation.
+# Written in SQL as Django 4.0 renders functional indexes with an operator
+# class without the parentheses PostgreSQL requires.
+
+from django.db import DatabaseError, migrations, transaction
+
+TABLES = ["core_tag", "core_ingredient"]
+
+
+def enable_trigram(apps, schema_editor):
+    # fuzzy autocomplete uses pg_trgm when the extension can be created,
+    # prefix matching works without it
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DatabaseError:
+        pass
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0009_recipe_list_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"CREATE INDEX {table}_prefix_idx ON {table} "
+            f"(user_id, (LOWER(name)) text_pattern_ops)",
+            f"DROP INDEX {table}_prefix_idx",
+        )
+        for table in TABLES
+    ] + [
+        migrations.RunPython(enable_trigram, migrations.RunPython.noop),
+    ]
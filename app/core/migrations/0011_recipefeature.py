@@ -0,0 +1,47 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# index the links existing before the signals maintained it
+BACKFILL = """
+INSERT INTO core_recipefeature (user_id, kind, feature_id, recipe_id)
+SELECT r.user_id, %s, l.{column}, l.recipe_id
+FROM {table} l JOIN core_recipe r ON r.id = l.recipe_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('t', 'Tag'), ('i', 'Ingredient')], max_length=1)),
+                ('feature_id', models.BigIntegerField()),
+                ('recipe', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='features', to='core.recipe')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='recipefeature',
+            constraint=models.UniqueConstraint(fields=('kind', 'feature_id', 'recipe'), name='core_recipefeature_unique'),
+        ),
+        migrations.RunSQL(
+            [
+                (BACKFILL.format(table="core_recipe_tags", column="tag_id"),
+                 ["t"]),
+                (BACKFILL.format(
+                    table="core_recipe_ingredients", column="ingredient_id"),
+                 ["i"]),
+            ],
+            migrations.RunSQL.noop,
+        ),
+    ]
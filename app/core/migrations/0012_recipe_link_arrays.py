@@ -0,0 +1,65 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:30
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# fill the arrays of existing recipes from their links, see recipe.arrays
+BACKFILL = """
+UPDATE core_recipe r SET
+    {item}_ids = ARRAY(
+        SELECT l.{item}_id FROM {table} l
+        WHERE l.recipe_id = r.id ORDER BY l.id
+    ),
+    {item}_names = ARRAY(
+        SELECT i.name FROM {table} l JOIN core_{item} i ON i.id = l.{item}_id
+        WHERE l.recipe_id = r.id ORDER BY l.id
+    )
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipefeature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_names',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_names',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, default=list, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='core_recipe_tag_ids_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='core_recipe_ingredient_ids_idx'),
+        ),
+        migrations.RunSQL(
+            [
+                BACKFILL.format(item="tag", table="core_recipe_tags"),
+                BACKFILL.format(
+                    item="ingredient", table="core_recipe_ingredients"),
+            ],
+            migrations.RunSQL.noop,
+        ),
+    ]
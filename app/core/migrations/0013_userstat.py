@@ -0,0 +1,53 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# counters of existing recipes, see recipe.stats (price ranges of
+# recipe.facets.PRICE_BOUNDS)
+BACKFILL = """
+INSERT INTO core_userstat (user_id, name, value)
+SELECT user_id, name, value FROM (
+    SELECT user_id, 'recipes' AS name, COUNT(*) AS value
+    FROM core_recipe GROUP BY user_id
+    UNION ALL
+    SELECT user_id, 'time_minutes', SUM(time_minutes)
+    FROM core_recipe GROUP BY user_id
+    UNION ALL
+    SELECT user_id, 'price_' || CASE
+        WHEN price < 5 THEN 0 WHEN price < 10 THEN 1
+        WHEN price < 20 THEN 2 WHEN price < 50 THEN 3 ELSE 4 END,
+        COUNT(*)
+    FROM core_recipe GROUP BY 1, 2
+    UNION ALL
+    SELECT r.user_id, 'tag_' || l.tag_id, COUNT(*)
+    FROM core_recipe_tags l JOIN core_recipe r ON r.id = l.recipe_id
+    GROUP BY 1, 2
+) counters
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_link_arrays'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32)),
+                ('value', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='userstat',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_userstat_unique'),
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
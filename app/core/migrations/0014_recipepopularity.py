@@ -0,0 +1,28 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_userstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipePopularity',
+            fields=[
+                ('recipe', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='core.recipe')),
+                ('views', models.BigIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipepopularity',
+            index=models.Index(fields=['user', '-score'], name='core_popularity_trending_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_user_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('key', models.BigIntegerField()),
+                ('recipe', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='core.recipe')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipeband',
+            index=models.Index(fields=['user', 'band', 'key'], name='core_recipeband_key_idx'),
+        ),
+    ]
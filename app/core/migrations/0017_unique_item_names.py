@@ -0,0 +1,84 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:57
+#
+# Unique tag and ingredient names per user, ignoring case. Names differing
+# only by case, created before the constraint, are merged first (see
+# recipe.names.merge_duplicates), on each database migrated. The unique
+# indexes are then built CONCURRENTLY, writes go on meanwhile: the
+# migration is not atomic. A duplicate written between the merge and the
+# end of the build fails it, the invalid index is dropped and the names
+# merged again.
+#
+# The merge runs the current models and signals rather than historical
+# ones, it maintains the link arrays, feature index and counters of the
+# recipes.
+
+from django.db import IntegrityError, migrations, models
+import django.db.models.expressions
+import django.db.models.functions.text
+
+# table: constraint
+INDEXES = {
+    "core_tag": "core_tag_user_name_unique",
+    "core_ingredient": "core_ingredient_user_name_unique",
+}
+ATTEMPTS = 3
+
+
+def merge_names(alias):
+    from core import sharding
+    from recipe.names import ITEMS, merge_duplicates
+
+    with sharding.use_shard(alias):
+        for model in ITEMS:
+            while merge_duplicates(model, alias):
+                pass
+
+
+def create_unique_indexes(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    for table, name in INDEXES.items():
+        for attempt in range(ATTEMPTS):
+            merge_names(alias)
+            try:
+                # the same index Django creates for the constraint
+                schema_editor.execute(
+                    f"CREATE UNIQUE INDEX CONCURRENTLY {name} "
+                    f"ON {table} (user_id, (LOWER(name)))")
+                break
+            except IntegrityError:
+                schema_editor.execute(
+                    f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                if attempt == ATTEMPTS - 1:
+                    raise
+
+
+def drop_unique_indexes(apps, schema_editor):
+    for name in INDEXES.values():
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_recipeband'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    create_unique_indexes, drop_unique_indexes),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='ingredient',
+                    constraint=models.UniqueConstraint(django.db.models.expressions.F('user'), django.db.models.functions.text.Lower('name'), name='core_ingredient_user_name_unique'),
+                ),
+                migrations.AddConstraint(
+                    model_name='tag',
+                    constraint=models.UniqueConstraint(django.db.models.expressions.F('user'), django.db.models.functions.text.Lower('name'), name='core_tag_user_name_unique'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_unique_item_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdeletion',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userdeletion',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
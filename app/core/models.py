@@ -7,13 +7,18 @@ import uuid
 import os
 
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core.sharding import assign_shard
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image."""
@@ -39,7 +44,9 @@ class UserManager(BaseUserManager):
         if not email:
             raise ValueError("User must have an email address.")
         # make email normalised
-        user = self.model(email=self.normalize_email(email), **extra_fields)
+        email = self.normalize_email(email)
+        extra_fields.setdefault("shard", assign_shard(email))
+        user = self.model(email=email, **extra_fields)
         # encrypt password
         user.set_password(password)
         user.save(using=self._db)  # standard django's way of saving user to db
@@ -69,6 +76,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # database holding the user's recipes, empty for default (see sharding)
+    shard = models.CharField(max_length=63, blank=True)
 
     # assign appropriate manager for custom user
     # because custom user model is used, we need to provide model manager
@@ -98,6 +107,8 @@ class Recipe(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # users and their data can be on different databases (sharding)
+        db_constraint=False,
     )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -107,6 +118,70 @@ class Recipe(models.Model):
     tags = models.ManyToManyField("Tag")
     ingredients = models.ManyToManyField("Ingredient")
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # image metadata computed once at upload time so clients can reserve
+    # layout space and paint a placeholder without fetching the image.
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_size = models.PositiveIntegerField(null=True, blank=True)
+    image_color = models.CharField(max_length=7, blank=True)
+    image_placeholder = models.CharField(max_length=64, blank=True)
+    # ids and names of the linked tags and ingredients in link order,
+    # denormalized from the M2M links by recipe.arrays to filter and render
+    # recipes without joins
+    tag_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    tag_names = ArrayField(
+        models.CharField(max_length=255), default=list, blank=True)
+    ingredient_ids = ArrayField(
+        models.BigIntegerField(), default=list, blank=True)
+    ingredient_names = ArrayField(
+        models.CharField(max_length=255), default=list, blank=True)
+
+    LINK_ARRAY_FIELDS = [
+        "tag_ids",
+        "tag_names",
+        "ingredient_ids",
+        "ingredient_names",
+    ]
+
+    class Meta:
+        # range filters and ordering of recipe lists, id last for keyset
+        # pagination
+        indexes = [
+            models.Index(
+                fields=["user", "price", "id"],
+                name="core_recipe_user_price_idx",
+            ),
+            models.Index(
+                fields=["user", "time_minutes", "id"],
+                name="core_recipe_user_time_idx",
+            ),
+            # lists in id order and random sampling (recipe.sampling)
+            models.Index(
+                fields=["user", "id"], name="core_recipe_user_id_idx"),
+            # tag/ingredient filters (array overlap and containment)
+            GinIndex(fields=["tag_ids"], name="core_recipe_tag_ids_idx"),
+            GinIndex(
+                fields=["ingredient_ids"],
+                name="core_recipe_ingredient_ids_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # the link arrays are updated in SQL when links change, a full save
+        # of an instance loaded earlier must not write them back
+        if (
+            not self._state.adding
+            and not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.LINK_ARRAY_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -119,8 +194,18 @@ class Tag(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # users and their data can be on different databases (sharding)
+        db_constraint=False,
     )
 
+    class Meta:
+        # one tag per name and user whatever the case, written with an
+        # upsert on this key (see recipe.names)
+        constraints = [
+            models.UniqueConstraint(
+                "user", Lower("name"), name="core_tag_user_name_unique"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -132,7 +217,286 @@ class Ingredient(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # users and their data can be on different databases (sharding)
+        db_constraint=False,
     )
 
+    class Meta:
+        # one ingredient per name and user whatever the case, written with an
+        # upsert on this key (see recipe.names)
+        constraints = [
+            models.UniqueConstraint(
+                "user",
+                Lower("name"),
+                name="core_ingredient_user_name_unique",
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class RecipeFeature(models.Model):
+    """Inverted index of the tags and ingredients of recipes.
+
+    One row per recipe and tag or ingredient, kept in sync with the M2M
+    links by recipe.signals. Looked up by feature to find the recipes
+    sharing features with another one (see recipe.similar).
+    """
+
+    TAG = "t"
+    INGREDIENT = "i"
+    KIND_CHOICES = [
+        (TAG, "Tag"),
+        (INGREDIENT, "Ingredient"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # users and their data can be on different databases (sharding)
+        db_constraint=False,
+    )
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    # id of the tag or ingredient
+    feature_id = models.BigIntegerField()
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="features",
+        # core_recipe(id) is not unique once partitioned (core.partitioning)
+        db_constraint=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "feature_id", "recipe"],
+                name="core_recipefeature_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}{self.feature_id} -> {self.recipe_id}"
+
+
+class RecipePopularity(models.Model):
+    """View count and trending score of a recipe (see recipe.popularity)."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="popularity",
+        # core_recipe(id) is not unique once partitioned (core.partitioning)
+        db_constraint=False,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # users and their data can be on different databases (sharding)
+        db_constraint=False,
+    )
+    views = models.BigIntegerField(default=0)
+    # log2 of the views weighted by 2 ** (time / half life), only grows and
+    # orders recipes like their decayed view counts at any time
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-score"],
+                name="core_popularity_trending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.views} views"
+
+
+class RecipeBand(models.Model):
+    """LSH band key of the MinHash signature of a recipe.
+
+    One row per recipe and band, recomputed by recipe.signals when the
+    title or ingredients change. Recipes sharing a band key with another
+    one are its duplicate candidates (see recipe.duplicates).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # users and their data can be on different databases (sharding)
+        db_constraint=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="bands",
+        # core_recipe(id) is not unique once partitioned (core.partitioning)
+        db_constraint=False,
+    )
+    band = models.PositiveSmallIntegerField()
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "band", "key"],
+                name="core_recipeband_key_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.band}:{self.key} -> {self.recipe_id}"
+
+
+class UserStat(models.Model):
+    """Counter of a user's recipe statistics (see recipe.stats).
+
+    Named counters such as the number of recipes, their total time, the
+    recipes per price range and per tag are incremented as recipes and
+    links change, so reading them doesn't scan the recipes.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # users and their data can be on different databases (sharding)
+        db_constraint=False,
+    )
+    name = models.CharField(max_length=32)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"],
+                name="core_userstat_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class ImageUploadSession(models.Model):
+    """Resumable upload of a recipe image sent in fixed size chunks."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # users and their data can be on different databases (sharding)
+        db_constraint=False,
+    )
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def num_chunks(self):
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, index):
+        """Return the expected length in bytes of chunk `index`."""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f"{self.filename} ({self.id})"
+
+
+class UserDeletion(models.Model):
+    """Pending or finished purge of a deleted user's data (see core.purge)."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    # kept once the user row is deleted at the end of the purge
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="deletion",
+    )
+    email = models.EmailField(max_length=255)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # recipes, tags and ingredients to delete and deleted so far
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # failed purges are retried at retry_at, until attempts reaches
+    # core.purge.MAX_ATTEMPTS
+    attempts = models.PositiveIntegerField(default=0)
+    retry_at = models.DateTimeField(null=True, blank=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        """Return the fraction of the user's rows deleted so far."""
+        if self.status == self.DONE:
+            return 1.0
+        return self.deleted / self.total if self.total else 0.0
+
+    def __str__(self):
+        return f"{self.email} ({self.status})"
+
+
+class Job(models.Model):
+    """Background job run by `manage.py run_worker` (see core.jobs)."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    # registered task name and its keyword arguments
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # user who requested the job, if any, allowed to see its status
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    timeout = models.PositiveIntegerField(help_text="seconds")
+    # not run before run_at, delayed after every failed attempt
+    run_at = models.DateTimeField()
+    # a running job not finished by then is assumed lost and run again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
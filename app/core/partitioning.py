@@ -0,0 +1,261 @@
+"""
+Hash partitioning of the recipe table (PostgreSQL).
+
+core_recipe can be hash partitioned on user_id, so vacuum and index
+maintenance work per partition and queries scoped by user read one of them
+(`python manage.py partition_recipes`). The through tables stay plain: the
+tag and ingredient lookups filter them on tag_id/ingredient_id, which a
+partition key of recipe_id can't prune. A partitioned table can only have
+unique keys including the partition key, the primary key becomes
+(user_id, id) and foreign keys referencing core_recipe(id) are dropped;
+deletes still cascade through the ORM.
+
+A table is rebuilt online: a trigger logs the ids of the rows written
+meanwhile while its rows are copied to the new table in batches, the
+logged rows are copied again until few are left, then the last ones are
+copied and the tables swapped under a lock held for that only. An
+interrupted rebuild leaves the table as it was, running it again starts
+over.
+"""
+import re
+import time
+
+from django.apps import apps
+from django.db import connections, transaction
+
+RECIPE_TABLE = "core_recipe"
+THROUGH_TABLES = ["core_recipe_tags", "core_recipe_ingredients"]
+
+INDEX_RE = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ (.*)$")
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    return cursor.fetchone()[0] == "p"
+
+
+def _copy_batch(cursor, source, target, after, batch_size):
+    """Copy the rows of source with the next ids after `after`.
+
+    Returns the last id copied, None once every row is.
+    """
+    cursor.execute(
+        f"WITH batch AS (SELECT * FROM {source} WHERE id > %s "
+        "ORDER BY id LIMIT %s), "
+        f"copied AS (INSERT INTO {target} SELECT * FROM batch) "
+        "SELECT MAX(id) FROM batch",
+        [after, batch_size],
+    )
+    return cursor.fetchone()[0]
+
+
+def _copy_changes(cursor, source, target, log, batch_size):
+    """Copy again up to batch_size rows logged as changed.
+
+    Returns the number of rows logged.
+    """
+    cursor.execute(
+        f"DELETE FROM {log} WHERE ctid IN "
+        f"(SELECT ctid FROM {log} LIMIT %s) RETURNING id",
+        [batch_size],
+    )
+    ids = list({row[0] for row in cursor.fetchall()})
+    if ids:
+        # deleted rows are only removed, the others replaced
+        cursor.execute(f"DELETE FROM {target} WHERE id = ANY(%s)", [ids])
+        cursor.execute(
+            f"INSERT INTO {target} SELECT * FROM {source} "
+            "WHERE id = ANY(%s)",
+            [ids],
+        )
+    return len(ids)
+
+
+def _rebuild(alias, table, partition_sql, primary_key, batch_size, pause):
+    """Replace table by a copy created with partition_sql, keeping its rows.
+
+    partition_sql completes the CREATE TABLE of the copy (PARTITION BY
+    clause) and creates its partitions, formatted with the new table name.
+    """
+    connection = connections[alias]
+    new = f"{table}_new"
+    log = f"{table}_changes"
+    renames = []
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        # deferred foreign key checks pending on the table forbid altering it
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        # left over by an interrupted rebuild
+        cursor.execute(f"DROP FUNCTION IF EXISTS {log}_record() CASCADE")
+        cursor.execute(f"DROP TABLE IF EXISTS {log}, {new} CASCADE")
+        cursor.execute(
+            f"CREATE TABLE {new} (LIKE {table} "
+            "INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            + partition_sql.format(table=new)
+        )
+        cursor.execute(
+            f"ALTER TABLE {new} ADD CONSTRAINT {new}_pkey "
+            f"PRIMARY KEY ({primary_key})"
+        )
+        renames.append(("CONSTRAINT", f"{new}_pkey", f"{table}_pkey"))
+        # unique and foreign keys, under their names
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) "
+            "FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('u', 'f') "
+            "ORDER BY conname",
+            [table],
+        )
+        for index, (name, kind, definition) in enumerate(cursor.fetchall()):
+            if kind == "u":
+                # backed by an index, named like it until the swap
+                temporary = f"{new}_u{index}"
+                renames.append(("CONSTRAINT", temporary, name))
+                name = temporary
+            cursor.execute(
+                f"ALTER TABLE {new} ADD CONSTRAINT {name} {definition}")
+        # the other indexes, an index on id alone only when partitioned
+        cursor.execute(
+            "SELECT c.relname, pg_get_indexdef(i.indexrelid) "
+            "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = %s::regclass AND NOT EXISTS ("
+            "SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid) "
+            "ORDER BY c.relname",
+            [table],
+        )
+        for index, (name, definition) in enumerate(cursor.fetchall()):
+            unique, rest = INDEX_RE.match(definition).groups()
+            if rest == "USING btree (id)":
+                continue
+            temporary = f"{new}_i{index}"
+            cursor.execute(
+                f"CREATE {unique or ''}INDEX {temporary} ON {new} {rest}")
+            renames.append(("INDEX", temporary, name))
+        if partition_sql:
+            cursor.execute(f"CREATE INDEX {table}_id_part ON {new} (id)")
+
+        cursor.execute(f"CREATE TABLE {log} (id bigint NOT NULL)")
+        cursor.execute(
+            f"CREATE FUNCTION {log}_record() RETURNS trigger "
+            "LANGUAGE plpgsql AS $$ BEGIN "
+            "IF TG_OP = 'DELETE' THEN "
+            f"INSERT INTO {log} (id) VALUES (OLD.id); "
+            f"ELSE INSERT INTO {log} (id) VALUES (NEW.id); "
+            "END IF; RETURN NULL; END $$"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {log} AFTER INSERT OR UPDATE OR DELETE "
+            f"ON {table} FOR EACH ROW EXECUTE FUNCTION {log}_record()"
+        )
+
+    last = 0
+    while last is not None:
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            last = _copy_batch(cursor, table, new, last, batch_size)
+        if pause:
+            time.sleep(pause)
+    changed = batch_size
+    while changed >= batch_size:
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            changed = _copy_changes(cursor, table, new, log, batch_size)
+
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        while _copy_changes(cursor, table, new, log, batch_size):
+            pass
+        cursor.execute(f"DROP TABLE {log}")
+        cursor.execute(f"DROP FUNCTION {log}_record() CASCADE")
+        # the id sequence belongs to the old table, keep it when dropping it
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        (sequence,) = cursor.fetchone()
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {new}.id")
+        # drops the foreign keys referencing the old table as well
+        cursor.execute(f"DROP TABLE {table} CASCADE")
+        cursor.execute(f"ALTER TABLE {new} RENAME TO {table}")
+        for kind, temporary, name in renames:
+            if kind == "INDEX":
+                cursor.execute(f"ALTER INDEX {temporary} RENAME TO {name}")
+            else:
+                cursor.execute(
+                    f"ALTER TABLE {table} RENAME CONSTRAINT {temporary} "
+                    f"TO {name}")
+
+
+def _recipe_references():
+    """Return (table, column) of the foreign keys to core_recipe(id)."""
+    from core.models import Recipe
+
+    references = []
+    for model in apps.get_models(include_auto_created=True):
+        for field in model._meta.local_fields:
+            if (
+                field.remote_field is not None
+                and field.remote_field.model is Recipe
+                and field.db_constraint
+            ):
+                references.append((model._meta.db_table, field.column))
+    return references
+
+
+def _add_recipe_references(alias):
+    """Restore the foreign keys to core_recipe once it is plain again.
+
+    They are added NOT VALID under a short lock, then validated without
+    blocking writes.
+    """
+    references = _recipe_references()
+    with transaction.atomic(using=alias), \
+            connections[alias].cursor() as cursor:
+        for table, column in references:
+            cursor.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fk "
+                f"FOREIGN KEY ({column}) REFERENCES {RECIPE_TABLE} (id) "
+                "DEFERRABLE INITIALLY DEFERRED NOT VALID"
+            )
+    with connections[alias].cursor() as cursor:
+        for table, column in references:
+            cursor.execute(
+                f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_fk")
+
+
+def _merge_through_tables(alias, batch_size, pause):
+    # partitioned by recipe_id by earlier versions
+    for table in THROUGH_TABLES:
+        with connections[alias].cursor() as cursor:
+            partitioned = is_partitioned(cursor, table)
+        if partitioned:
+            _rebuild(alias, table, "", "id", batch_size, pause)
+
+
+def partition(alias, partitions, batch_size=10000, pause=0):
+    """Hash partition core_recipe of database alias on user_id.
+
+    Returns False when it already is.
+    """
+    _merge_through_tables(alias, batch_size, pause)
+    with connections[alias].cursor() as cursor:
+        if is_partitioned(cursor, RECIPE_TABLE):
+            return False
+    partition_sql = "PARTITION BY HASH (user_id); " + "; ".join(
+        f"CREATE TABLE {RECIPE_TABLE}_p{remainder} PARTITION OF {{table}} "
+        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        for remainder in range(partitions)
+    )
+    _rebuild(
+        alias, RECIPE_TABLE, partition_sql, "user_id, id", batch_size, pause)
+    return True
+
+
+def merge(alias, batch_size=10000, pause=0):
+    """Turn core_recipe of database alias back into a plain table.
+
+    Returns False when it is not partitioned.
+    """
+    _merge_through_tables(alias, batch_size, pause)
+    with connections[alias].cursor() as cursor:
+        if not is_partitioned(cursor, RECIPE_TABLE):
+            return False
+    _rebuild(alias, RECIPE_TABLE, "", "id", batch_size, pause)
+    _add_recipe_references(alias)
+    return True
@@ -0,0 +1,131 @@
+"""
+Deferred deletion of users.
+
+Deleting a user cascades to all their recipes, tags, ingredients and links,
+which for large accounts locks many rows in one long transaction. Instead
+the user is deactivated right away and their data is purged afterwards in
+small batches, each committed on its own, by a background job (or
+`manage.py purge_users`). A failed purge is retried with a growing delay
+(see core.jobs.retry_delay) up to MAX_ATTEMPTS times.
+"""
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.jobs import enqueue, retry_delay
+from core.models import Ingredient, Recipe, Tag, UserDeletion, UserStat
+from core.sharding import shard_for_user
+
+# a running purge not updated for this long is assumed dead and resumed
+STALE_AFTER = timedelta(minutes=10)
+# purge attempts of a deletion before it is left failed
+MAX_ATTEMPTS = 5
+
+
+def schedule_user_deletion(user):
+    """Deactivate user and queue the purge of their data."""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+        Token.objects.filter(user=user).delete()
+        deletion, created = UserDeletion.objects.get_or_create(
+            user=user, defaults={"email": user.email})
+        if created:
+            from core.tasks import purge_deleted_user
+
+            enqueue(purge_deleted_user, deletion_id=deletion.id)
+    return deletion
+
+
+def start(deletion):
+    """Mark a locked deletion as running one more attempt."""
+    deletion.status = UserDeletion.RUNNING
+    deletion.attempts += 1
+    deletion.retry_at = None
+    deletion.save(update_fields=[
+        "status", "attempts", "retry_at", "updated_at"])
+
+
+def claim_next():
+    """Mark the oldest deletion to run as running and return it.
+
+    Pending deletions are claimed, as well as running ones gone stale and
+    failed ones due for a retry.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        deletion = (
+            UserDeletion.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=UserDeletion.PENDING)
+                | Q(status=UserDeletion.RUNNING,
+                    updated_at__lt=now - STALE_AFTER)
+                | Q(status=UserDeletion.FAILED, retry_at__lte=now)
+            )
+            .order_by("requested_at")
+            .first()
+        )
+        if deletion is not None:
+            start(deletion)
+    return deletion
+
+
+def purge_user(deletion, batch_size=500, pause=0):
+    """Delete the data of a deleted user in batches, then the user.
+
+    Progress is saved after every batch so an interrupted purge resumes
+    where it stopped. `pause` seconds are slept between batches to leave
+    room to other queries.
+    """
+    user = deletion.user
+    try:
+        if user is not None:
+            db = shard_for_user(user)
+            querysets = [
+                model.objects.using(db).filter(user=user)
+                for model in (Recipe, Tag, Ingredient)
+            ]
+            if not deletion.total:
+                deletion.total = sum(qs.count() for qs in querysets)
+                deletion.save(update_fields=["total", "updated_at"])
+
+            for queryset in querysets:
+                while True:
+                    ids = list(
+                        queryset.values_list("id", flat=True)[:batch_size])
+                    if not ids:
+                        break
+                    with transaction.atomic(using=db):
+                        # cascades to the links and upload sessions
+                        queryset.filter(id__in=ids).delete()
+                    deletion.deleted += len(ids)
+                    deletion.save(update_fields=["deleted", "updated_at"])
+                    if pause:
+                        time.sleep(pause)
+
+            # statistics live with the recipes, possibly on another shard
+            UserStat.objects.using(db).filter(user=user).delete()
+            # only small tables (tokens, admin log) are left to cascade
+            user.delete()
+            deletion.user = None
+    except Exception as exc:
+        deletion.status = UserDeletion.FAILED
+        deletion.error = str(exc)
+        # retried by claim_next, or left failed once out of attempts
+        deletion.retry_at = (
+            timezone.now() + timedelta(seconds=retry_delay(deletion.attempts))
+            if deletion.attempts < MAX_ATTEMPTS
+            else None
+        )
+        deletion.save(
+            update_fields=["status", "error", "retry_at", "updated_at"])
+        raise
+
+    deletion.status = UserDeletion.DONE
+    deletion.finished_at = timezone.now()
+    deletion.save(update_fields=["status", "finished_at", "updated_at"])
+    return deletion
@@ -0,0 +1,99 @@
+"""
+Database routers.
+
+With a `replica` entry in DATABASES, reads of safe requests go to the
+replica while writes, and reads of clients who recently wrote, use the
+primary (`default`) database so they always see their own changes.
+
+With more than one of SHARD_DATABASES, recipe related models are routed to
+the shard of the user (see core.sharding) before any replica routing.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core import sharding
+
+REPLICA = "replica"
+
+_use_primary = contextvars.ContextVar("use_primary", default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_primary(enabled=True):
+    """Route every read in the block to the primary database."""
+    token = _use_primary.set(enabled)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Send reads to the replica unless pinned to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if not replica_configured() or _use_primary.get():
+            return "default"
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets its schema through replication
+        if db == REPLICA:
+            return False
+        return None
+
+
+class ShardRouter:
+    """Send sharded models to the shard of the user they belong to.
+
+    Every shard is migrated with the full schema, only rows are split.
+    """
+
+    def _db_for_model(self, model, hints):
+        if not sharding.sharding_enabled() or not sharding.is_sharded(model):
+            return None
+        instance = hints.get("instance")
+        if instance is not None and sharding.is_sharded(type(instance)):
+            # related managers and instances stay on the shard they came
+            # from, new rows go to the shard of their user
+            if instance._state.db:
+                return instance._state.db
+            if getattr(instance, "user_id", None) is not None:
+                return sharding.shard_for_user(instance.user)
+        elif isinstance(instance, get_user_model()):
+            # reverse managers of a user, e.g. user.recipe_set
+            return sharding.shard_for_user(instance)
+        shard = sharding.current_shard()
+        if shard is None:
+            # outside of API requests (admin, jobs, commands) there is no
+            # request user to route by, defaulting would read another shard
+            raise sharding.ShardNotActive(
+                f"No shard active to query {model._meta.label}, use "
+                "sharding.use_shard(shard_for_user(user)) or "
+                ".using(shard_for_user(user))."
+            )
+        return shard
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # users live on default, their data on a shard
+        return True
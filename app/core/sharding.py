@@ -0,0 +1,153 @@
+"""
+User sharding.
+
+Every recipe related model is scoped by user, so a user's recipes, tags,
+ingredients and their links live together on one of SHARD_DATABASES. The
+user table itself stays on `default` and records the shard in `User.shard`
+(empty means `default`).
+"""
+import contextvars
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+# core models stored on the user's shard, including M2M through tables
+SHARDED_MODELS = {
+    "recipe",
+    "recipe_tags",
+    "recipe_ingredients",
+    "tag",
+    "ingredient",
+    "recipefeature",
+    "recipepopularity",
+    "recipeband",
+    "userstat",
+    "imageuploadsession",
+}
+
+_current_shard = contextvars.ContextVar("current_shard", default=None)
+
+
+class ShardNotActive(LookupError):
+    """Raised when a sharded model is queried without a shard to use."""
+
+
+def sharding_enabled():
+    return len(settings.SHARD_DATABASES) > 1
+
+
+def is_sharded(model):
+    return (
+        model._meta.app_label == "core"
+        and model._meta.model_name in SHARDED_MODELS
+    )
+
+
+def current_shard():
+    """Return the shard activated for the current request, if any."""
+    return _current_shard.get()
+
+
+def shard_for_user(user):
+    """Return the database alias holding the data of user."""
+    return user.shard or "default"
+
+
+def assign_shard(email):
+    """Pick the shard of a new user, spread evenly by email hash."""
+    if not sharding_enabled():
+        return ""
+    shards = settings.SHARD_DATABASES
+    return shards[zlib.crc32(email.lower().encode()) % len(shards)]
+
+
+def activate(alias):
+    """Route following queries on sharded models to shard `alias`."""
+    return _current_shard.set(alias)
+
+
+def deactivate(token):
+    """Undo the matching `activate` call."""
+    _current_shard.reset(token)
+
+
+@contextmanager
+def use_shard(alias):
+    """Route queries on sharded models in the block to shard `alias`."""
+    token = activate(alias)
+    try:
+        yield
+    finally:
+        deactivate(token)
+
+
+def _copy(queryset, target, batch_size):
+    """Insert rows of queryset into target keeping their primary keys."""
+    model = queryset.model
+    batch = []
+    for obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.using(target).bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.using(target).bulk_create(batch)
+
+
+def move_user(user, target, batch_size=1000):
+    """Copy the data of user to shard target then remove it from source.
+
+    Primary keys are kept, shards need disjoint id ranges (see
+    `shard_users --init-sequences`). Writes of the user while the move runs
+    are not copied, move users when they are idle.
+    """
+    from core.models import (
+        Recipe,
+        Tag,
+        Ingredient,
+        RecipeFeature,
+        RecipePopularity,
+        RecipeBand,
+        UserStat,
+        ImageUploadSession,
+    )
+
+    source = shard_for_user(user)
+    if source == target:
+        return
+
+    recipes = Recipe.objects.using(source).filter(user=user)
+    with transaction.atomic(using=target):
+        _copy(Tag.objects.using(source).filter(user=user), target, batch_size)
+        _copy(Ingredient.objects.using(source).filter(user=user), target,
+              batch_size)
+        _copy(recipes, target, batch_size)
+        for through in (Recipe.tags.through, Recipe.ingredients.through):
+            _copy(
+                through.objects.using(source).filter(recipe__user=user),
+                target,
+                batch_size,
+            )
+        _copy(RecipeFeature.objects.using(source).filter(user=user), target,
+              batch_size)
+        _copy(RecipePopularity.objects.using(source).filter(user=user),
+              target, batch_size)
+        _copy(RecipeBand.objects.using(source).filter(user=user), target,
+              batch_size)
+        _copy(UserStat.objects.using(source).filter(user=user), target,
+              batch_size)
+        _copy(ImageUploadSession.objects.using(source).filter(user=user),
+              target, batch_size)
+
+    user.shard = target
+    user.save(update_fields=["shard"])
+
+    with transaction.atomic(using=source):
+        # cascades to the through tables, features, popularity, bands and
+        # upload sessions
+        recipes.delete()
+        Tag.objects.using(source).filter(user=user).delete()
+        Ingredient.objects.using(source).filter(user=user).delete()
+        UserStat.objects.using(source).filter(user=user).delete()
@@ -0,0 +1,34 @@
+"""
+Background tasks of the core app, run by `manage.py run_worker`.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from core.jobs import task
+from core.models import UserDeletion
+from core.purge import MAX_ATTEMPTS, STALE_AFTER, purge_user, start
+
+
+@task(max_attempts=MAX_ATTEMPTS, timeout=6 * 3600)
+def purge_deleted_user(deletion_id):
+    """Purge the data of a deleted user, resuming previous attempts."""
+    with transaction.atomic():
+        deletion = UserDeletion.objects.select_for_update().get(
+            id=deletion_id)
+        if deletion.status == UserDeletion.DONE:
+            return None
+        if (
+            deletion.status == UserDeletion.RUNNING
+            and deletion.updated_at > timezone.now() - STALE_AFTER
+        ):
+            # picked up by `purge_users`, retried later
+            raise RuntimeError("Deletion already running.")
+        if (
+            deletion.status == UserDeletion.FAILED
+            and deletion.retry_at is None
+        ):
+            # out of attempts, see purge.MAX_ATTEMPTS
+            return None
+        start(deletion)
+    purge_user(deletion)
+    return {"deleted": deletion.deleted}
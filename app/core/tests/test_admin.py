@@ -6,6 +6,8 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core.models import Recipe
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django admin."""
@@ -46,3 +48,24 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_delete_user_deferred(self) -> None:
+        """Test deleting a user in admin only deactivates it."""
+        url = reverse("admin:core_user_delete", args=[self.user.id])
+        res = self.client.post(url, {"post": "yes"})
+
+        self.assertEqual(res.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.deletion.status, "pending")
+
+    def test_recipe_pages(self) -> None:
+        """Test the recipe list and change pages work."""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=5, price=1)
+
+        res = self.client.get(reverse("admin:core_recipe_changelist"))
+        self.assertContains(res, "Curry")
+        res = self.client.get(
+            reverse("admin:core_recipe_change", args=[recipe.id]))
+        self.assertEqual(res.status_code, 200)
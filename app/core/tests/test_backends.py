@@ -0,0 +1,53 @@
+"""
+Tests for the database backend.
+"""
+from unittest.mock import patch
+
+from django.db import close_old_connections, connection
+from django.test import TransactionTestCase
+
+
+class HealthCheckTests(TransactionTestCase):
+    """Test health checks of persistent connections."""
+
+    def setUp(self):
+        self.health_check_enabled = connection.health_check_enabled
+        connection.health_check_enabled = True
+        connection.ensure_connection()
+        # keep the connection across simulated requests
+        connection.close_at = None
+
+    def tearDown(self):
+        connection.health_check_enabled = self.health_check_enabled
+
+    def test_healthy_connection_reused(self):
+        """Test a working connection is reused after a single check."""
+        old = connection.connection
+        close_old_connections()
+
+        with patch.object(
+            connection, "is_usable", return_value=True
+        ) as usable:
+            connection.cursor().execute("SELECT 1")
+            connection.cursor().execute("SELECT 1")
+
+        usable.assert_called_once()
+        self.assertIs(connection.connection, old)
+
+    def test_broken_connection_replaced(self):
+        """Test a connection failing the check is replaced transparently."""
+        old = connection.connection
+        close_old_connections()
+
+        with patch.object(connection, "is_usable", return_value=False):
+            connection.cursor().execute("SELECT 1")
+
+        self.assertIsNotNone(connection.connection)
+        self.assertIsNot(connection.connection, old)
+
+    def test_no_check_within_request(self):
+        """Test the check only runs on first use in a request."""
+        with patch.object(connection, "is_usable") as usable:
+            connection.cursor().execute("SELECT 1")
+
+        usable.assert_not_called()
@@ -0,0 +1,64 @@
+"""
+Tests for the system checks of the core app.
+"""
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.checks import check_pooled_timezone, check_shared_cache
+
+LOCMEM = {"default": {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+REDIS = {"default": {
+    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+    "LOCATION": "redis://cache:6379/0",
+}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Test several web workers require a shared cache."""
+
+    @override_settings(WEB_WORKERS=4, CACHES=LOCMEM)
+    def test_local_cache_with_workers(self):
+        """Test a process local cache fails with several workers."""
+        errors = check_shared_cache(None)
+
+        self.assertEqual([error.id for error in errors], ["core.E001"])
+
+    @override_settings(WEB_WORKERS=1, CACHES=LOCMEM)
+    def test_local_cache_single_worker(self):
+        """Test a process local cache is fine with one worker."""
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(WEB_WORKERS=4, CACHES=REDIS)
+    def test_shared_cache(self):
+        """Test a shared cache passes."""
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class PooledTimezoneCheckTests(TestCase):
+    """Test a transaction pooler requires a UTC database timezone."""
+
+    @override_settings(DB_POOL_MODE="transaction")
+    def test_utc_database(self):
+        """Test the UTC test database passes."""
+        self.assertEqual(
+            check_pooled_timezone(None, databases=["default"]), [])
+
+    @override_settings(DB_POOL_MODE="transaction")
+    @patch("core.checks.connections")
+    def test_other_timezone(self, connections):
+        """Test another default timezone fails behind a pooler."""
+        cursor = connections["default"].cursor.return_value.__enter__()
+        cursor.fetchone.return_value = ("Europe/Paris",)
+
+        errors = check_pooled_timezone(None, databases=["default"])
+
+        self.assertEqual([error.id for error in errors], ["core.E002"])
+
+    @patch("core.checks.connections", new_callable=MagicMock)
+    def test_session_pooling(self, connections):
+        """Test the database is not queried without a pooler."""
+        self.assertEqual(
+            check_pooled_timezone(None, databases=["default"]), [])
+        connections.__getitem__.assert_not_called()
@@ -1,12 +1,19 @@
 """Test custom Django management commands.
 """
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from core import models, partitioning
+from core.partitioning import is_partitioned
+from recipe.duplicates import BANDS
 
 
 @patch("core.management.commands.wait_for_db.Command.check")
@@ -32,3 +39,273 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=["default"])
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    """Test the benchmark command."""
+
+    def test_benchmark_connections(self) -> None:
+        """Test connection benchmark reports every mode."""
+        out = StringIO()
+
+        call_command("benchmark", "connections", iterations=3, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("CONN_MAX_AGE=0", output)
+        self.assertIn("health checks", output)
+
+    def test_benchmark_recipes_seeds_data(self) -> None:
+        """Test recipe benchmark seeds users and reports both queries."""
+        out = StringIO()
+
+        call_command(
+            "benchmark",
+            "recipes",
+            iterations=3,
+            seed_users=2,
+            recipes_per_user=10,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn("list (", output)
+        self.assertIn("filter by tags", output)
+        self.assertEqual(models.Recipe.objects.count(), 20)
+
+    def test_benchmark_autocomplete(self) -> None:
+        """Test autocomplete benchmark reports database and cache timings."""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="test123")
+        models.Tag.objects.create(user=user, name="Vegan")
+        out = StringIO()
+
+        call_command("benchmark", "autocomplete", iterations=3, stdout=out)
+
+        self.assertIn("in-process cache", out.getvalue())
+
+    def test_benchmark_cookable(self) -> None:
+        """Test cookable benchmark seeds ingredients and reports pantries."""
+        out = StringIO()
+
+        call_command(
+            "benchmark",
+            "cookable",
+            iterations=2,
+            seed_users=1,
+            recipes_per_user=5,
+            stdout=out,
+        )
+
+        self.assertIn("pantry of 20", out.getvalue())
+        self.assertTrue(models.Ingredient.objects.exists())
+
+    def test_benchmark_similar(self) -> None:
+        """Test similar benchmark indexes the seeded recipe links."""
+        out = StringIO()
+
+        call_command(
+            "benchmark",
+            "similar",
+            iterations=2,
+            seed_users=1,
+            recipes_per_user=5,
+            stdout=out,
+        )
+
+        self.assertIn("similar recipes", out.getvalue())
+        self.assertEqual(
+            models.RecipeFeature.objects.count(),
+            models.Recipe.tags.through.objects.count()
+            + models.Recipe.ingredients.through.objects.count(),
+        )
+
+    def test_benchmark_random(self) -> None:
+        """Test random benchmark compares sorting with id probes."""
+        out = StringIO()
+
+        call_command(
+            "benchmark",
+            "random",
+            iterations=2,
+            seed_users=1,
+            recipes_per_user=5,
+            stdout=out,
+        )
+
+        self.assertIn("order by random()", out.getvalue())
+        self.assertIn("id probes", out.getvalue())
+
+
+class CheckRecipeArraysCommandTests(TestCase):
+    """Test the recipe link arrays consistency check."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="test123")
+        self.recipe = models.Recipe.objects.create(
+            user=user, title="Curry", time_minutes=5, price=1)
+        self.recipe.tags.add(models.Tag.objects.create(user=user, name="Hot"))
+
+    def test_in_sync(self) -> None:
+        """Test arrays maintained by the signals pass the check."""
+        out = StringIO()
+
+        call_command("check_recipe_arrays", stdout=out)
+
+        self.assertIn("in sync", out.getvalue())
+
+    def test_drift_reported_and_fixed(self) -> None:
+        """Test drifted arrays fail the check until fixed."""
+        models.Recipe.objects.update(tag_ids=[], tag_names=[])
+
+        with self.assertRaises(CommandError):
+            call_command("check_recipe_arrays", stdout=StringIO())
+
+        call_command("check_recipe_arrays", fix=True, stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_names, ["Hot"])
+        call_command("check_recipe_arrays", stdout=StringIO())
+
+
+class RebuildUserStatsCommandTests(TestCase):
+    """Test recomputing user statistics."""
+
+    def test_rebuild(self) -> None:
+        """Test counters missed by bulk updates are recomputed."""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="test123")
+        models.Recipe.objects.create(
+            user=user, title="Curry", time_minutes=5, price=1)
+        models.Recipe.objects.update(time_minutes=25)
+
+        call_command("rebuild_user_stats", user=user.id, stdout=StringIO())
+
+        self.assertEqual(
+            models.UserStat.objects.get(user=user, name="time_minutes").value,
+            25,
+        )
+
+    def test_unknown_user(self) -> None:
+        """Test an unknown user id is an error."""
+        with self.assertRaises(CommandError):
+            call_command("rebuild_user_stats", user=0, stdout=StringIO())
+
+
+class RebuildDuplicateIndexCommandTests(TestCase):
+    """Test recomputing the duplicate detection bands."""
+
+    def test_rebuild(self) -> None:
+        """Test recipes written without signals get their bands."""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="test123")
+        recipe = models.Recipe.objects.create(
+            user=user, title="Curry", time_minutes=5, price=1)
+        models.RecipeBand.objects.all().delete()
+
+        call_command(
+            "rebuild_duplicate_index", user=user.id, stdout=StringIO())
+
+        self.assertEqual(
+            models.RecipeBand.objects.filter(recipe=recipe).count(),
+            BANDS,
+        )
+
+    def test_unknown_user(self) -> None:
+        """Test an unknown user id is an error."""
+        with self.assertRaises(CommandError):
+            call_command(
+                "rebuild_duplicate_index", user=0, stdout=StringIO())
+
+
+class MergeDuplicateNamesCommandTests(TestCase):
+    """Test merging tags and ingredients differing only by case."""
+
+    def test_merge(self) -> None:
+        """Test duplicates are merged in batches and reported."""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="test123")
+        with connection.schema_editor() as editor:
+            editor.remove_constraint(
+                models.Tag, models.Tag._meta.constraints[0])
+        for name in ("Vegan", "vegan", "Quick", "quick"):
+            models.Tag.objects.create(user=user, name=name)
+        out = StringIO()
+
+        call_command("merge_duplicate_names", batch_size=1, stdout=out)
+
+        self.assertIn("default: merged 2 tags", out.getvalue())
+        self.assertEqual(
+            sorted(models.Tag.objects.values_list("name", flat=True)),
+            ["Quick", "Vegan"],
+        )
+
+
+class PartitionRecipesCommandTests(TestCase):
+    """Test partitioning the recipe table."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="test123")
+        self.tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        for index in range(5):
+            recipe = models.Recipe.objects.create(
+                user=self.user, title=f"Soup {index}", time_minutes=5,
+                price=1)
+            recipe.tags.add(self.tag)
+
+    def test_partition_and_merge(self) -> None:
+        """Test the rows are kept and the table stays usable both ways."""
+        out = StringIO()
+
+        call_command(
+            "partition_recipes", partitions=2, batch_size=2, stdout=out)
+
+        self.assertIn("default: core_recipe partitioned", out.getvalue())
+        with connection.cursor() as cursor:
+            self.assertTrue(is_partitioned(cursor, "core_recipe"))
+            self.assertFalse(is_partitioned(cursor, "core_recipe_tags"))
+        self.assertEqual(
+            models.Recipe.objects.filter(tags=self.tag).count(), 5)
+        models.Recipe.objects.create(
+            user=self.user, title="Stew", time_minutes=5, price=1)
+
+        call_command("partition_recipes", merge=True, stdout=out)
+
+        self.assertIn("default: core_recipe merged", out.getvalue())
+        with connection.cursor() as cursor:
+            self.assertFalse(is_partitioned(cursor, "core_recipe"))
+            cursor.execute(
+                "SELECT conrelid::regclass::text FROM pg_constraint "
+                "WHERE confrelid = 'core_recipe'::regclass")
+            self.assertIn(
+                "core_recipe_tags", [row[0] for row in cursor.fetchall()])
+        self.assertEqual(models.Recipe.objects.count(), 6)
+
+    def test_changes_while_copying(self) -> None:
+        """Test rows written during the copy are copied again."""
+        copy_batch = partitioning._copy_batch
+        soup = models.Recipe.objects.get(title="Soup 0")
+
+        def copy_and_write(cursor, source, target, after, batch_size):
+            last = copy_batch(cursor, source, target, after, batch_size)
+            if after == 0:
+                models.Recipe.objects.filter(id=soup.id).update(title="Stew")
+                models.Recipe.objects.filter(title="Soup 4").delete()
+            return last
+
+        with patch(
+                "core.partitioning._copy_batch", side_effect=copy_and_write):
+            partitioning.partition("default", 2, batch_size=2)
+
+        self.assertEqual(
+            sorted(models.Recipe.objects.values_list("title", flat=True)),
+            ["Soup 1", "Soup 2", "Soup 3", "Stew"],
+        )
+
+    def test_arguments(self) -> None:
+        """Test one of --partitions and --merge is required."""
+        for options in ({}, {"partitions": 1},
+                        {"partitions": 2, "merge": True}):
+            with self.assertRaises(CommandError):
+                call_command("partition_recipes", **options)
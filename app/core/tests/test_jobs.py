@@ -0,0 +1,151 @@
+"""
+Tests for background jobs.
+"""
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import models
+from core.jobs import (
+    JobTimeout,
+    claim,
+    enqueue,
+    retry_delay,
+    run,
+    task,
+    time_limit,
+)
+
+calls = []
+
+
+@task(max_attempts=2)
+def record(value):
+    calls.append(value)
+    return {"value": value}
+
+
+@task(max_attempts=2)
+def explode():
+    raise ValueError("boom")
+
+
+def unregistered():
+    pass
+
+
+class JobTests(TestCase):
+    """Test queueing and running jobs."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        """Test a queued job is claimed, run and its result stored."""
+        job = enqueue(record, value=1)
+
+        self.assertEqual(claim(), job)
+        self.assertIsNone(claim())
+        run(models.Job.objects.get(id=job.id))
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [1])
+        self.assertEqual(job.status, models.Job.SUCCEEDED)
+        self.assertEqual(job.result, {"value": 1})
+        self.assertEqual(job.attempts, 1)
+
+    def test_enqueue_unregistered(self):
+        """Test only registered tasks can be queued."""
+        with self.assertRaises(ValueError):
+            enqueue(unregistered)
+
+    def test_delayed_job_not_claimed(self):
+        """Test jobs are not run before their time."""
+        enqueue(record, delay=60, value=1)
+
+        self.assertIsNone(claim())
+
+    @override_settings(JOB_RETRY_BACKOFF=10, JOB_RETRY_BACKOFF_MAX=30)
+    def test_retry_with_backoff(self):
+        """Test failed jobs are retried later, then marked failed."""
+        job = enqueue(explode)
+
+        run(claim())
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertIn("boom", job.error)
+        self.assertIsNone(claim())
+
+        models.Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        run(claim())
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual([retry_delay(n) for n in (1, 2, 3)], [10, 20, 30])
+
+    def test_lost_job_claimed_again(self):
+        """Test jobs of dead workers are run again once their lock expires."""
+        job = enqueue(record, value=1)
+        claim()
+        models.Job.objects.filter(id=job.id).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(claim(), job)
+
+    def test_time_limit(self):
+        """Test code running past its time limit is interrupted."""
+        with self.assertRaises(JobTimeout):
+            with time_limit(0.05):
+                time.sleep(1)
+
+    def test_jobs_kept_when_user_deleted(self):
+        """Test jobs outlive the user who requested them."""
+        user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        job = enqueue(record, user=user, value=1)
+        user.delete()
+
+        job.refresh_from_db()
+        self.assertIsNone(job.user)
+
+
+class RunWorkerCommandTests(TransactionTestCase):
+    """Test the run_worker command."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_burst_runs_due_jobs(self):
+        """Test a burst worker runs every due job then exits."""
+        for value in range(3):
+            enqueue(record, value=value)
+        out = StringIO()
+
+        call_command("run_worker", burst=True, concurrency=1, stdout=out)
+
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertFalse(
+            models.Job.objects.exclude(status=models.Job.SUCCEEDED).exists())
+        self.assertIn("Worker stopped.", out.getvalue())
+
+    def test_concurrent_workers(self):
+        """Test worker processes share the queue without running twice."""
+        for value in range(6):
+            enqueue(record, value=value)
+
+        call_command(
+            "run_worker", burst=True, concurrency=2, stdout=StringIO())
+
+        self.assertEqual(
+            models.Job.objects.filter(
+                status=models.Job.SUCCEEDED, attempts=1).count(),
+            6,
+        )
@@ -0,0 +1,180 @@
+"""
+Tests for deferred user deletion.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core import models
+from core.jobs import claim, run
+from core.purge import (
+    MAX_ATTEMPTS,
+    claim_next,
+    purge_user,
+    schedule_user_deletion,
+)
+
+
+def create_recipe(user, tags=()):
+    """Create and return a recipe linked to new tags."""
+    recipe = models.Recipe.objects.create(
+        user=user,
+        title="Sample recipe",
+        time_minutes=5,
+        price=Decimal("1.00"),
+    )
+    for name in tags:
+        recipe.tags.add(models.Tag.objects.create(user=user, name=name))
+    return recipe
+
+
+class PurgeTests(TestCase):
+    """Test deleting users and their data in batches."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+
+    def test_schedule_deactivates_user(self):
+        """Test scheduling a deletion deactivates the user at once."""
+        Token.objects.create(user=self.user)
+        create_recipe(self.user)
+
+        deletion = schedule_user_deletion(self.user)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(deletion.status, models.UserDeletion.PENDING)
+        self.assertTrue(models.Recipe.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            models.Job.objects.get().kwargs, {"deletion_id": deletion.id})
+
+    def test_purge_job(self):
+        """Test the queued job purges the user."""
+        create_recipe(self.user, tags=["Vegan"])
+        deletion = schedule_user_deletion(self.user)
+
+        job = run(claim())
+
+        deletion.refresh_from_db()
+        self.assertEqual(job.status, models.Job.SUCCEEDED)
+        self.assertEqual(job.result, {"deleted": 2})
+        self.assertEqual(deletion.status, models.UserDeletion.DONE)
+
+    def test_purge_job_waits_for_running_purge(self):
+        """Test the job is retried while `purge_users` runs the deletion."""
+        schedule_user_deletion(self.user)
+        claim_next()
+
+        job = run(claim())
+
+        self.assertEqual(job.status, models.Job.QUEUED)
+        self.assertIn("already running", job.error)
+
+    def test_purge_in_batches(self):
+        """Test the data and then the user are deleted batch by batch."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="test123",
+        )
+        kept = create_recipe(other, tags=["Vegan"])
+        for index in range(3):
+            create_recipe(self.user, tags=[f"Vegan {index}"])
+        deletion = schedule_user_deletion(self.user)
+
+        purge_user(claim_next(), batch_size=2)
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, models.UserDeletion.DONE)
+        self.assertEqual((deletion.deleted, deletion.total), (6, 6))
+        self.assertEqual(deletion.progress, 1.0)
+        self.assertIsNone(deletion.user)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertEqual(models.Recipe.objects.get(), kept)
+        self.assertEqual(models.Recipe.tags.through.objects.count(), 1)
+
+    def test_claim_skips_running(self):
+        """Test running deletions are only claimed again when stale."""
+        deletion = schedule_user_deletion(self.user)
+        self.assertEqual(claim_next(), deletion)
+        self.assertIsNone(claim_next())
+
+        models.UserDeletion.objects.filter(id=deletion.id).update(
+            updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(claim_next(), deletion)
+
+    @patch("core.purge.shard_for_user", return_value="missing")
+    def test_purge_failure_recorded(self, _):
+        """Test failed purges are recorded and reported."""
+        deletion = schedule_user_deletion(self.user)
+        err = StringIO()
+
+        call_command("purge_users", stdout=StringIO(), stderr=err)
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, models.UserDeletion.FAILED)
+        self.assertIn("missing", deletion.error)
+        self.assertIn("user@example.com", err.getvalue())
+
+    def test_failed_purge_retried(self):
+        """Test failed purges are claimed again after a delay, then left."""
+        deletion = schedule_user_deletion(self.user)
+        with patch("core.purge.shard_for_user", return_value="missing"):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                claimed = claim_next()
+                self.assertEqual(claimed, deletion)
+                with self.assertRaises(Exception):
+                    purge_user(claimed)
+                self.assertIsNone(claim_next())
+                self.assertEqual(claimed.attempts, attempt)
+                # due once the backoff elapsed
+                models.UserDeletion.objects.filter(id=deletion.id).update(
+                    retry_at=F("retry_at") - timedelta(days=1))
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, models.UserDeletion.FAILED)
+        self.assertIsNone(deletion.retry_at)
+        self.assertIsNone(claim_next())
+
+    def test_failed_purge_retried_once_due(self):
+        """Test a failed purge is retried and completes."""
+        create_recipe(self.user)
+        deletion = schedule_user_deletion(self.user)
+        with patch("core.purge.shard_for_user", return_value="missing"):
+            call_command("purge_users", stdout=StringIO(), stderr=StringIO())
+        deletion.refresh_from_db()
+        self.assertGreater(deletion.retry_at, timezone.now())
+
+        models.UserDeletion.objects.filter(id=deletion.id).update(
+            retry_at=timezone.now())
+        call_command("purge_users", stdout=StringIO())
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, models.UserDeletion.DONE)
+        self.assertEqual(deletion.attempts, 2)
+        self.assertFalse(models.Recipe.objects.exists())
+
+    def test_purge_users_command(self):
+        """Test the command runs every pending deletion."""
+        create_recipe(self.user, tags=["Vegan"])
+        schedule_user_deletion(self.user)
+        out = StringIO()
+
+        call_command("purge_users", stdout=out)
+
+        self.assertIn("deleted 2 objects", out.getvalue())
+        self.assertFalse(models.Tag.objects.exists())
+        self.assertIsNone(claim_next())
@@ -0,0 +1,128 @@
+"""
+Tests for database routing.
+"""
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import models
+from core.middleware import ReadYourWritesMiddleware, USE_PRIMARY_COOKIE
+from core.routers import (
+    PrimaryReplicaRouter,
+    _use_primary,
+    replica_configured,
+    use_primary,
+)
+
+
+@patch("core.routers.replica_configured", return_value=True)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """Test the primary/replica router."""
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_use_replica(self, _):
+        """Test reads go to the replica by default."""
+        self.assertEqual(self.router.db_for_read(models.Recipe), "replica")
+
+    def test_writes_use_primary(self, _):
+        """Test writes always go to the primary."""
+        self.assertEqual(self.router.db_for_write(models.Recipe), "default")
+
+    def test_pinned_reads_use_primary(self, _):
+        """Test reads go to the primary when pinned."""
+        with use_primary():
+            self.assertEqual(
+                self.router.db_for_read(models.Recipe), "default")
+        self.assertEqual(self.router.db_for_read(models.Recipe), "replica")
+
+    def test_no_migrations_on_replica(self, _):
+        """Test the replica is never migrated."""
+        self.assertFalse(self.router.allow_migrate("replica", "core"))
+        self.assertIsNone(self.router.allow_migrate("default", "core"))
+
+
+class ReadYourWritesMiddlewareTests(SimpleTestCase):
+    """Test pinning clients to the primary after writes."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.pinned = None
+
+    def _get_response(self, request):
+        self.pinned = _use_primary.get()
+        return HttpResponse()
+
+    def _call(self, request):
+        middleware = ReadYourWritesMiddleware(self._get_response)
+        return middleware(request)
+
+    def test_safe_request_not_pinned(self):
+        """Test a plain read is not pinned."""
+        res = self._call(self.factory.get("/"))
+
+        self.assertFalse(self.pinned)
+        self.assertNotIn(USE_PRIMARY_COOKIE, res.cookies)
+
+    def test_write_pinned_and_sets_cookie(self):
+        """Test a write is pinned and pins later requests by cookie."""
+        res = self._call(self.factory.post("/"))
+
+        self.assertTrue(self.pinned)
+        self.assertIn(USE_PRIMARY_COOKIE, res.cookies)
+
+        request = self.factory.get("/")
+        request.COOKIES[USE_PRIMARY_COOKIE] = "1"
+        self._call(request)
+        self.assertTrue(self.pinned)
+
+    def test_write_pins_client_credentials(self):
+        """Test token clients are pinned without cookies after a write."""
+        self._call(self.factory.post("/", HTTP_AUTHORIZATION="Token abc"))
+
+        self._call(self.factory.get("/", HTTP_AUTHORIZATION="Token abc"))
+        self.assertTrue(self.pinned)
+
+        self._call(self.factory.get("/", HTTP_AUTHORIZATION="Token other"))
+        self.assertFalse(self.pinned)
+
+
+@skipUnless(replica_configured(), "set DB_REPLICA_HOST to run")
+class ReplicaIntegrationTests(TestCase):
+    """Test read-your-writes against two database connections.
+
+    The replica connection doesn't see rows uncommitted in the test
+    transaction, which behaves like replication lag.
+    """
+
+    databases = "__all__"
+
+    def test_reads_after_write_see_own_writes(self):
+        """Test reads stick to the primary after a write."""
+        client = APIClient()
+        user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        client.force_authenticate(user)
+        url = reverse("recipe:recipe-list")
+        models.Recipe.objects.create(
+            user=user,
+            title="Sample recipe",
+            time_minutes=5,
+            price=Decimal("1.00"),
+        )
+
+        self.assertEqual(client.get(url).data, [])
+
+        payload = {"title": "New", "time_minutes": 5, "price": "1.00"}
+        client.post(url, payload)
+        self.assertEqual(len(client.get(url).data), 2)
@@ -0,0 +1,181 @@
+"""
+Tests for user sharding.
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import (
+    Client,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import models
+from core.routers import ShardRouter
+from core.sharding import (
+    ShardNotActive,
+    assign_shard,
+    sharding_enabled,
+    use_shard,
+)
+
+
+@override_settings(SHARD_DATABASES=["default", "shard_1"])
+class ShardRouterTests(SimpleTestCase):
+    """Test routing of sharded models."""
+
+    def setUp(self):
+        self.router = ShardRouter()
+
+    def test_sharded_model_uses_current_shard(self):
+        """Test sharded models go to the shard active for the request."""
+        with use_shard("shard_1"):
+            self.assertEqual(
+                self.router.db_for_read(models.Recipe), "shard_1")
+            self.assertEqual(
+                self.router.db_for_write(models.Recipe.tags.through),
+                "shard_1",
+            )
+
+    def test_instance_hint_wins(self):
+        """Test related queries stay on the database of the instance."""
+        recipe = models.Recipe()
+        recipe._state.db = "default"
+
+        with use_shard("shard_1"):
+            self.assertEqual(
+                self.router.db_for_read(models.Tag, instance=recipe),
+                "default",
+            )
+
+    def test_user_hint_routes_to_user_shard(self):
+        """Test reverse managers of a user use the shard of the user."""
+        user = models.User(shard="shard_1")
+        user._state.db = "default"
+
+        self.assertEqual(
+            self.router.db_for_read(models.Recipe, instance=user), "shard_1")
+
+    def test_new_instance_routes_to_user_shard(self):
+        """Test new rows are written to the shard of their user."""
+        recipe = models.Recipe(user=models.User(id=1, shard="shard_1"))
+
+        self.assertEqual(
+            self.router.db_for_write(models.Recipe, instance=recipe),
+            "shard_1",
+        )
+
+    def test_no_shard_active(self):
+        """Test sharded models can't be queried without a shard."""
+        with self.assertRaises(ShardNotActive):
+            self.router.db_for_read(models.Recipe)
+
+    def test_unsharded_model_not_routed(self):
+        """Test users are left to the other routers."""
+        with use_shard("shard_1"):
+            self.assertIsNone(self.router.db_for_read(models.User))
+
+    def test_assign_shard(self):
+        """Test new users are assigned a configured shard."""
+        shard = assign_shard("user@example.com")
+
+        self.assertIn(shard, settings.SHARD_DATABASES)
+        self.assertEqual(shard, assign_shard("USER@example.com"))
+
+
+class ShardingDisabledTests(SimpleTestCase):
+    """Test behaviour with a single database."""
+
+    @override_settings(SHARD_DATABASES=["default"])
+    def test_no_routing(self):
+        """Test nothing is routed without shards."""
+        with use_shard("default"):
+            self.assertIsNone(ShardRouter().db_for_read(models.Recipe))
+        self.assertEqual(assign_shard("user@example.com"), "")
+
+
+@skipUnless(sharding_enabled(), "set DB_SHARDS to run")
+class ShardingIntegrationTests(TestCase):
+    """Test recipes are stored on the shard of their user."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.shard = settings.SHARD_DATABASES[1]
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+            shard=self.shard,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_api_routes_to_user_shard(self):
+        """Test recipes created through the API land on the user's shard."""
+        url = reverse("recipe:recipe-list")
+        payload = {
+            "title": "Sample recipe",
+            "time_minutes": 5,
+            "price": Decimal("1.00"),
+            "tags": [{"name": "Vegan"}],
+        }
+        res = self.client.post(url, payload, format="json")
+
+        recipe = models.Recipe.objects.using(self.shard).get(id=res.data["id"])
+        self.assertEqual(recipe.tags.count(), 1)
+        self.assertFalse(
+            models.Recipe.objects.using("default").filter(
+                user=self.user).exists())
+        self.assertEqual(len(self.client.get(url).data), 1)
+
+    def test_move_user(self):
+        """Test moving a user copies their data and removes the source."""
+        with use_shard(self.shard):
+            recipe = models.Recipe.objects.create(
+                user=self.user,
+                title="Sample recipe",
+                time_minutes=5,
+                price=Decimal("1.00"),
+            )
+            recipe.tags.add(
+                models.Tag.objects.create(user=self.user, name="Vegan"))
+
+        call_command(
+            "shard_users", user=self.user.id, to="default", stdout=StringIO())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shard, "default")
+        moved = models.Recipe.objects.using("default").get(id=recipe.id)
+        self.assertEqual(moved.tags.get().name, "Vegan")
+        self.assertEqual(moved.features.using("default").count(), 1)
+        self.assertFalse(
+            models.Recipe.objects.using(self.shard).filter(
+                user=self.user).exists())
+
+    def test_admin_on_shard(self):
+        """Test each shard has admin pages listing its recipes."""
+        admin = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="test123")
+        client = Client()
+        client.force_login(admin)
+        with use_shard(self.shard):
+            recipe = models.Recipe.objects.create(
+                user=self.user, title="Curry", time_minutes=5, price=1)
+        site = f"admin_{self.shard}"
+
+        res = client.get(reverse(f"{site}:core_recipe_changelist"))
+        self.assertContains(res, "Curry")
+        res = client.get(
+            reverse(f"{site}:core_recipe_change", args=[recipe.id]))
+        self.assertContains(res, "Curry")
+        res = client.get(reverse("admin:core_recipe_changelist"))
+        self.assertEqual(res.status_code, 200)
+        self.assertNotContains(res, "Curry")
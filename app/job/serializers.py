@@ -0,0 +1,38 @@
+"""
+Serializers for the job APIs.
+"""
+from rest_framework import serializers
+
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background job status."""
+
+    # the stored error is a traceback (server paths, code, SQL), left to
+    # admin
+    error = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "name",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_at",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_error(self, job) -> str:
+        if not job.error:
+            return ""
+        if job.status == Job.FAILED:
+            return "Job failed."
+        return "Last attempt failed, retrying."
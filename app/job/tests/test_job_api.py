@@ -0,0 +1,82 @@
+"""
+Tests for the job APIs.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.jobs import enqueue, task
+from core.models import Job
+
+JOBS_URL = reverse("job:job-list")
+
+
+def detail_url(job_id):
+    """Create and return a job detail URL."""
+    return reverse("job:job-detail", args=[job_id])
+
+
+@task()
+def noop():
+    pass
+
+
+class PublicJobApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to list jobs."""
+        res = APIClient().get(JOBS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateJobApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_own_jobs(self):
+        """Test only jobs of the user are listed."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="test123",
+        )
+        enqueue(noop, user=other)
+        job = enqueue(noop, user=self.user)
+        enqueue(noop)
+
+        res = self.client.get(JOBS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in res.data], [job.id])
+        self.assertEqual(res.data[0]["status"], "queued")
+
+    def test_retrieve_other_user_job(self):
+        """Test jobs of other users are not found."""
+        job = enqueue(noop)
+
+        res = self.client.get(detail_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_error_hides_traceback(self):
+        """Test the traceback of a failed job is not returned."""
+        job = enqueue(noop, user=self.user)
+        Job.objects.filter(id=job.id).update(
+            status=Job.FAILED,
+            error='Traceback (most recent call last):\n  File "/app/x.py"',
+        )
+
+        res = self.client.get(detail_url(job.id))
+
+        self.assertEqual(res.data["error"], "Job failed.")
@@ -0,0 +1,22 @@
+"""
+Views for the job APIs.
+"""
+from rest_framework import viewsets
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+
+from core.models import Job
+from job import serializers
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """View the status of background jobs requested by the user."""
+
+    serializer_class = serializers.JobSerializer
+    queryset = Job.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Retrieve jobs of the authenticated user, newest first."""
+        return self.queryset.filter(user=self.request.user).order_by("-id")
@@ -0,0 +1,92 @@
+"""
+Tag and ingredient arrays denormalized on recipes.
+
+Recipe.tag_ids/tag_names and ingredient_ids/ingredient_names copy the
+linked tags and ingredients in link order. The links stay the source of
+truth: the arrays of the affected recipes are recomputed from them in one
+UPDATE whenever links change or a tag or ingredient is renamed or deleted
+(see recipe.signals), in the transaction making the change.
+"""
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import F, OuterRef, Q
+
+from core.models import Ingredient, Recipe, Tag
+
+# relation: (ids field, names field)
+ARRAYS = {
+    "tags": ("tag_ids", "tag_names"),
+    "ingredients": ("ingredient_ids", "ingredient_names"),
+}
+RELATIONS = {
+    Recipe.tags.through: "tags",
+    Recipe.ingredients.through: "ingredients",
+    Tag: "tags",
+    Ingredient: "ingredients",
+}
+
+
+def expected_arrays(relations=ARRAYS):
+    """Return expressions computing the arrays of a recipe from its links."""
+    expressions = {}
+    for relation in relations:
+        ids, names = ARRAYS[relation]
+        item = Recipe._meta.get_field(relation).m2m_reverse_field_name()
+        links = (
+            getattr(Recipe, relation).through.objects
+            .filter(recipe_id=OuterRef("id"))
+            .order_by("id")
+        )
+        expressions[ids] = ArraySubquery(links.values(f"{item}_id"))
+        expressions[names] = ArraySubquery(links.values(f"{item}__name"))
+    return expressions
+
+
+def refresh_arrays(recipes, relations=ARRAYS):
+    """Recompute the arrays of relations for the recipes of a queryset."""
+    return recipes.update(**expected_arrays(relations))
+
+
+def drifted(recipes):
+    """Return the recipes of a queryset whose arrays differ from links."""
+    expected = expected_arrays()
+    differs = Q()
+    for field in expected:
+        differs |= ~Q(**{field: F(f"expected_{field}")})
+    return recipes.alias(
+        **{f"expected_{field}": value for field, value in expected.items()}
+    ).filter(differs)
+
+
+def refresh_on_link_change(sender, instance, action, reverse, pk_set,
+                           using):
+    """Apply an m2m_changed of the recipe tags or ingredients."""
+    if not action.startswith("post_"):
+        return
+    relation = RELATIONS[sender]
+    recipes = Recipe.objects.using(using).filter(user_id=instance.user_id)
+    if not reverse:
+        recipes = recipes.filter(id=instance.id)
+    elif action == "post_clear":
+        # the recipes were linked to instance, it is still in their arrays
+        ids_field = ARRAYS[relation][0]
+        recipes = recipes.filter(**{f"{ids_field}__contains": [instance.id]})
+    else:
+        recipes = recipes.filter(id__in=pk_set)
+    refresh_arrays(recipes, [relation])
+    if not reverse:
+        # keep the arrays of the changed instance current, e.g. to render
+        # the recipe saved by a serializer
+        instance.refresh_from_db(fields=ARRAYS[relation])
+
+
+def refresh_on_item_change(instance, using):
+    """Refresh the recipes of a renamed or deleted tag or ingredient."""
+    relation = RELATIONS[type(instance)]
+    ids_field = ARRAYS[relation][0]
+    refresh_arrays(
+        Recipe.objects.using(using).filter(
+            user_id=instance.user_id,
+            **{f"{ids_field}__contains": [instance.id]},
+        ),
+        [relation],
+    )
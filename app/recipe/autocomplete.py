@@ -0,0 +1,120 @@
+"""
+Autocomplete of tag and ingredient names.
+
+Prefix matches come first, read from the (user_id, lower(name)) index (see
+migration core 0010). When they don't fill the page, names similar to the
+term are added: by trigram similarity if pg_trgm is installed, containing
+the term otherwise. Results are kept in a small in-process LRU cache keyed
+by the user's cache version, so hot prefixes don't reach the database. The
+entries also expire after RECIPE_AUTOCOMPLETE_CACHE_TTL seconds, bounding
+how long a worker serves names the version bump of another one missed.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models.functions import Lower
+
+from recipe.cache import get_version
+
+# terms shorter than this only get prefix matches
+FUZZY_MIN_LENGTH = 3
+TRIGRAM_THRESHOLD = 0.3
+
+_trigram_available = {}
+
+
+class LRUCache:
+    """Thread safe mapping keeping the most recently used entries.
+
+    Entries older than ttl seconds are treated as missing.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return None
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+cache = LRUCache(
+    settings.RECIPE_AUTOCOMPLETE_CACHE_SIZE,
+    settings.RECIPE_AUTOCOMPLETE_CACHE_TTL,
+)
+
+
+def trigram_available(alias):
+    """Return whether pg_trgm is installed on database alias."""
+    if alias not in _trigram_available:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[alias] = cursor.fetchone() is not None
+    return _trigram_available[alias]
+
+
+def _search(queryset, term, limit):
+    names = queryset.annotate(lower_name=Lower("name"))
+    matches = list(
+        names.filter(lower_name__startswith=term)
+        .order_by("lower_name")
+        .values("id", "name")[:limit]
+    )
+    if len(matches) == limit or len(term) < FUZZY_MIN_LENGTH:
+        return matches
+
+    others = queryset.exclude(id__in=[match["id"] for match in matches])
+    if trigram_available(queryset.db):
+        others = (
+            others.annotate(similarity=TrigramSimilarity("name", term))
+            .filter(similarity__gte=TRIGRAM_THRESHOLD)
+            .order_by("-similarity", "name")
+        )
+    else:
+        others = others.filter(name__icontains=term).order_by("name")
+    return matches + list(others.values("id", "name")[:limit - len(matches)])
+
+
+def find_matches(queryset, user_id, term, limit):
+    """Return up to limit {id, name} of queryset matching term."""
+    term = term.strip().lower()
+    if not term:
+        return []
+    key = (
+        queryset.model._meta.label,
+        user_id,
+        get_version(user_id),
+        term,
+        limit,
+    )
+    matches = cache.get(key)
+    if matches is None:
+        matches = _search(queryset, term, limit)
+        cache.set(key, matches)
+    return matches
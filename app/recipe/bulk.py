@@ -0,0 +1,227 @@
+"""
+Bulk updates and deletes of recipes, tags and ingredients.
+
+Each operation checks which of the requested ids the user owns in one
+query, then writes them with one UPDATE or DELETE per table rather than
+saving or deleting every instance. Per instance signals are skipped, the
+data they maintain is updated once for the whole batch instead: statistics
+counters (recipe.stats), link arrays (recipe.arrays), feature index
+(recipe.similar), duplicate bands (recipe.duplicates) and cache version.
+Link changes go through the reverse M2M managers, one m2m_changed for all
+the recipes of a tag or ingredient.
+"""
+from django.db import connections, transaction
+from django.db.models import Q
+
+from core.models import Ingredient, Recipe, RecipeFeature, Tag, UserStat
+from recipe import duplicates, names, stats
+from recipe.arrays import ARRAYS, RELATIONS, refresh_arrays
+from recipe.cache import bump_version
+from recipe.names import ITEMS
+
+# at most this many ids per request
+MAX_BULK_SIZE = 500
+
+
+def _delete_rows(model, user_id, ids, using):
+    """DELETE the rows of model of user_id among ids in one statement.
+
+    QuerySet.delete() would collect the rows and send post_delete for each
+    of them, the rows referencing them must be deleted first. The user
+    scopes the statement to one partition of a partitioned table.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE user_id = %s AND id = ANY(%s)",
+            [user_id, ids],
+        )
+
+
+def update_recipes(user, ids, changes, links, using):
+    """Apply changes to the recipes of user among ids.
+
+    changes maps recipe fields to their new value, links maps "add_tags",
+    "remove_tags", "add_ingredients" and "remove_ingredients" to names.
+    Returns the ids of the updated recipes.
+    """
+    recipes = Recipe.objects.using(using).filter(user=user)
+    with transaction.atomic(using=using):
+        # ownership and the counted values, locked until the update
+        owned = list(
+            recipes.filter(id__in=ids)
+            .select_for_update()
+            .values_list("id", "time_minutes", "price")
+        )
+        owned_ids = [recipe_id for recipe_id, _, _ in owned]
+        if not owned_ids:
+            return []
+        batch = recipes.filter(id__in=owned_ids)
+
+        if changes:
+            batch.update(**changes)
+            if {"time_minutes", "price"} & set(changes):
+                deltas = [
+                    stats.merge(
+                        stats.recipe_deltas(
+                            changes.get("time_minutes", time_minutes),
+                            changes.get("price", price),
+                        ),
+                        stats.recipe_deltas(time_minutes, price, sign=-1),
+                    )
+                    for _, time_minutes, price in owned
+                ]
+                stats.add(user.id, stats.merge(*deltas), using)
+            if "title" in changes:
+                duplicates.index_recipes(batch)
+            bump_version(user.id)
+
+        for model, (relation, _kind) in ITEMS.items():
+            through = getattr(Recipe, relation).through
+            item_field = Recipe._meta.get_field(
+                relation).m2m_reverse_field_name()
+            added = links.get(f"add_{relation}")
+            if added:
+                for item in model.objects.using(using).filter(
+                        id__in=names.upsert(model, user.id, added, using)):
+                    item.recipe_set.add(*owned_ids)
+            removed = links.get(f"remove_{relation}")
+            if removed:
+                matching = Q()
+                for name in removed:
+                    matching |= Q(name__iexact=name)
+                for item in model.objects.using(using).filter(
+                        matching, user=user):
+                    # only the linked recipes, counters are decremented
+                    # per recipe in pk_set
+                    linked = through.objects.using(using).filter(
+                        recipe_id__in=owned_ids,
+                        **{f"{item_field}_id": item.id},
+                    ).values_list("recipe_id", flat=True)
+                    linked = list(linked)
+                    if linked:
+                        item.recipe_set.remove(*linked)
+    return owned_ids
+
+
+def delete_recipes(user, ids, using):
+    """Delete the recipes of user among ids, returning the deleted ids."""
+    recipes = Recipe.objects.using(using).filter(user=user)
+    with transaction.atomic(using=using):
+        owned = list(
+            recipes.filter(id__in=ids)
+            .select_for_update()
+            .values_list("id", "time_minutes", "price", "tag_ids")
+        )
+        owned_ids = [row[0] for row in owned]
+        if not owned_ids:
+            return []
+
+        deltas = []
+        for _, time_minutes, price, tag_ids in owned:
+            deltas.append(
+                stats.recipe_deltas(time_minutes, price, sign=-1))
+            deltas.append({stats.tag_stat(tag_id): -1 for tag_id in tag_ids})
+        stats.add(user.id, stats.merge(*deltas), using)
+
+        # the rows cascading from the recipes, one DELETE per table
+        for field in Recipe._meta.many_to_many:
+            field.remote_field.through.objects.using(using).filter(
+                recipe_id__in=owned_ids).delete()
+        for relation in Recipe._meta.related_objects:
+            relation.related_model.objects.using(using).filter(
+                **{f"{relation.field.name}_id__in": owned_ids}).delete()
+        _delete_rows(Recipe, user.id, owned_ids, using)
+        bump_version(user.id)
+    return owned_ids
+
+
+def _refresh_item_recipes(model, user, item_ids, using):
+    """Refresh the arrays (and bands) of the recipes of items."""
+    relation = RELATIONS[model]
+    recipes = Recipe.objects.using(using).filter(
+        user=user, **{f"{ARRAYS[relation][0]}__overlap": item_ids})
+    # ids first, the arrays no longer list deleted items once refreshed
+    recipe_ids = list(recipes.values_list("id", flat=True))
+    refresh_arrays(Recipe.objects.using(using).filter(id__in=recipe_ids),
+                   [relation])
+    if model is Ingredient:
+        duplicates.index_recipes(
+            Recipe.objects.using(using).filter(id__in=recipe_ids))
+
+
+def rename_items(model, user, renames, using):
+    """Rename the tags or ingredients of user, renames maps ids to names.
+
+    Returns the renamed items and the ids whose name is taken by another
+    item of the user (or repeated in renames).
+    """
+    items = {
+        item.id: item
+        for item in model.objects.using(using).filter(
+            user=user, id__in=renames).select_for_update()
+    }
+    taken = set()
+    seen = {}
+    for item_id, name in renames.items():
+        if item_id in items:
+            seen.setdefault(name.lower(), []).append(item_id)
+    for item_ids in seen.values():
+        if len(item_ids) > 1:
+            taken.update(item_ids)
+    matching = Q()
+    for item_id in items:
+        matching |= Q(name__iexact=renames[item_id])
+    if items:
+        for other_id, other_name in model.objects.using(using).filter(
+                matching, user=user).values_list("id", "name"):
+            taken.update(
+                item_id for item_id in items
+                if item_id != other_id
+                and renames[item_id].lower() == other_name.lower()
+            )
+
+    renamed = []
+    for item_id, item in items.items():
+        if item_id not in taken:
+            item.name = renames[item_id]
+            renamed.append(item)
+    if renamed:
+        with transaction.atomic(using=using):
+            model.objects.using(using).bulk_update(renamed, ["name"])
+            _refresh_item_recipes(
+                model, user, [item.id for item in renamed], using)
+        bump_version(user.id)
+    return renamed, taken
+
+
+def delete_items(model, user, ids, using):
+    """Delete the tags or ingredients of user among ids.
+
+    Returns the deleted ids.
+    """
+    relation, kind = ITEMS[model]
+    through = getattr(Recipe, relation).through
+    item_field = Recipe._meta.get_field(relation).m2m_reverse_field_name()
+    items = model.objects.using(using).filter(user=user)
+    with transaction.atomic(using=using):
+        owned_ids = list(
+            items.filter(id__in=ids).select_for_update()
+            .values_list("id", flat=True)
+        )
+        if not owned_ids:
+            return []
+        through.objects.using(using).filter(
+            **{f"{item_field}_id__in": owned_ids}).delete()
+        _refresh_item_recipes(model, user, owned_ids, using)
+        RecipeFeature.objects.using(using).filter(
+            kind=kind, feature_id__in=owned_ids).delete()
+        if model is Tag:
+            UserStat.objects.using(using).filter(
+                user=user,
+                name__in=[stats.tag_stat(tag_id) for tag_id in owned_ids],
+            ).delete()
+        _delete_rows(model, user.id, owned_ids, using)
+        bump_version(user.id)
+    return owned_ids
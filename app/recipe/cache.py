@@ -0,0 +1,41 @@
+"""
+Per user cache versions for derived recipe data.
+
+Cached results (e.g. facet counts) include the version of their user in the
+key. Any change to the user's recipes, tags or ingredients bumps the
+version (see recipe.signals), so stale entries are never read again and
+simply expire. With several processes a shared CACHE_BACKEND is needed.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = "recipe:version:{}"
+
+
+def _new_version():
+    # never reuses a version of an evicted key
+    return time.time_ns()
+
+
+def get_version(user_id):
+    """Return the current cache version of user."""
+    return cache.get_or_set(
+        VERSION_KEY.format(user_id), _new_version, timeout=None)
+
+
+def bump_version(user_id):
+    """Invalidate cached data of user."""
+    key = VERSION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def versioned_key(prefix, user_id, *parts):
+    """Return a cache key including the current version of user."""
+    return ":".join(
+        ["recipe", prefix, str(user_id), str(get_version(user_id))]
+        + [str(part) for part in parts]
+    )
@@ -0,0 +1,188 @@
+"""
+Near-duplicate recipes, found with MinHash and locality sensitive hashing.
+
+The features of a recipe are the words of its title and its ingredient
+names, lowercased. Its MinHash signature keeps, for each of SIGNATURE_SIZE
+hash functions, the smallest hash of the features: two recipes agree on a
+slot with a probability equal to the Jaccard index of their features. The
+signature is cut in BANDS bands of ROWS slots, each hashed to a key stored
+in RecipeBand. Recipes sharing at least one band key are candidates, found
+with the (user, band, key) index instead of comparing all the recipes,
+then kept when the Jaccard index of their features reaches THRESHOLD.
+
+With 10 bands of 3 rows, recipes at 0.6 are candidates 91% of the time,
+at 0.3 24% and at 0.1 1%.
+
+The bands of a recipe are recomputed when its title or ingredients change
+(see recipe.signals); `python manage.py rebuild_duplicate_index` computes
+them for recipes written without signals.
+"""
+import hashlib
+import random
+import re
+
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import Recipe, RecipeBand
+
+BANDS = 10
+ROWS = 3
+SIGNATURE_SIZE = BANDS * ROWS
+THRESHOLD = 0.6
+
+# universal hash functions (a * x + b) mod PRIME, fixed for stored keys to
+# stay comparable
+PRIME = (1 << 61) - 1
+_rng = random.Random(SIGNATURE_SIZE)
+COEFFICIENTS = [
+    (_rng.randrange(1, PRIME), _rng.randrange(PRIME))
+    for _ in range(SIGNATURE_SIZE)
+]
+
+WORD = re.compile(r"\w+")
+
+
+def _hash(value, signed=False):
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=signed)
+
+
+def features(title, ingredient_names):
+    """Return the normalized features of a recipe."""
+    return {
+        *(f"t:{word}" for word in WORD.findall(title.lower())),
+        *(f"i:{' '.join(name.lower().split())}" for name in ingredient_names),
+    }
+
+
+def similarity(first, second):
+    """Return the Jaccard index of two feature sets."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def band_keys(recipe_features):
+    """Return the key of each band of the MinHash signature of features."""
+    if not recipe_features:
+        return []
+    hashes = [_hash(feature) for feature in recipe_features]
+    signature = [
+        min((a * value + b) % PRIME for value in hashes)
+        for a, b in COEFFICIENTS
+    ]
+    return [
+        _hash(",".join(map(str, signature[band * ROWS:(band + 1) * ROWS])),
+              signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def index_recipes(recipes):
+    """Recompute the bands of the recipes of a queryset."""
+    rows = list(recipes.values_list(
+        "id", "user_id", "title", "ingredient_names"))
+    using = recipes.db
+    with transaction.atomic(using=using):
+        RecipeBand.objects.using(using).filter(
+            recipe_id__in=[row[0] for row in rows]).delete()
+        RecipeBand.objects.using(using).bulk_create([
+            RecipeBand(user_id=user_id, recipe_id=recipe_id, band=band,
+                       key=key)
+            for recipe_id, user_id, title, names in rows
+            for band, key in enumerate(band_keys(features(title, names)))
+        ])
+    return len(rows)
+
+
+def index_recipe(recipe, using):
+    """Recompute the bands of a recipe from the instance."""
+    keys = band_keys(features(recipe.title, recipe.ingredient_names))
+    with transaction.atomic(using=using):
+        RecipeBand.objects.using(using).filter(recipe_id=recipe.id).delete()
+        RecipeBand.objects.using(using).bulk_create([
+            RecipeBand(user_id=recipe.user_id, recipe_id=recipe.id,
+                       band=band, key=key)
+            for band, key in enumerate(keys)
+        ])
+
+
+def on_recipe_saved(instance, update_fields, using):
+    if update_fields is None or "title" in update_fields:
+        index_recipe(instance, using)
+
+
+def on_ingredient_links_changed(instance, action, reverse, pk_set, using):
+    """Reindex recipes on m2m_changed of Recipe.ingredients.
+
+    Runs after recipe.arrays refreshed the ingredient names.
+    """
+    if not reverse:
+        if action.startswith("post_"):
+            index_recipe(instance, using)
+        return
+    recipes = Recipe.objects.using(using).filter(user_id=instance.user_id)
+    if action == "pre_clear":
+        # the ingredient is still in the arrays of its recipes
+        instance._duplicates_recipe_ids = list(
+            recipes.filter(ingredient_ids__contains=[instance.id])
+            .values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        index_recipes(recipes.filter(id__in=instance._duplicates_recipe_ids))
+    elif action in ("post_add", "post_remove"):
+        index_recipes(recipes.filter(id__in=pk_set))
+
+
+def on_ingredient_deleting(instance, using):
+    """Remember the recipes of an ingredient about to be deleted."""
+    instance._duplicates_recipe_ids = list(
+        Recipe.objects.using(using)
+        .filter(
+            user_id=instance.user_id,
+            ingredient_ids__contains=[instance.id],
+        )
+        .values_list("id", flat=True)
+    )
+
+
+def on_ingredient_changed(instance, using):
+    """Reindex the recipes of a renamed or deleted ingredient."""
+    recipes = Recipe.objects.using(using).filter(user_id=instance.user_id)
+    if hasattr(instance, "_duplicates_recipe_ids"):
+        recipes = recipes.filter(id__in=instance._duplicates_recipe_ids)
+    else:
+        recipes = recipes.filter(ingredient_ids__contains=[instance.id])
+    index_recipes(recipes)
+
+
+def find_duplicates(user, title, ingredient_names, exclude=None, limit=10):
+    """Return up to limit recipes of user duplicating a recipe.
+
+    Recipes are annotated with similarity, at least THRESHOLD, and ordered
+    by it.
+    """
+    target = features(title, ingredient_names)
+    keys = band_keys(target)
+    if not keys:
+        return []
+    shared = Q()
+    for band, key in enumerate(keys):
+        shared |= Q(band=band, key=key)
+    candidates = Recipe.objects.filter(
+        user=user,
+        id__in=RecipeBand.objects.filter(shared, user=user).values(
+            "recipe_id"),
+    )
+    if exclude is not None:
+        candidates = candidates.exclude(id=exclude)
+
+    found = []
+    for recipe in candidates:
+        recipe.similarity = similarity(
+            target, features(recipe.title, recipe.ingredient_names))
+        if recipe.similarity >= THRESHOLD:
+            found.append(recipe)
+    found.sort(key=lambda recipe: (-recipe.similarity, -recipe.id))
+    return found[:limit]
@@ -0,0 +1,54 @@
+"""
+Facet counts of a set of recipes, for filter UIs.
+"""
+from django.db.models import Count, Q
+
+from core.models import Ingredient, Recipe, Tag
+
+# lower bounds of the price and time_minutes ranges, the last one is open
+PRICE_BOUNDS = [0, 5, 10, 20, 50]
+TIME_BOUNDS = [0, 15, 30, 60, 120]
+
+
+def value_ranges(field, bounds):
+    """Yield (min, max, condition) for the ranges starting at bounds."""
+    for low, high in zip(bounds, bounds[1:] + [None]):
+        condition = Q(**{f"{field}__gte": low})
+        if high is not None:
+            condition &= Q(**{f"{field}__lt": high})
+        yield low, high, condition
+
+
+def recipe_facets(recipes):
+    """Return recipe counts per tag, ingredient, price and time range.
+
+    Runs three queries whatever the number of recipes: one aggregate for
+    the total and every range, one grouped count per related model.
+    """
+    matching = recipes.order_by().values("id")
+
+    ranges = {
+        "price": list(value_ranges("price", PRICE_BOUNDS)),
+        "time_minutes": list(value_ranges("time_minutes", TIME_BOUNDS)),
+    }
+    aggregates = {"count": Count("id")}
+    for field, field_ranges in ranges.items():
+        for index, (_, _, condition) in enumerate(field_ranges):
+            aggregates[f"{field}_{index}"] = Count("id", filter=condition)
+    totals = Recipe.objects.filter(id__in=matching).aggregate(**aggregates)
+
+    facets = {"count": totals["count"]}
+    for field, field_ranges in ranges.items():
+        facets[field] = [
+            {"min": low, "max": high, "count": totals[f"{field}_{index}"]}
+            for index, (low, high, _) in enumerate(field_ranges)
+        ]
+    for key, model in (("tags", Tag), ("ingredients", Ingredient)):
+        # filtering before annotating counts only the matching recipes
+        facets[key] = list(
+            model.objects.filter(recipe__in=matching)
+            .values("id", "name")
+            .annotate(count=Count("recipe"))
+            .order_by("-count", "name")
+        )
+    return facets
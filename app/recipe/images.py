@@ -0,0 +1,137 @@
+"""
+Helpers to extract recipe image metadata at upload time.
+"""
+import math
+
+from PIL import Image
+
+# size the image is reduced to before computing colour and placeholder,
+# keeps the work constant whatever the upload resolution is.
+SAMPLE_SIZE = (32, 32)
+
+# blurhash components, 4x3 gives a 28 character placeholder
+PLACEHOLDER_COMPONENTS = (4, 3)
+
+_BASE83 = (
+    "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    "abcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+)
+
+
+def _srgb_to_linear(value):
+    v = value / 255
+    if v <= 0.04045:
+        return v / 12.92
+    return ((v + 0.055) / 1.055) ** 2.4
+
+
+# lookup table, one entry per 8 bit channel value
+_LINEAR = [_srgb_to_linear(value) for value in range(256)]
+
+
+def _linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exp):
+    return math.copysign(abs(value) ** exp, value)
+
+
+def _base83(value, length):
+    return "".join(
+        _BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length)
+    )
+
+
+def encode_placeholder(img, components=PLACEHOLDER_COMPONENTS):
+    """Return a blurhash string for a (small) RGB Pillow image."""
+    x_components, y_components = components
+    width, height = img.size
+    pixels = [
+        (_LINEAR[r], _LINEAR[g], _LINEAR[b]) for r, g, b in img.getdata()
+    ]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            norm = 1 if i == j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                cos_y = math.cos(math.pi * j * y / height)
+                row = y * width
+                for x in range(width):
+                    basis = norm * math.cos(math.pi * i * x / width) * cos_y
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, math.floor(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _base83(0, 1)
+
+    dc_value = (
+        (_linear_to_srgb(dc[0]) << 16)
+        + (_linear_to_srgb(dc[1]) << 8)
+        + _linear_to_srgb(dc[2])
+    )
+    result += _base83(dc_value, 4)
+
+    for factor in ac:
+        qr, qg, qb = (
+            max(0, min(18, math.floor(
+                _sign_pow(c / max_value, 0.5) * 9 + 9.5)))
+            for c in factor
+        )
+        result += _base83(qr * 19 * 19 + qg * 19 + qb, 2)
+
+    return result
+
+
+def dominant_color(img):
+    """Return the most common colour of a (small) RGB image as #rrggbb."""
+    palette_img = img.quantize(colors=8)
+    palette = palette_img.getpalette()
+    _, index = max(palette_img.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def image_metadata(image_file):
+    """Compute metadata stored on Recipe for an uploaded image file."""
+    image_file.seek(0)
+    with Image.open(image_file) as img:
+        width, height = img.size
+        # let JPEG decode at reduced scale instead of full resolution
+        img.draft("RGB", SAMPLE_SIZE)
+        sample = img.convert("RGB")
+    sample.thumbnail(SAMPLE_SIZE)
+    image_file.seek(0)
+
+    return {
+        "image_width": width,
+        "image_height": height,
+        "image_size": image_file.size,
+        "image_color": dominant_color(sample),
+        "image_placeholder": encode_placeholder(sample),
+    }
+
+
+def attach_image(recipe, image_file):
+    """Store an uploaded image and its metadata on recipe, unsaved."""
+    for attr, value in image_metadata(image_file).items():
+        setattr(recipe, attr, value)
+    recipe.image.save(image_file.name, image_file, save=False)
@@ -0,0 +1,137 @@
+"""
+Tag and ingredient names, unique per user whatever the case.
+
+`upsert` returns the ids of named items, creating the missing ones, in one
+INSERT ... ON CONFLICT on the (user, lower(name)) unique constraint: two
+requests creating the same name concurrently both get the one row, where
+get_or_create could insert it twice.
+
+`merge_duplicates` merges items of a user whose names differ only by case,
+created before the constraint, into the oldest one (see `python manage.py
+merge_duplicate_names`).
+"""
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Count, Min, Q
+from django.db.models.functions import Lower
+
+from core.models import Ingredient, Recipe, RecipeFeature, Tag
+from recipe import stats
+from recipe.cache import bump_version
+
+# model: (recipe relation, feature kind)
+ITEMS = {
+    Tag: ("tags", RecipeFeature.TAG),
+    Ingredient: ("ingredients", RecipeFeature.INGREDIENT),
+}
+
+
+def upsert(model, user_id, names, using):
+    """Return the ids of the items of user_id named names, in order.
+
+    Names equal but for the case get the same id, the name of an existing
+    item is kept.
+    """
+    if not names:
+        return []
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    # the first spelling of each name is inserted, every name is matched
+    # back to its row with the same lower() as the constraint
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "WITH input AS ("
+            "SELECT name, position FROM unnest(%s::text[]) "
+            "WITH ORDINALITY AS input(name, position)"
+            "), upserted AS ("
+            f"INSERT INTO {table} (user_id, name) "
+            "SELECT DISTINCT ON (lower(name)) %s, name FROM input "
+            "ORDER BY lower(name), position "
+            "ON CONFLICT (user_id, lower(name)) "
+            f"DO UPDATE SET name = {table}.name RETURNING id, name"
+            ") SELECT upserted.id FROM input "
+            "JOIN upserted ON lower(upserted.name) = lower(input.name) "
+            "ORDER BY input.position",
+            [list(names), user_id],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    # raw inserts send no post_save, cached names are stale
+    bump_version(user_id)
+    return ids
+
+
+def duplicate_groups(model, using):
+    """Return (user_id, lower name, kept id) of duplicated names."""
+    return (
+        model.objects.using(using)
+        .values("user_id", lower=Lower("name"))
+        .annotate(keep=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+        .order_by("user_id", "lower")
+        .values_list("user_id", "lower", "keep")
+    )
+
+
+def merge_duplicates(model, using, batch_size=100):
+    """Merge up to batch_size groups of duplicated names of model.
+
+    The links and feature index rows of the duplicates are moved to the
+    kept item, then the duplicates are deleted: their delete signals
+    refresh the link arrays and duplicate index of their recipes. Returns
+    the number of items deleted.
+    """
+    relation, kind = ITEMS[model]
+    through = getattr(Recipe, relation).through
+    item_field = Recipe._meta.get_field(relation).m2m_reverse_field_name()
+    groups = list(duplicate_groups(model, using)[:batch_size])
+    if not groups:
+        return 0
+
+    matching = Q()
+    for user_id, lower, _keep in groups:
+        matching |= Q(user_id=user_id, lower=lower)
+    keep = {(user_id, lower): kept for user_id, lower, kept in groups}
+    merged = {
+        item_id: (user_id, keep[(user_id, lower)])
+        for item_id, user_id, lower in model.objects.using(using)
+        .annotate(lower=Lower("name"))
+        .filter(matching)
+        .values_list("id", "user_id", "lower")
+        if item_id != keep[(user_id, lower)]
+    }
+
+    with transaction.atomic(using=using):
+        links = list(
+            through.objects.using(using)
+            .filter(**{f"{item_field}_id__in": merged})
+            .values_list("recipe_id", f"{item_field}_id")
+        )
+        through.objects.using(using).bulk_create(
+            [
+                through(recipe_id=recipe_id,
+                        **{f"{item_field}_id": merged[item_id][1]})
+                for recipe_id, item_id in links
+            ],
+            ignore_conflicts=True,
+        )
+        RecipeFeature.objects.using(using).bulk_create(
+            [
+                RecipeFeature(
+                    user_id=merged[item_id][0],
+                    kind=kind,
+                    feature_id=merged[item_id][1],
+                    recipe_id=recipe_id,
+                )
+                for recipe_id, item_id in links
+            ],
+            ignore_conflicts=True,
+        )
+        through.objects.using(using).filter(
+            **{f"{item_field}_id__in": merged}).delete()
+        model.objects.using(using).filter(id__in=merged).delete()
+        if model is Tag:
+            # recipes linked to both spellings now count once
+            for user in get_user_model().objects.filter(
+                    id__in={user_id for user_id, _ in merged.values()}):
+                stats.rebuild(user, using)
+    return len(merged)
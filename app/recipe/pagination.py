@@ -0,0 +1,138 @@
+"""
+Keyset pagination for recipe lists.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Pages seeking past the sort key of the last row of the previous page.
+
+    The queryset must be ordered on columns ending with a unique one (e.g.
+    ("price", "id")). Unlike offset pagination a deep page costs the same
+    as the first one with an index on the ordering. Opt-in: lists are only
+    paginated when `page_size` is given.
+    """
+
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return None
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, ordering, values):
+        data = json.dumps({"o": ordering, "v": values}).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, request, model, ordering):
+        """Return the sort key values of the cursor, None without cursor.
+
+        The values are converted by the model fields of ordering, a tampered
+        cursor is rejected here rather than failing in the query.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if data["o"] != ordering or len(data["v"]) != len(ordering):
+                raise ValueError
+            values = []
+            for field, value in zip(ordering, data["v"]):
+                value = model._meta.get_field(field.lstrip("-")).to_python(
+                    value)
+                if value is None:
+                    raise ValueError
+                values.append(value)
+        except (binascii.Error, ValidationError, ValueError, KeyError,
+                TypeError):
+            raise NotFound(_("Invalid cursor."))
+        return values
+
+    def seek(self, ordering, values):
+        """Return the condition selecting rows after values in ordering."""
+        after = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition = Q(**{f"{name}__{lookup}": values[index]})
+            for previous, value in zip(ordering[:index], values[:index]):
+                condition &= Q(**{previous.lstrip("-"): value})
+            after |= condition
+        # redundant bound on the first column, lets the planner scan an
+        # index range rather than evaluating the OR on every row
+        first = ordering[0]
+        bound = "lte" if first.startswith("-") else "gte"
+        return Q(**{f"{first.lstrip('-')}__{bound}": values[0]}) & after
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if self.page_size is None:
+            return None
+        self.request = request
+
+        ordering = [str(field) for field in queryset.query.order_by]
+        values = self.decode_cursor(request, queryset.model, ordering)
+        if values is not None:
+            queryset = queryset.filter(self.seek(ordering, values))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(ordering, [
+                str(getattr(last, field.lstrip("-"))) for field in ordering
+            ])
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results per page, enables paging.",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor of the page, from the `next` link.",
+                "schema": {"type": "string"},
+            },
+        ]
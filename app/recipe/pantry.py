@@ -0,0 +1,43 @@
+"""
+Recipes cookable from a set of ingredients.
+"""
+from django.db.models import Count, F, Q
+
+from core.models import Recipe
+
+
+def cookable(recipes, pantry, max_missing=0, limit=20):
+    """Return recipes ranked by the ingredients they miss from pantry.
+
+    Only recipes using at least one pantry ingredient are candidates, found
+    with the ingredient index of the links table. The links of candidates
+    are then counted in one query grouped by recipe, which works whether or
+    not the recipe table is partitioned. Recipes missing more than
+    max_missing ingredients are left out, the others come fully cookable
+    first and are annotated with missing_count.
+    """
+    pantry = list(pantry)
+    links = Recipe.ingredients.through.objects
+    candidates = links.filter(
+        ingredient_id__in=pantry,
+        recipe_id__in=recipes.values("id"),
+    ).values("recipe_id")
+    counts = list(
+        links.filter(recipe_id__in=candidates)
+        .values("recipe_id")
+        .annotate(
+            ingredient_count=Count("id"),
+            pantry_count=Count("id", filter=Q(ingredient_id__in=pantry)),
+        )
+        .annotate(missing_count=F("ingredient_count") - F("pantry_count"))
+        .filter(missing_count__lte=max_missing)
+        .order_by("missing_count", "-pantry_count", "-recipe_id")[:limit]
+    )
+
+    found = recipes.in_bulk([row["recipe_id"] for row in counts])
+    ranked = []
+    for row in counts:
+        recipe = found[row["recipe_id"]]
+        recipe.missing_count = row["missing_count"]
+        ranked.append(recipe)
+    return ranked
@@ -0,0 +1,144 @@
+"""
+Write-behind recipe view counters and trending scores.
+
+Views are counted in memory by each process and written every
+RECIPE_VIEWS_FLUSH_INTERVAL seconds, one statement per database for all
+the recipes viewed meanwhile, rather than one UPDATE per view. The write
+happens once a request finished, not while a view is served.
+
+The trending score of a recipe is its views weighted by 2 ** (t / H), t
+being the time of the view and H RECIPE_TRENDING_HALF_LIFE, stored as a
+log2 to stay finite. Multiplying every weight by 2 ** (-now / H) gives the
+views decayed by their age, which doesn't change how recipes compare: the
+stored score orders recipes by decayed views at any time and never needs
+recomputing. Trending recipes are read from the (user, -score) index.
+"""
+import atexit
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+
+from core.models import Recipe, RecipePopularity
+
+_lock = threading.Lock()
+# (database alias, user id, recipe id): views not written yet
+_pending = Counter()
+_last_flush = time.monotonic()
+
+
+def current_weight():
+    """Return the log2 weight of a view happening now."""
+    return time.time() / settings.RECIPE_TRENDING_HALF_LIFE
+
+
+def decayed_views(score):
+    """Return the views of a score decayed to the current time."""
+    return 2 ** (score - current_weight())
+
+
+def record_view(recipe):
+    """Count a view of recipe, written by a later flush."""
+    # the recipe may have been read from the replica, the counts are
+    # written to the primary or the user's shard
+    alias = router.db_for_write(RecipePopularity, instance=recipe)
+    with _lock:
+        _pending[(alias, recipe.user_id, recipe.id)] += 1
+
+
+def flush_when_due():
+    """Write the views counted once RECIPE_VIEWS_FLUSH_INTERVAL elapsed.
+
+    Called when a request finished (see recipe.signals), after its response
+    is sent, so the write doesn't delay the view counted.
+    """
+    with _lock:
+        due = _pending and (
+            time.monotonic() - _last_flush
+            >= settings.RECIPE_VIEWS_FLUSH_INTERVAL
+        )
+    if due:
+        try:
+            flush()
+        except DatabaseError:
+            # the counts are kept for the next flush
+            pass
+
+
+def flush():
+    """Write the views counted by this process.
+
+    The counts of a database failing are kept for the next flush and its
+    error raised once the other databases are written.
+    """
+    global _pending, _last_flush
+    with _lock:
+        pending, _pending = _pending, Counter()
+        _last_flush = time.monotonic()
+
+    weight = current_weight()
+    rows = defaultdict(list)
+    for (alias, user_id, recipe_id), views in sorted(pending.items()):
+        rows[alias].append(
+            (recipe_id, user_id, views, math.log2(views) + weight))
+    error = None
+    for alias, alias_rows in rows.items():
+        try:
+            _write(alias, alias_rows)
+        except DatabaseError as exc:
+            error = exc
+            with _lock:
+                _pending.update({
+                    key: views for key, views in pending.items()
+                    if key[0] == alias
+                })
+    if error is not None:
+        raise error
+
+
+def _write(alias, rows):
+    connection = connections[alias]
+    table = connection.ops.quote_name(RecipePopularity._meta.db_table)
+    recipes = connection.ops.quote_name(Recipe._meta.db_table)
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    # score = log2(2 ** score + 2 ** new), without overflowing; the join
+    # skips recipes deleted since they were viewed
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (recipe_id, user_id, views, score) "
+            "SELECT v.recipe_id, v.user_id, v.views, v.score::float8 "
+            f"FROM (VALUES {values}) v(recipe_id, user_id, views, score) "
+            f"JOIN {recipes} r "
+            "ON r.id = v.recipe_id AND r.user_id = v.user_id "
+            "ON CONFLICT (recipe_id) DO UPDATE SET "
+            f"views = {table}.views + EXCLUDED.views, "
+            f"score = GREATEST({table}.score, EXCLUDED.score) + LN(1 + "
+            f"POWER(2, GREATEST(LEAST({table}.score, EXCLUDED.score) - "
+            f"GREATEST({table}.score, EXCLUDED.score), -1000))) / LN(2)",
+            [value for row in rows for value in row],
+        )
+
+
+def trending(user, limit):
+    """Return up to limit recipes of user by trending score.
+
+    Recipes are annotated with views and decayed_views.
+    """
+    ranked = []
+    for popularity in (
+        RecipePopularity.objects.filter(user=user)
+        .select_related("recipe")
+        .order_by("-score")[:limit]
+    ):
+        recipe = popularity.recipe
+        recipe.views = popularity.views
+        recipe.decayed_views = decayed_views(popularity.score)
+        ranked.append(recipe)
+    return ranked
+
+
+# counts left at a graceful worker shutdown
+atexit.register(flush)
@@ -0,0 +1,65 @@
+"""
+Random recipes without sorting the user's recipes by random().
+
+The ids of the (filtered) recipes are probed at random points between the
+smallest and largest id of all the user's recipes: each probe reads the
+first matching recipe from the point on, a seek in the (user, id) index.
+The bounds are read from the unfiltered recipes, the planner can misjudge
+how far a MIN() or MAX() of filtered recipes has to scan. Recipes following
+a gap in the matching ids are picked more often, which is fine for a
+"surprise me" feature. The probed recipes are shuffled before keeping count
+of them, the database returns them in storage order.
+"""
+import random
+
+from django.db.models import Max, Min
+from django.db.models.expressions import RawSQL
+
+# probes per requested recipe, duplicates happen when few recipes match
+PROBES_PER_RECIPE = 2
+
+
+def sample(recipes, count, within=None, rng=random):
+    """Return up to count distinct random recipes of a queryset.
+
+    within is the queryset recipes were filtered from, its id range is
+    probed (recipes itself by default).
+    """
+    recipes = recipes.order_by()
+    within = recipes if within is None else within.order_by()
+    bounds = within.aggregate(low=Min("id"), high=Max("id"))
+    if bounds["low"] is None:
+        return []
+
+    # the first matching id from each random point, all the probes in one
+    # subquery compiled once
+    ids, params = recipes.values("id").query.sql_with_params()
+    points = [
+        rng.randint(bounds["low"], bounds["high"])
+        for _ in range(count * PROBES_PER_RECIPE)
+    ]
+    probed = RawSQL(
+        "SELECT (SELECT r.id FROM (" + ids + ") r WHERE r.id >= point "
+        "ORDER BY r.id LIMIT 1) FROM unnest(%s::bigint[]) point",
+        (*params, points),
+    )
+    picked = list(recipes.filter(id__in=probed))
+    rng.shuffle(picked)
+    picked = picked[:count]
+
+    if len(picked) < count:
+        # few matching recipes or probes past the last one: take the others
+        # at random from a window of ids following another random point,
+        # wrapping around to the smallest ids
+        missing = count - len(picked)
+        window = missing * PROBES_PER_RECIPE
+        others = recipes.exclude(
+            id__in=[recipe.id for recipe in picked]).order_by("id")
+        start = rng.randint(bounds["low"], bounds["high"])
+        candidates = list(others.filter(id__gte=start)[:window])
+        if len(candidates) < window:
+            candidates += others.filter(
+                id__lt=start)[:window - len(candidates)]
+        rng.shuffle(candidates)
+        picked += candidates[:missing]
+    return picked
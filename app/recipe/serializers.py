@@ -1,71 +1,119 @@
 """
 Serializers for recipe APIs
 """
+from typing import List
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils.translation import gettext as _
+
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
-from core.models import Recipe, Tag, Ingredient
+from core.models import Recipe, Tag, Ingredient, ImageUploadSession
+
+from recipe import names
+from recipe.bulk import MAX_BULK_SIZE
+from recipe.arrays import ARRAYS
+from recipe.images import image_metadata
+from recipe.uploads import missing_chunks, validate_image_file
+
+# image metadata stored on Recipe when an image is uploaded
+IMAGE_METADATA_FIELDS = [
+    "image_width",
+    "image_height",
+    "image_size",
+    "image_color",
+    "image_placeholder",
+]
 
 
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for Tags."""
 
+    # only listed when requested, see BaseRecipeAttrViewSet
+    recipe_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Tag
-        fields = ["id", "name"]
+        fields = ["id", "name", "recipe_count"]
         read_only_fields = ["id"]
 
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for ingredients."""
 
+    # only listed when requested, see BaseRecipeAttrViewSet
+    recipe_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Ingredient
-        fields = ["id", "name"]
+        fields = ["id", "name", "recipe_count"]
         read_only_fields = ["id"]
 
 
+class LinkArrayListSerializer(serializers.ListSerializer):
+    """Lists the tags or ingredients of a recipe from its link arrays.
+
+    Reads the ids and names denormalized on the recipe (see recipe.arrays)
+    rather than querying the links of every listed recipe.
+    """
+
+    def get_attribute(self, instance):
+        ids, names = ARRAYS[self.field_name]
+        return [
+            {"id": item_id, "name": name}
+            for item_id, name in zip(
+                getattr(instance, ids), getattr(instance, names))
+        ]
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for recipes."""
 
-    tags = TagSerializer(many=True, required=False)
-    ingredients = IngredientSerializer(many=True, required=False)
+    tags = LinkArrayListSerializer(child=TagSerializer(), required=False)
+    ingredients = LinkArrayListSerializer(
+        child=IngredientSerializer(), required=False)
 
     class Meta:
         model = Recipe
         fields = ["id", "title", "time_minutes", "price",
-                  "link", "tags", "ingredients"]
-        read_only_fields = ["id"]
+                  "link", "tags", "ingredients"] + IMAGE_METADATA_FIELDS
+        read_only_fields = ["id"] + IMAGE_METADATA_FIELDS
 
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags as needed."""
         # context is passed to serializer by the view
         # context is used to fetch values from the request
         auth_user = self.context["request"].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        # one upsert for all the tags, safe against concurrent requests
+        tag_ids = names.upsert(
+            Tag, auth_user.id, [tag["name"] for tag in tags],
+            recipe._state.db)
+        # one m2m_changed, the link arrays are refreshed once
+        recipe.tags.add(*tag_ids)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients."""
         # context is passed to serializer by the view
         # context is used to fetch values from the request
         auth_user = self.context["request"].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        ingredient_ids = names.upsert(
+            Ingredient,
+            auth_user.id,
+            [ingredient["name"] for ingredient in ingredients],
+            recipe._state.db,
+        )
+        recipe.ingredients.add(*ingredient_ids)
 
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop("tags", [])
         ingredients = validated_data.pop("ingredients", [])
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        # the recipe, its links and link arrays are written together
+        with transaction.atomic(using=router.db_for_write(Recipe)):
+            recipe = Recipe.objects.create(**validated_data)
+            self._get_or_create_tags(tags, recipe)
+            self._get_or_create_ingredients(ingredients, recipe)
 
         return recipe
 
@@ -76,25 +124,26 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop("tags", None)
         ingredients = validated_data.pop("ingredients", None)
 
-        # update tags
-        # check if update request has tags
-        if tags is not None:
-            # clear existing tags and assign new ones
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-
-        # update ingredients
-        # check if update request has ingredients
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
-
-        # update other fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        # save the updated data in instance
-        instance.save()
+        with transaction.atomic(using=instance._state.db):
+            # update tags
+            # check if update request has tags
+            if tags is not None:
+                # clear existing tags and assign new ones
+                instance.tags.clear()
+                self._get_or_create_tags(tags, instance)
+
+            # update ingredients
+            # check if update request has ingredients
+            if ingredients is not None:
+                instance.ingredients.clear()
+                self._get_or_create_ingredients(ingredients, instance)
+
+            # update other fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+
+            # save the updated data in instance
+            instance.save()
         return instance
 
 
@@ -105,11 +154,294 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ["description", "image"]
 
 
+class CookableRecipeSerializer(RecipeSerializer):
+    """Serializer for recipes ranked by ingredients missing from a pantry."""
+
+    missing_count = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + [
+            "missing_count",
+            "missing_ingredients",
+        ]
+
+    @extend_schema_field(IngredientSerializer(many=True))
+    def get_missing_ingredients(self, recipe):
+        pantry = self.context["pantry"]
+        return [
+            {"id": ingredient_id, "name": name}
+            for ingredient_id, name in zip(
+                recipe.ingredient_ids, recipe.ingredient_names)
+            if ingredient_id not in pantry
+        ]
+
+
+class SimilarRecipeSerializer(RecipeSerializer):
+    """Serializer for recipes ranked by similarity to another recipe."""
+
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ["similarity"]
+
+
+class TrendingRecipeSerializer(RecipeSerializer):
+    """Serializer for recipes ranked by recent views."""
+
+    views = serializers.IntegerField(read_only=True)
+    decayed_views = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ["views", "decayed_views"]
+
+
+class BoundedImageField(serializers.ImageField):
+    """Image field checking the upload header before Pillow validation."""
+
+    def to_internal_value(self, data):
+        if hasattr(data, "read"):
+            validate_image_file(data)
+        return super().to_internal_value(data)
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes."""
 
+    image = BoundedImageField(allow_null=True)
+
     class Meta:
         model = Recipe
-        fields = ["id", "image"]
-        read_only_fields = ["id"]
-        extra_kwargs = {"image": {"required": "False"}}
+        fields = ["id", "image"] + IMAGE_METADATA_FIELDS
+        read_only_fields = ["id"] + IMAGE_METADATA_FIELDS
+
+    def update(self, instance, validated_data):
+        """Store image metadata along with the uploaded image."""
+        image = validated_data.get("image")
+        if image:
+            validated_data.update(image_metadata(image))
+
+        return super().update(instance, validated_data)
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Validate range filters and ordering of recipe lists."""
+
+    # ordering parameter values and the columns sorted on, ending with the
+    # unique id for keyset pagination (see recipe.pagination)
+    ORDERINGS = {
+        "id": ("id",),
+        "-id": ("-id",),
+        "price": ("price", "id"),
+        "-price": ("-price", "-id"),
+        "time_minutes": ("time_minutes", "id"),
+        "-time_minutes": ("-time_minutes", "-id"),
+    }
+
+    min_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False)
+    max_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False)
+    min_time_minutes = serializers.IntegerField(min_value=0, required=False)
+    max_time_minutes = serializers.IntegerField(min_value=0, required=False)
+    ordering = serializers.ChoiceField(
+        choices=list(ORDERINGS), default="-id")
+
+    def validate(self, attrs):
+        for field in ("price", "time_minutes"):
+            low = attrs.get(f"min_{field}")
+            high = attrs.get(f"max_{field}")
+            if low is not None and high is not None and low > high:
+                msg = _("Must not exceed max_%(field)s.") % {"field": field}
+                raise serializers.ValidationError({f"min_{field}": msg})
+        return attrs
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Validate autocomplete parameters."""
+
+    q = serializers.CharField(max_length=255)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class IdSetField(serializers.CharField):
+    """Comma separated list of IDs, validated into a set of ints."""
+
+    default_error_messages = {
+        "invalid_ids": _("Expected comma separated IDs."),
+        "too_many": _("Too many IDs, at most {max_count}."),
+    }
+
+    def __init__(self, max_count=200, **kwargs):
+        self.max_count = max_count
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        try:
+            ids = {int(str_id) for str_id in value.split(",")}
+        except ValueError:
+            self.fail("invalid_ids")
+        if len(ids) > self.max_count:
+            self.fail("too_many", max_count=self.max_count)
+        return ids
+
+
+class CookableParamsSerializer(serializers.Serializer):
+    """Validate the pantry of the cookable recipes search."""
+
+    ingredients = IdSetField(
+        help_text="Comma separated list of ingredient IDs in the pantry")
+    max_missing = serializers.IntegerField(
+        min_value=0, max_value=5, default=1)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class ShoppingListParamsSerializer(serializers.Serializer):
+    """Validate the recipes of a shopping list."""
+
+    recipes = IdSetField(
+        max_count=100, help_text="Comma separated list of recipe IDs")
+
+
+class LimitParamsSerializer(serializers.Serializer):
+    """Validate the number of recipes of a ranked list."""
+
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class SampleParamsSerializer(serializers.Serializer):
+    """Validate the number of random recipes."""
+
+    count = serializers.IntegerField(min_value=1, max_value=20, default=1)
+
+
+class CreateParamsSerializer(serializers.Serializer):
+    """Validate the options of a recipe creation."""
+
+    skip_duplicates = serializers.BooleanField(default=False)
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Validate the ids of a bulk delete."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_BULK_SIZE,
+    )
+
+
+class RecipeChangesSerializer(serializers.ModelSerializer):
+    """Recipe fields set by a bulk update."""
+
+    class Meta:
+        model = Recipe
+        fields = ["title", "time_minutes", "price", "link", "description"]
+        extra_kwargs = {
+            "title": {"required": False},
+            "time_minutes": {"required": False},
+            "price": {"required": False},
+        }
+
+
+class NameListField(serializers.ListField):
+    """Tag or ingredient names linked or unlinked by a bulk update."""
+
+    child = serializers.CharField(max_length=255)
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("required", False)
+        kwargs.setdefault("max_length", 50)
+        super().__init__(**kwargs)
+
+
+class BulkRecipeUpdateSerializer(BulkIdsSerializer):
+    """Validate a bulk update of recipes."""
+
+    changes = RecipeChangesSerializer(required=False)
+    add_tags = NameListField()
+    remove_tags = NameListField()
+    add_ingredients = NameListField()
+    remove_ingredients = NameListField()
+
+    def validate(self, attrs):
+        if not any(value for name, value in attrs.items() if name != "ids"):
+            raise serializers.ValidationError(_("Nothing to update."))
+        return attrs
+
+
+class BulkItemSerializer(serializers.Serializer):
+    """New name of a tag or ingredient."""
+
+    id = serializers.IntegerField(min_value=1)
+    name = serializers.CharField(max_length=255)
+
+
+class BulkItemUpdateSerializer(serializers.Serializer):
+    """Validate a bulk rename of tags or ingredients."""
+
+    items = serializers.ListField(
+        child=BulkItemSerializer(),
+        min_length=1,
+        max_length=MAX_BULK_SIZE,
+    )
+
+    def validate_items(self, items):
+        # one name per item, a second one would be dropped
+        ids = [item["id"] for item in items]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(_("Duplicate item ids."))
+        return items
+
+
+class FacetCountSerializer(serializers.Serializer):
+    """Number of matching recipes with a tag or ingredient."""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class FacetRangeSerializer(serializers.Serializer):
+    """Number of matching recipes in a range, max excluded."""
+
+    min = serializers.IntegerField()
+    max = serializers.IntegerField(allow_null=True)
+    count = serializers.IntegerField()
+
+
+class RecipeFacetsSerializer(serializers.Serializer):
+    """Serializer for facet counts of recipes."""
+
+    count = serializers.IntegerField()
+    tags = FacetCountSerializer(many=True)
+    ingredients = FacetCountSerializer(many=True)
+    price = FacetRangeSerializer(many=True)
+    time_minutes = FacetRangeSerializer(many=True)
+
+
+class ImageUploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for chunked recipe image upload sessions."""
+
+    missing_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUploadSession
+        fields = ["id", "recipe", "filename", "size", "chunk_size",
+                  "missing_chunks"]
+        read_only_fields = ["id", "chunk_size", "missing_chunks"]
+
+    def get_missing_chunks(self, obj) -> List[int]:
+        return missing_chunks(obj)
+
+    def validate_recipe(self, value):
+        """Only allow uploading to recipes of the authenticated user."""
+        if value.user_id != self.context["request"].user.id:
+            raise serializers.ValidationError(_("Recipe not found."))
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(_("Invalid upload size."))
+        return value
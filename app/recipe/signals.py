@@ -0,0 +1,155 @@
+"""
+Signal handlers invalidating cached recipe data and keeping the recipe
+feature index (see recipe.similar), link arrays (see recipe.arrays), user
+statistics (see recipe.stats) and duplicate index (see recipe.duplicates)
+in sync, removing the chunks of deleted upload sessions and writing the
+recipe views counted (see recipe.popularity) after requests.
+"""
+from django.core.signals import request_finished
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.db import transaction
+from django.dispatch import receiver
+
+from core.models import (
+    ImageUploadSession,
+    Ingredient,
+    Recipe,
+    RecipeFeature,
+    Tag,
+)
+from recipe import duplicates, popularity, stats, uploads
+from recipe.arrays import refresh_on_item_change, refresh_on_link_change
+from recipe.cache import bump_version
+from recipe.similar import index_links, unindex_feature
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_change(sender, instance, **kwargs):
+    bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_link_change(sender, instance, action, **kwargs):
+    # instance is a recipe, or a tag/ingredient for reverse changes, all
+    # owned by the same user
+    if action.startswith("post_"):
+        bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def index_on_link_change(sender, instance, action, reverse, pk_set, using,
+                         **kwargs):
+    index_links(sender, instance, action, reverse, pk_set, using)
+
+
+@receiver(post_delete, sender=Tag)
+def unindex_tag(sender, instance, using, **kwargs):
+    unindex_feature(RecipeFeature.TAG, instance.id, using)
+
+
+@receiver(post_delete, sender=Ingredient)
+def unindex_ingredient(sender, instance, using, **kwargs):
+    unindex_feature(RecipeFeature.INGREDIENT, instance.id, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_arrays_on_link_change(sender, instance, action, reverse, pk_set,
+                                  using, **kwargs):
+    refresh_on_link_change(sender, instance, action, reverse, pk_set, using)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def refresh_arrays_on_rename(sender, instance, created, using, **kwargs):
+    if not created:
+        refresh_on_item_change(instance, using)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_arrays_on_delete(sender, instance, using, **kwargs):
+    refresh_on_item_change(instance, using)
+
+
+@receiver(pre_save, sender=Recipe)
+def count_recipe_saving(sender, instance, update_fields, using, **kwargs):
+    stats.on_recipe_saving(instance, update_fields, using)
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_saved(sender, instance, using, **kwargs):
+    stats.on_recipe_saved(instance, using)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_recipe_deleted(sender, instance, using, **kwargs):
+    stats.on_recipe_deleted(instance, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def count_tag_links(sender, instance, action, reverse, pk_set, using,
+                    **kwargs):
+    stats.on_tag_links_changed(instance, action, reverse, pk_set, using)
+
+
+@receiver(post_delete, sender=Tag)
+def count_tag_deleted(sender, instance, using, **kwargs):
+    stats.on_tag_deleted(instance, using)
+
+
+# after the link arrays handlers, the bands are computed from the arrays
+@receiver(post_save, sender=Recipe)
+def index_duplicates_on_save(sender, instance, update_fields, using,
+                             **kwargs):
+    duplicates.on_recipe_saved(instance, update_fields, using)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def index_duplicates_on_link_change(sender, instance, action, reverse,
+                                    pk_set, using, **kwargs):
+    duplicates.on_ingredient_links_changed(
+        instance, action, reverse, pk_set, using)
+
+
+@receiver(post_save, sender=Ingredient)
+def index_duplicates_on_rename(sender, instance, created, using, **kwargs):
+    if not created:
+        duplicates.on_ingredient_changed(instance, using)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def index_duplicates_deleting(sender, instance, using, **kwargs):
+    duplicates.on_ingredient_deleting(instance, using)
+
+
+@receiver(post_delete, sender=Ingredient)
+def index_duplicates_on_delete(sender, instance, using, **kwargs):
+    duplicates.on_ingredient_changed(instance, using)
+
+
+@receiver(post_delete, sender=ImageUploadSession)
+def discard_session_chunks(sender, instance, using, **kwargs):
+    # also deleted with their recipe; the chunks go once the delete commits,
+    # by then the deleted instance has lost its id
+    session = ImageUploadSession(id=instance.id)
+    transaction.on_commit(
+        lambda: uploads.discard_chunks(session), using=using)
+
+
+@receiver(request_finished)
+def flush_views(sender, **kwargs):
+    popularity.flush_when_due()
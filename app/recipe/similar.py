@@ -0,0 +1,112 @@
+"""
+Recipes similar to a given one.
+
+Similarity is the Jaccard index of the tags and ingredients (features) of
+two recipes: shared features over features of either. The RecipeFeature
+inverted index maps each feature to the recipes having it, so only the
+recipes sharing a feature with the given one are scored.
+"""
+from django.db.models import (
+    Count,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+)
+from django.db.models.functions import Cast
+
+from core.models import Recipe, RecipeFeature
+
+KINDS = {
+    Recipe.tags.through: RecipeFeature.TAG,
+    Recipe.ingredients.through: RecipeFeature.INGREDIENT,
+}
+
+
+def index_links(sender, instance, action, reverse, pk_set, using):
+    """Apply an m2m_changed of the recipe tags or ingredients to the index.
+
+    instance is the recipe and pk_set the tags or ingredients, or the other
+    way round for reverse changes (e.g. tag.recipe_set.add(recipe)).
+    """
+    kind = KINDS[sender]
+    features = RecipeFeature.objects.using(using).filter(kind=kind)
+    if reverse:
+        link, other = {"feature_id": instance.id}, "recipe_id"
+    else:
+        link, other = {"recipe_id": instance.id}, "feature_id"
+
+    if action == "post_add":
+        RecipeFeature.objects.using(using).bulk_create(
+            [
+                RecipeFeature(
+                    user_id=instance.user_id, kind=kind, **link, **{other: pk})
+                for pk in pk_set
+            ],
+            ignore_conflicts=True,
+        )
+    elif action == "post_remove":
+        features.filter(**link, **{f"{other}__in": pk_set}).delete()
+    elif action == "post_clear":
+        features.filter(**link).delete()
+
+
+def unindex_feature(kind, feature_id, using):
+    """Remove a deleted tag or ingredient from the index.
+
+    Deleting it removes its links without sending m2m_changed.
+    """
+    RecipeFeature.objects.using(using).filter(
+        kind=kind, feature_id=feature_id).delete()
+
+
+def similar_recipes(recipe, limit=10):
+    """Return up to limit other recipes of the user most similar to recipe.
+
+    Recipes are annotated with similarity, between 0 and 1, and ordered by
+    it then by the number of shared features.
+    """
+    features = list(
+        RecipeFeature.objects.filter(recipe=recipe)
+        .values_list("kind", "feature_id")
+    )
+    if not features:
+        return []
+    shared = Q()
+    for kind, _label in RecipeFeature.KIND_CHOICES:
+        ids = [feature_id for k, feature_id in features if k == kind]
+        if ids:
+            shared |= Q(kind=kind, feature_id__in=ids)
+
+    sizes = (
+        RecipeFeature.objects.filter(recipe_id=OuterRef("recipe_id"))
+        .order_by()
+        .values("recipe_id")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    scores = list(
+        RecipeFeature.objects.filter(shared)
+        .exclude(recipe_id=recipe.id)
+        .values("recipe_id")
+        .annotate(shared=Count("id"), size=Subquery(sizes))
+        .annotate(
+            similarity=Cast("shared", FloatField())
+            / (len(features) + F("size") - F("shared"))
+        )
+        .order_by("-similarity", "-shared", "-recipe_id")[:limit]
+    )
+
+    found = Recipe.objects.filter(user_id=recipe.user_id).in_bulk(
+        [row["recipe_id"] for row in scores])
+    ranked = []
+    for row in scores:
+        # the index has no foreign key to core_recipe and can point at a
+        # recipe deleted meanwhile
+        other = found.get(row["recipe_id"])
+        if other is None:
+            continue
+        other.similarity = row["similarity"]
+        ranked.append(other)
+    return ranked
@@ -0,0 +1,200 @@
+"""
+Per-user recipe statistics.
+
+Counters stored in UserStat, one row per user and name:
+
+- `recipes`: number of recipes,
+- `time_minutes`: total time_minutes of the recipes,
+- `price_<n>`: recipes in the n-th range of facets.PRICE_BOUNDS,
+- `tag_<id>`: recipes with tag id.
+
+Signal handlers (see recipe.signals) add the delta of every recipe and tag
+link change in one upsert, in the transaction of the change. Writes that
+bypass signals (QuerySet.update, raw SQL) are not counted, `python
+manage.py rebuild_user_stats` recomputes the counters from the recipes.
+"""
+import bisect
+
+from django.db import connections, transaction
+from django.db.models import Count, Q, Sum
+
+from core.models import Recipe, Tag, UserStat
+from recipe.facets import PRICE_BOUNDS, value_ranges
+
+TOP_TAGS = 5
+
+
+def price_stat(price):
+    """Return the counter name of the price range of price."""
+    return f"price_{max(bisect.bisect_right(PRICE_BOUNDS, price) - 1, 0)}"
+
+
+def tag_stat(tag_id):
+    return f"tag_{tag_id}"
+
+
+def recipe_deltas(time_minutes, price, sign=1):
+    """Return the counter deltas of adding (or removing) a recipe."""
+    return {
+        "recipes": sign,
+        "time_minutes": sign * time_minutes,
+        price_stat(price): sign,
+    }
+
+
+def add(user_id, deltas, using):
+    """Add deltas ({name: delta}) to the counters of user_id."""
+    # sorted, concurrent upserts lock the rows in the same order
+    rows = sorted(
+        (name, delta) for name, delta in deltas.items() if delta)
+    if not rows:
+        return
+    table = connections[using].ops.quote_name(UserStat._meta.db_table)
+    values = ", ".join(["(%s, %s, %s)"] * len(rows))
+    params = []
+    for name, delta in rows:
+        params += [user_id, name, delta]
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, name, value) VALUES {values} "
+            "ON CONFLICT (user_id, name) "
+            f"DO UPDATE SET value = {table}.value + EXCLUDED.value",
+            params,
+        )
+
+
+def merge(*deltas):
+    """Return the sum of several delta dicts."""
+    total = {}
+    for delta in deltas:
+        for name, value in delta.items():
+            total[name] = total.get(name, 0) + value
+    return total
+
+
+def on_recipe_saving(instance, update_fields, using):
+    """Remember the counted values of a recipe about to be updated."""
+    instance._stats_previous = None
+    if update_fields is not None and not {"time_minutes", "price"} & set(
+            update_fields):
+        # counted values unchanged, on_recipe_saved adds nothing
+        instance._stats_previous = (instance.time_minutes, instance.price)
+    elif not instance._state.adding:
+        instance._stats_previous = (
+            Recipe.objects.using(using)
+            .filter(pk=instance.pk)
+            .values_list("time_minutes", "price")
+            .first()
+        )
+
+
+def on_recipe_saved(instance, using):
+    deltas = recipe_deltas(instance.time_minutes, instance.price)
+    previous = getattr(instance, "_stats_previous", None)
+    if previous is not None:
+        deltas = merge(deltas, recipe_deltas(*previous, sign=-1))
+    add(instance.user_id, deltas, using)
+
+
+def on_recipe_deleted(instance, using):
+    # its tag links were deleted along without m2m_changed, the tag_ids
+    # array (see recipe.arrays) still lists them
+    deltas = recipe_deltas(instance.time_minutes, instance.price, sign=-1)
+    for tag_id in instance.tag_ids:
+        deltas[tag_stat(tag_id)] = -1
+    add(instance.user_id, deltas, using)
+
+
+def on_tag_links_changed(instance, action, reverse, pk_set, using):
+    """Count the recipes of tags on m2m_changed of Recipe.tags."""
+    if action in ("post_add", "post_remove"):
+        sign = 1 if action == "post_add" else -1
+        if reverse:
+            deltas = {tag_stat(instance.id): sign * len(pk_set)}
+        else:
+            deltas = {tag_stat(tag_id): sign for tag_id in pk_set}
+    elif action == "pre_clear":
+        # the links are about to be deleted in the same transaction
+        links = Recipe.tags.through.objects.using(using)
+        if reverse:
+            count = links.filter(tag_id=instance.id).count()
+            deltas = {tag_stat(instance.id): -count}
+        else:
+            deltas = {
+                tag_stat(tag_id): -1
+                for tag_id in links.filter(
+                    recipe_id=instance.id).values_list("tag_id", flat=True)
+            }
+    else:
+        return
+    add(instance.user_id, deltas, using)
+
+
+def on_tag_deleted(instance, using):
+    UserStat.objects.using(using).filter(
+        user_id=instance.user_id, name=tag_stat(instance.id)).delete()
+
+
+def rebuild(user, using):
+    """Recompute the counters of user from their recipes."""
+    recipes = Recipe.objects.using(using).filter(user=user)
+    aggregates = {
+        "recipes": Count("id"),
+        "time_minutes": Sum("time_minutes"),
+    }
+    price_ranges = value_ranges("price", PRICE_BOUNDS)
+    for index, (_, _, condition) in enumerate(price_ranges):
+        aggregates[f"price_{index}"] = Count("id", filter=condition)
+    counters = recipes.aggregate(**aggregates)
+    counters["time_minutes"] = counters["time_minutes"] or 0
+    tags = (
+        Recipe.tags.through.objects.using(using)
+        .filter(recipe__user=user)
+        .values("tag_id")
+        .annotate(count=Count("id"))
+    )
+    for row in tags:
+        counters[tag_stat(row["tag_id"])] = row["count"]
+
+    with transaction.atomic(using=using):
+        UserStat.objects.using(using).filter(user=user).delete()
+        UserStat.objects.using(using).bulk_create([
+            UserStat(user=user, name=name, value=value)
+            for name, value in counters.items()
+        ])
+
+
+def user_stats(user, using):
+    """Return the statistics of user read from their counters."""
+    stats = UserStat.objects.using(using).filter(user=user)
+    counters = dict(
+        stats.filter(~Q(name__startswith="tag_")).values_list(
+            "name", "value"))
+    top = list(
+        stats.filter(name__startswith="tag_", value__gt=0)
+        .order_by("-value", "name")
+        .values_list("name", "value")[:TOP_TAGS]
+    )
+    top = [(int(name[len("tag_"):]), value) for name, value in top]
+    tags = Tag.objects.using(using).in_bulk([tag_id for tag_id, _ in top])
+
+    count = counters.get("recipes", 0)
+    return {
+        "recipe_count": count,
+        "average_time_minutes": (
+            counters.get("time_minutes", 0) / count if count else None),
+        "price": [
+            {
+                "min": low,
+                "max": high,
+                "count": counters.get(f"price_{index}", 0),
+            }
+            for index, (low, high, _) in enumerate(
+                value_ranges("price", PRICE_BOUNDS))
+        ],
+        "top_tags": [
+            {"id": tag_id, "name": tags[tag_id].name, "count": value}
+            for tag_id, value in top
+            if tag_id in tags
+        ],
+    }
@@ -0,0 +1,11 @@
+"""
+Background tasks of the recipe app, run by `manage.py run_worker`.
+"""
+from core.jobs import task
+from core.models import ImageUploadSession
+
+
+@task()
+def expire_upload_session(session_id, using):
+    """Delete an upload session left unfinished, with its chunks."""
+    ImageUploadSession.objects.using(using).filter(id=session_id).delete()
@@ -0,0 +1,210 @@
+"""
+Tests for bulk updates and deletes of recipes, tags and ingredients.
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Ingredient,
+    Recipe,
+    RecipeBand,
+    RecipeFeature,
+    Tag,
+    UserStat,
+)
+from recipe.duplicates import index_recipes
+from recipe.stats import rebuild
+from recipe.tests.test_recipe_api import create_recipe, create_user
+
+RECIPES_BULK_URL = reverse("recipe:recipe-bulk-update")
+TAGS_BULK_URL = reverse("recipe:tag-bulk-update")
+INGREDIENTS_BULK_URL = reverse("recipe:ingredient-bulk-update")
+
+
+def counters(user):
+    """Return the non-zero counters of user."""
+    return dict(
+        UserStat.objects.filter(user=user)
+        .exclude(value=0)
+        .values_list("name", "value")
+    )
+
+
+class BulkApiTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+        self.other = create_user(email="other@example.com", password="test123")
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.salt = Ingredient.objects.create(user=self.user, name="Salt")
+        self.recipes = []
+        for index in range(3):
+            recipe = create_recipe(user=self.user, title=f"Soup {index}")
+            recipe.tags.add(self.vegan)
+            recipe.ingredients.add(self.salt)
+            self.recipes.append(recipe)
+        self.foreign = create_recipe(user=self.other)
+
+    def assertStatsConsistent(self):
+        incremental = counters(self.user)
+        rebuild(self.user, "default")
+        self.assertEqual(incremental, counters(self.user))
+
+
+class BulkRecipeApiTests(BulkApiTestCase):
+    """Test bulk updates and deletes of recipes."""
+
+    def test_bulk_update(self):
+        """Test fields and tags change on owned recipes only."""
+        ids = [recipe.id for recipe in self.recipes[:2]] + [self.foreign.id]
+
+        res = self.client.patch(RECIPES_BULK_URL, {
+            "ids": ids,
+            "changes": {"price": "42.00", "time_minutes": 90},
+            "add_tags": ["Quick", "vegan"],
+            "remove_tags": ["VEGAN"],
+        }, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r["id"], r["status"]) for r in res.data],
+            [(ids[0], 200), (ids[1], 200), (ids[2], 404)],
+        )
+        self.assertEqual(res.data[0]["price"], "42.00")
+        self.assertEqual(
+            [tag["name"] for tag in res.data[0]["tags"]], ["Quick"])
+        self.recipes[2].refresh_from_db()
+        self.assertEqual(self.recipes[2].tag_names, ["Vegan"])
+        self.foreign.refresh_from_db()
+        self.assertNotEqual(self.foreign.price, Decimal("42.00"))
+        quick = Tag.objects.get(user=self.user, name="Quick")
+        self.assertEqual(
+            RecipeFeature.objects.filter(feature_id=quick.id).count(), 2)
+        self.assertStatsConsistent()
+
+    def test_bulk_update_query_count(self):
+        """Test the number of queries doesn't grow with the recipes."""
+        def run(recipes):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.patch(RECIPES_BULK_URL, {
+                    "ids": [recipe.id for recipe in recipes],
+                    "changes": {"price": "3.00", "title": "Stew"},
+                }, format="json")
+            return len(queries)
+
+        few = run(self.recipes[:1])
+        many = run(self.recipes + [
+            create_recipe(user=self.user) for _ in range(5)])
+
+        self.assertEqual(few, many)
+
+    def test_bulk_update_nothing(self):
+        """Test a bulk update without changes is rejected."""
+        res = self.client.patch(
+            RECIPES_BULK_URL, {"ids": [self.recipes[0].id]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete(self):
+        """Test owned recipes and their derived rows are deleted."""
+        ids = [self.recipes[0].id, self.recipes[1].id, self.foreign.id]
+
+        res = self.client.delete(RECIPES_BULK_URL, {"ids": ids}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r["id"], r["status"]) for r in res.data],
+            [(ids[0], 204), (ids[1], 204), (ids[2], 404)],
+        )
+        self.assertEqual(
+            set(Recipe.objects.values_list("id", flat=True)),
+            {self.recipes[2].id, self.foreign.id},
+        )
+        for model in (RecipeFeature, RecipeBand, Recipe.tags.through):
+            self.assertFalse(
+                model.objects.filter(recipe_id__in=ids[:2]).exists())
+        self.assertStatsConsistent()
+
+
+class BulkItemApiTests(BulkApiTestCase):
+    """Test bulk renames and deletes of tags and ingredients."""
+
+    def test_bulk_rename(self):
+        """Test renamed tags update their recipes, taken names fail."""
+        quick = Tag.objects.create(user=self.user, name="Quick")
+        foreign = Tag.objects.create(user=self.other, name="Spicy")
+
+        res = self.client.patch(TAGS_BULK_URL, {"items": [
+            {"id": self.vegan.id, "name": "Plant based"},
+            {"id": quick.id, "name": "plant BASED"},
+            {"id": foreign.id, "name": "Hot"},
+        ]}, format="json")
+
+        self.assertEqual(
+            [(r["id"], r["status"]) for r in res.data],
+            [(self.vegan.id, 400), (quick.id, 400), (foreign.id, 404)],
+        )
+
+        res = self.client.patch(TAGS_BULK_URL, {"items": [
+            {"id": self.vegan.id, "name": "Plant based"},
+            {"id": quick.id, "name": "vegan"},
+        ]}, format="json")
+
+        self.assertEqual(
+            [(r["id"], r["status"]) for r in res.data],
+            [(self.vegan.id, 200), (quick.id, 400)],
+        )
+        self.recipes[0].refresh_from_db()
+        self.assertEqual(self.recipes[0].tag_names, ["Plant based"])
+
+    def test_bulk_rename_duplicate_ids(self):
+        """Test an item listed twice is rejected."""
+        res = self.client.patch(TAGS_BULK_URL, {"items": [
+            {"id": self.vegan.id, "name": "Plant based"},
+            {"id": self.vegan.id, "name": "Green"},
+        ]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.name, "Vegan")
+
+    def test_bulk_delete_tags(self):
+        """Test deleted tags leave their recipes and counters."""
+        res = self.client.delete(
+            TAGS_BULK_URL, {"ids": [self.vegan.id]}, format="json")
+
+        self.assertEqual(res.data[0]["status"], 204)
+        self.assertFalse(Tag.objects.exists())
+        self.recipes[0].refresh_from_db()
+        self.assertEqual(self.recipes[0].tag_ids, [])
+        self.assertFalse(RecipeFeature.objects.filter(kind="t").exists())
+        self.assertStatsConsistent()
+
+    def test_bulk_rename_and_delete_ingredients(self):
+        """Test the duplicate bands follow ingredient changes."""
+        def bands():
+            return sorted(RecipeBand.objects.values_list(
+                "recipe_id", "band", "key"))
+
+        self.client.patch(INGREDIENTS_BULK_URL, {"items": [
+            {"id": self.salt.id, "name": "Sea salt"},
+        ]}, format="json")
+        renamed = bands()
+        index_recipes(Recipe.objects.filter(user=self.user))
+        self.assertEqual(renamed, bands())
+
+        self.client.delete(
+            INGREDIENTS_BULK_URL, {"ids": [self.salt.id]}, format="json")
+        deleted = bands()
+        index_recipes(Recipe.objects.filter(user=self.user))
+        self.assertEqual(deleted, bands())
+        self.assertFalse(Ingredient.objects.exists())
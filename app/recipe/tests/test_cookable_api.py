@@ -0,0 +1,82 @@
+"""
+Tests for the cookable recipes API.
+"""
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient
+from recipe.tests.test_recipe_api import create_recipe, create_user
+
+COOKABLE_URL = reverse("recipe:recipe-cookable")
+
+
+class PrivateCookableApiTests(TestCase):
+    """Test searching recipes by the ingredients at hand."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+
+        self.items = {
+            name: Ingredient.objects.create(user=self.user, name=name)
+            for name in ("Eggs", "Flour", "Milk", "Sugar", "Salt")
+        }
+        self.pancakes = self._recipe("Pancakes", "Eggs", "Flour", "Milk")
+        self.omelette = self._recipe("Omelette", "Eggs", "Salt")
+        self.cake = self._recipe("Cake", "Eggs", "Flour", "Sugar", "Milk")
+        self._recipe("Syrup", "Sugar")
+
+    def _recipe(self, title, *names):
+        recipe = create_recipe(user=self.user, title=title)
+        recipe.ingredients.add(*(self.items[name] for name in names))
+        return recipe
+
+    def _pantry(self, *names):
+        return ",".join(str(self.items[name].id) for name in names)
+
+    def test_ranked_by_missing_ingredients(self):
+        """Test complete recipes come first, then those missing one."""
+        params = {"ingredients": self._pantry("Eggs", "Flour", "Milk")}
+        res = self.client.get(COOKABLE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r["title"], r["missing_count"]) for r in res.data],
+            [("Pancakes", 0), ("Cake", 1), ("Omelette", 1)],
+        )
+        self.assertEqual(
+            res.data[1]["missing_ingredients"],
+            [{"id": self.items["Sugar"].id, "name": "Sugar"}],
+        )
+
+    def test_max_missing(self):
+        """Test only complete recipes are listed with max_missing=0."""
+        params = {
+            "ingredients": self._pantry("Eggs", "Salt", "Sugar"),
+            "max_missing": 0,
+        }
+        res = self.client.get(COOKABLE_URL, params)
+
+        self.assertEqual(
+            [r["title"] for r in res.data], ["Omelette", "Syrup"])
+
+    def test_other_users_recipes_excluded(self):
+        """Test recipes of other users are not matched."""
+        other = create_user(email="other@example.com", password="test123")
+        create_recipe(user=other).ingredients.add(self.items["Salt"])
+
+        res = self.client.get(
+            COOKABLE_URL, {"ingredients": self._pantry("Salt")})
+
+        self.assertEqual([r["title"] for r in res.data], ["Omelette"])
+
+    def test_invalid_pantry(self):
+        """Test the pantry must be a list of ids."""
+        for params in ({}, {"ingredients": "eggs"}):
+            res = self.client.get(COOKABLE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
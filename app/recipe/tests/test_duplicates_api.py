@@ -0,0 +1,116 @@
+"""
+Tests for duplicate recipe detection and the duplicates API.
+"""
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, RecipeBand
+from recipe.duplicates import BANDS, band_keys, features
+from recipe.tests.test_recipe_api import (
+    RECIPES_URL, create_recipe, create_user)
+
+INGREDIENTS = ["Chicken", "Onion", "Garlic", "Curry paste", "Coconut milk"]
+
+
+def duplicates_url(recipe_id):
+    return reverse("recipe:recipe-duplicates", args=[recipe_id])
+
+
+def curry(user, title="Chicken Curry", names=INGREDIENTS):
+    recipe = create_recipe(user=user, title=title)
+    recipe.ingredients.add(*[
+        Ingredient.objects.get_or_create(user=user, name=name)[0]
+        for name in names
+    ])
+    return recipe
+
+
+class DuplicateSignatureTests(TestCase):
+    """Test features and band keys of recipes."""
+
+    def test_normalized_features(self):
+        """Test case, punctuation and spacing don't change the features."""
+        self.assertEqual(
+            features("Chicken  curry!", ["Coconut  Milk"]),
+            features("chicken Curry", ["coconut milk"]),
+        )
+
+    def test_band_keys(self):
+        """Test equal features give equal keys, different ones differ."""
+        keys = band_keys(features("Chicken Curry", INGREDIENTS))
+
+        self.assertEqual(len(keys), BANDS)
+        self.assertEqual(keys, band_keys(features("chicken curry", [
+            name.lower() for name in INGREDIENTS])))
+        self.assertFalse(set(keys) & set(band_keys(
+            features("Lemon Tart", ["Lemon", "Butter", "Flour"]))))
+        self.assertEqual(band_keys(features("", [])), [])
+
+
+class PrivateDuplicatesApiTests(TestCase):
+    """Test duplicates of the authenticated user's recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+
+    def test_bands_follow_changes(self):
+        """Test the bands are recomputed when title or ingredients change."""
+        recipe = curry(self.user)
+        expected = band_keys(features("Chicken Curry", INGREDIENTS))
+        self.assertEqual(
+            list(recipe.bands.order_by("band").values_list("key", flat=True)),
+            expected,
+        )
+
+        Ingredient.objects.get(name="Onion").delete()
+        recipe.refresh_from_db()
+        recipe.title = "Thai Curry"
+        recipe.save()
+
+        self.assertEqual(
+            list(recipe.bands.order_by("band").values_list("key", flat=True)),
+            band_keys(features(
+                "Thai Curry", INGREDIENTS[:1] + INGREDIENTS[2:])),
+        )
+        recipe.delete()
+        self.assertFalse(RecipeBand.objects.exists())
+
+    def test_duplicates(self):
+        """Test near-duplicates are listed, other recipes not."""
+        recipe = curry(self.user)
+        near = curry(self.user, title="Chicken curry", names=INGREDIENTS[:4])
+        curry(self.user, title="Lemon Tart", names=["Lemon", "Butter"])
+        other = create_user(email="other@example.com", password="test123")
+        curry(other)
+
+        res = self.client.get(duplicates_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data], [near.id])
+        self.assertAlmostEqual(res.data[0]["similarity"], 6 / 7)
+
+    def test_create_skip_duplicates(self):
+        """Test an import returns the existing duplicate, not a new one."""
+        recipe = curry(self.user)
+        payload = {
+            "title": "Chicken curry",
+            "time_minutes": 30,
+            "price": "5.50",
+            "ingredients": [{"name": name} for name in INGREDIENTS],
+        }
+
+        res = self.client.post(
+            f"{RECIPES_URL}?skip_duplicates=true", payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["id"], recipe.id)
+
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(res.data["id"], recipe.id)
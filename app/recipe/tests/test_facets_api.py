@@ -0,0 +1,92 @@
+"""
+Tests for the recipe facets API.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Tag
+from recipe.tests.test_recipe_api import create_recipe, create_user
+
+FACETS_URL = reverse("recipe:recipe-facets")
+
+
+class PrivateFacetsApiTests(TestCase):
+    """Test facet counts for the authenticated user."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = Tag.objects.create(user=self.user, name="Quick")
+        self.tofu = Ingredient.objects.create(user=self.user, name="Tofu")
+        r1 = create_recipe(
+            user=self.user, price=Decimal("3.00"), time_minutes=10)
+        r1.tags.add(self.vegan, self.quick)
+        r1.ingredients.add(self.tofu)
+        r2 = create_recipe(
+            user=self.user, price=Decimal("12.50"), time_minutes=45)
+        r2.tags.add(self.vegan)
+        create_recipe(user=self.user, price=Decimal("60.00"), time_minutes=200)
+
+        other = create_user(email="other@example.com", password="test123")
+        create_recipe(user=other).tags.add(
+            Tag.objects.create(user=other, name="Vegan"))
+
+    def test_facets(self):
+        """Test counts per tag, ingredient and range of the user's recipes."""
+        with self.assertNumQueries(3):
+            res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 3)
+        self.assertEqual(
+            [(tag["name"], tag["count"]) for tag in res.data["tags"]],
+            [("Vegan", 2), ("Quick", 1)],
+        )
+        self.assertEqual(
+            res.data["ingredients"],
+            [{"id": self.tofu.id, "name": "Tofu", "count": 1}],
+        )
+        self.assertEqual(
+            [bucket["count"] for bucket in res.data["price"]], [1, 0, 1, 0, 1])
+        self.assertEqual(res.data["price"][-1], {
+            "min": 50, "max": None, "count": 1})
+        self.assertEqual(
+            [bucket["count"] for bucket in res.data["time_minutes"]],
+            [1, 0, 1, 0, 1],
+        )
+
+    def test_facets_filtered(self):
+        """Test facets apply the same filters as the recipe list."""
+        res = self.client.get(FACETS_URL, {"tags": f"{self.quick.id}"})
+
+        self.assertEqual(res.data["count"], 1)
+        self.assertEqual(
+            [(tag["name"], tag["count"]) for tag in res.data["tags"]],
+            [("Quick", 1), ("Vegan", 1)],
+        )
+
+    def test_facets_cached_until_change(self):
+        """Test cached facets are served until the user's recipes change."""
+        self.client.get(FACETS_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(FACETS_URL)
+
+        create_recipe(user=self.user).tags.add(self.quick)
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.data["count"], 4)
+        self.assertEqual(
+            [(tag["name"], tag["count"]) for tag in res.data["tags"]],
+            [("Quick", 2), ("Vegan", 2)],
+        )
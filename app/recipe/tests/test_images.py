@@ -0,0 +1,47 @@
+"""
+Tests for recipe image helpers.
+"""
+import io
+
+from PIL import Image
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+
+from recipe.images import encode_placeholder, image_metadata
+
+
+def create_image_file(size=(40, 20), color=(255, 0, 0), fmt="PNG"):
+    """Create and return an uploaded image file."""
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=fmt)
+    return SimpleUploadedFile(f"image.{fmt.lower()}", buffer.getvalue())
+
+
+class ImageMetadataTests(SimpleTestCase):
+    """Test computing image metadata."""
+
+    def test_image_metadata(self):
+        """Test metadata is extracted from an image file."""
+        image_file = create_image_file(size=(40, 20))
+
+        metadata = image_metadata(image_file)
+
+        self.assertEqual(metadata["image_width"], 40)
+        self.assertEqual(metadata["image_height"], 20)
+        self.assertEqual(metadata["image_size"], image_file.size)
+        self.assertEqual(metadata["image_color"], "#ff0000")
+        self.assertEqual(len(metadata["image_placeholder"]), 28)
+        # file is rewound so it can still be saved
+        self.assertEqual(image_file.tell(), 0)
+
+    def test_placeholder_encodes_average_color(self):
+        """Test placeholder carries component count and average colour."""
+        img = Image.new("RGB", (8, 8), (255, 255, 255))
+
+        placeholder = encode_placeholder(img)
+
+        # first character encodes the 4x3 components
+        self.assertEqual(placeholder[0], "L")
+        # characters 2-5 encode the average (white) colour
+        self.assertEqual(placeholder[2:6], "TSUA")
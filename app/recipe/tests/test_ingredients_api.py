@@ -146,3 +146,36 @@ class PrivateIngredientsApiTests(TestCase):
         res = self.client.get(INGREDIENT_URL, {"assigned_only": 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_ingredients_recipe_count(self):
+        """Test listing ingredients with the number of recipes using them."""
+        ing = create_ingredient(user=self.user, name="Eggs")
+        create_ingredient(user=self.user, name="Lentils")
+        Recipe.objects.create(
+            title="Eggs Benedict",
+            time_minutes=60,
+            price=Decimal("7.00"),
+            user=self.user,
+        ).ingredients.add(ing)
+
+        res = self.client.get(INGREDIENT_URL, {"recipe_count": 1})
+
+        self.assertEqual(
+            [(item["name"], item["recipe_count"]) for item in res.data],
+            [("Eggs", 1), ("Lentils", 0)],
+        )
+        # not annotated outside of the list
+        self.assertNotIn("recipe_count", IngredientSerializer(ing).data)
+
+    def test_ingredients_autocomplete(self):
+        """Test autocomplete of the user's ingredient names."""
+        create_ingredient(user=self.user, name="Tomato")
+        create_ingredient(user=self.user, name="Tomatillo")
+        create_ingredient(user=self.user, name="Potato")
+        create_ingredient(user=create_user(email="other@example.com"))
+
+        url = reverse("recipe:ingredient-autocomplete")
+        res = self.client.get(url, {"q": "tom"})
+
+        self.assertEqual(
+            [item["name"] for item in res.data], ["Tomatillo", "Tomato"])
@@ -0,0 +1,81 @@
+"""
+Tests for the tag and ingredient arrays denormalized on recipes.
+"""
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.tests.test_recipe_api import create_recipe, create_user
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class LinkArraysTests(TestCase):
+    """Test the arrays follow the links."""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="test123")
+        self.recipe = create_recipe(user=self.user)
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = Tag.objects.create(user=self.user, name="Quick")
+
+    def _arrays(self):
+        return Recipe.objects.values_list("tag_ids", "tag_names").get(
+            id=self.recipe.id)
+
+    def test_links_changed(self):
+        """Test adding and removing links either way updates the arrays."""
+        # one add per tag, a single add links them in set order
+        self.recipe.tags.add(self.vegan)
+        self.recipe.tags.add(self.quick)
+        self.assertEqual(self.recipe.tag_names, ["Vegan", "Quick"])
+
+        self.recipe.tags.remove(self.vegan)
+        self.assertEqual(self._arrays(), ([self.quick.id], ["Quick"]))
+
+        self.vegan.recipe_set.add(self.recipe)
+        self.assertEqual(self._arrays()[1], ["Quick", "Vegan"])
+
+        self.quick.recipe_set.clear()
+        self.assertEqual(self._arrays(), ([self.vegan.id], ["Vegan"]))
+
+    def test_item_renamed_or_deleted(self):
+        """Test renaming or deleting a tag updates its recipes."""
+        self.recipe.tags.add(self.vegan)
+        self.recipe.tags.add(self.quick)
+
+        self.vegan.name = "Plant based"
+        self.vegan.save()
+        self.assertEqual(self._arrays()[1], ["Plant based", "Quick"])
+
+        self.quick.delete()
+        self.assertEqual(self._arrays(), ([self.vegan.id], ["Plant based"]))
+
+    def test_stale_instance_save(self):
+        """Test saving an instance loaded earlier keeps the arrays."""
+        stale = Recipe.objects.get(id=self.recipe.id)
+        self.recipe.tags.add(self.vegan)
+
+        stale.title = "New title"
+        stale.save()
+
+        self.assertEqual(self._arrays()[1], ["Vegan"])
+
+    def test_list_without_link_queries(self):
+        """Test listing recipes doesn't query their tags and ingredients."""
+        salt = Ingredient.objects.create(user=self.user, name="Salt")
+        for _ in range(3):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(self.vegan)
+            recipe.ingredients.add(salt)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.assertNumQueries(1):
+            res = client.get(RECIPES_URL, {"tags": f"{self.vegan.id}"})
+
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual(
+            res.data[0]["ingredients"], [{"id": salt.id, "name": "Salt"}])
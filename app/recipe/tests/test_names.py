@@ -0,0 +1,105 @@
+"""
+Tests for unique tag and ingredient names and merging duplicates.
+"""
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeFeature, Tag, UserStat
+from recipe.names import merge_duplicates, upsert
+from recipe.tests.test_recipe_api import (
+    create_recipe, create_user, detail_url)
+
+
+class UpsertTests(TestCase):
+    """Test getting or creating items by name in one statement."""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="test123")
+
+    def test_upsert(self):
+        """Test existing names are reused whatever the case, others created."""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        other = create_user(email="other@example.com", password="test123")
+        Tag.objects.create(user=other, name="Quick")
+
+        with self.assertNumQueries(1):
+            ids = upsert(
+                Tag, self.user.id, ["vegan", "Quick", "QUICK", "Vegan"],
+                "default")
+
+        quick = Tag.objects.get(user=self.user, name="Quick")
+        self.assertEqual(ids, [vegan.id, quick.id, quick.id, vegan.id])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        vegan.refresh_from_db()
+        self.assertEqual(vegan.name, "Vegan")
+
+    def test_recipe_tags_case_insensitive(self):
+        """Test a recipe payload reuses tags spelled in another case."""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        recipe = create_recipe(user=self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        client.patch(
+            detail_url(recipe.id),
+            {"tags": [{"name": "VEGAN"}, {"name": "vegan"}]},
+            format="json",
+        )
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [vegan.id])
+        self.assertEqual(recipe.tag_names, ["Vegan"])
+
+
+class MergeDuplicatesTests(TestCase):
+    """Test merging items created before names were unique."""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="test123")
+        # duplicates can only exist without the constraints, restored when
+        # the test transaction rolls back
+        with connection.schema_editor() as editor:
+            for model in (Tag, Ingredient):
+                editor.remove_constraint(model, model._meta.constraints[0])
+
+    def test_merge_tags(self):
+        """Test links move to the oldest tag and the others are deleted."""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        lower = Tag.objects.create(user=self.user, name="vegan")
+        upper = Tag.objects.create(user=self.user, name="VEGAN")
+        both = create_recipe(user=self.user)
+        both.tags.add(vegan, lower)
+        moved = create_recipe(user=self.user)
+        moved.tags.add(upper)
+
+        self.assertEqual(merge_duplicates(Tag, "default"), 2)
+
+        self.assertEqual(list(Tag.objects.all()), [vegan])
+        links = Recipe.tags.through.objects.values_list("recipe_id", "tag_id")
+        self.assertEqual(
+            set(links), {(both.id, vegan.id), (moved.id, vegan.id)})
+        moved.refresh_from_db()
+        self.assertEqual(moved.tag_names, ["Vegan"])
+        self.assertEqual(
+            set(RecipeFeature.objects.values_list("recipe_id", "feature_id")),
+            {(both.id, vegan.id), (moved.id, vegan.id)},
+        )
+        self.assertEqual(
+            UserStat.objects.get(user=self.user, name=f"tag_{vegan.id}").value,
+            2,
+        )
+        self.assertEqual(merge_duplicates(Tag, "default"), 0)
+
+    def test_merge_ingredients_per_user(self):
+        """Test only names of the same user are merged."""
+        salt = Ingredient.objects.create(user=self.user, name="Salt")
+        Ingredient.objects.create(user=self.user, name="salt")
+        other = create_user(email="other@example.com", password="test123")
+        Ingredient.objects.create(user=other, name="salt")
+
+        self.assertEqual(merge_duplicates(Ingredient, "default"), 1)
+
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).get(), salt)
+        self.assertTrue(Ingredient.objects.filter(user=other).exists())
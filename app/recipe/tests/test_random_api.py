@@ -0,0 +1,136 @@
+"""
+Tests for the random recipes API.
+"""
+import random
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe import sampling
+from recipe.sampling import sample
+from recipe.tests.test_recipe_api import create_recipe, create_user
+
+RANDOM_URL = reverse("recipe:recipe-random")
+
+
+class PublicRandomApiTests(TestCase):
+    """Test unauthenticated requests."""
+
+    def test_auth_required(self):
+        """Test authentication is required for random recipes."""
+        res = APIClient().get(RANDOM_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRandomApiTests(TestCase):
+    """Test random recipes of the authenticated user."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            create_recipe(user=self.user, title=f"Recipe {index}")
+            for index in range(10)
+        ]
+
+    def test_random_recipe(self):
+        """Test one recipe of the user is returned by default."""
+        other = create_user(email="other@example.com", password="test123")
+        create_recipe(user=other)
+
+        res = self.client.get(RANDOM_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertIn(res.data[0]["id"], [r.id for r in self.recipes])
+
+    def test_distinct_recipes(self):
+        """Test count recipes are returned, none twice."""
+        res = self.client.get(RANDOM_URL, {"count": 5})
+
+        ids = [r["id"] for r in res.data]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_fewer_recipes_than_count(self):
+        """Test every recipe is returned when fewer match than count."""
+        res = self.client.get(RANDOM_URL, {"count": 20})
+
+        self.assertCountEqual(
+            [r["id"] for r in res.data], [r.id for r in self.recipes])
+
+    def test_filters(self):
+        """Test only recipes matching the filters are sampled."""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.recipes[3].tags.add(tag)
+        self.recipes[7].tags.add(tag)
+        Recipe.objects.filter(id=self.recipes[7].id).update(
+            price=Decimal("50.00"))
+
+        res = self.client.get(
+            RANDOM_URL, {"tags": tag.id, "max_price": "10", "count": 3})
+
+        self.assertEqual([r["id"] for r in res.data], [self.recipes[3].id])
+
+    def test_no_recipes(self):
+        """Test no recipe matching gives an empty list."""
+        res = self.client.get(RANDOM_URL, {"tags": 0})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_invalid_count(self):
+        """Test count is validated."""
+        res = self.client.get(RANDOM_URL, {"count": 21})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sample_queries(self):
+        """Test the probes take one query after reading the id bounds."""
+        recipes = Recipe.objects.filter(user=self.user)
+
+        with self.assertNumQueries(2):
+            picked = sample(recipes, 1, rng=random.Random(1))
+
+        self.assertEqual(len(picked), 1)
+
+    def test_sample_spread(self):
+        """Test every recipe can be picked, not only the first stored."""
+        recipes = Recipe.objects.filter(user=self.user)
+        rng = random.Random(1)
+
+        seen = set()
+        for _ in range(50):
+            seen.update(recipe.id for recipe in sample(recipes, 3, rng=rng))
+
+        self.assertEqual(seen, {recipe.id for recipe in self.recipes})
+
+    def test_fallback_random(self):
+        """Test recipes missed by the probes are picked at random."""
+        matching = Recipe.objects.filter(
+            user=self.user, id__lte=self.recipes[4].id)
+
+        class ProbesPastMatches(random.Random):
+            """Probes land past the matching recipes, then random."""
+            probes = 2 * sampling.PROBES_PER_RECIPE
+
+            def randint(self, a, b):
+                self.probes -= 1
+                return b if self.probes >= 0 else super().randint(a, b)
+
+        seen = set()
+        for seed in range(30):
+            picked = sample(
+                matching, 2, within=Recipe.objects.filter(user=self.user),
+                rng=ProbesPastMatches(seed))
+            self.assertEqual(len(picked), 2)
+            seen.update(recipe.id for recipe in picked)
+
+        self.assertEqual(seen, {recipe.id for recipe in self.recipes[:5]})
@@ -2,17 +2,22 @@
 Tests for recipe APIs.
 """
 from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
 import tempfile
 import os
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
+from recipe.pagination import KeysetPagination
 from recipe.tests.test_ingredients_api import create_ingredient
 from recipe.tests.test_tags_api import create_tag
 
@@ -38,6 +43,11 @@ def image_upload_url(recipe_id):
     return reverse("recipe:recipe-upload-image", args=[recipe_id])
 
 
+def image_batch_upload_url():
+    """Return the batch image upload URL."""
+    return reverse("recipe:recipe-upload-images")
+
+
 def create_recipe(user, **params):
     """Create and return a sample recipe."""
     defaults = {
@@ -457,6 +467,98 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def test_filter_by_ranges(self):
+        """Test filtering recipes by price and time ranges."""
+        r1 = create_recipe(
+            user=self.user, price=Decimal("8.00"), time_minutes=20)
+        create_recipe(user=self.user, price=Decimal("12.00"), time_minutes=20)
+        create_recipe(user=self.user, price=Decimal("8.00"), time_minutes=45)
+
+        params = {"max_price": "10", "max_time_minutes": 30}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual([recipe["id"] for recipe in res.data], [r1.id])
+
+    def test_invalid_list_params(self):
+        """Test invalid ranges and ordering are rejected."""
+        for params in (
+            {"min_price": "abc"},
+            {"min_time_minutes": 30, "max_time_minutes": 10},
+            {"ordering": "title"},
+        ):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering(self):
+        """Test sorting recipes by price, ties broken by id."""
+        r1 = create_recipe(user=self.user, price=Decimal("9.00"))
+        r2 = create_recipe(user=self.user, price=Decimal("3.00"))
+        r3 = create_recipe(user=self.user, price=Decimal("9.00"))
+
+        res = self.client.get(RECIPES_URL, {"ordering": "price"})
+        self.assertEqual(
+            [recipe["id"] for recipe in res.data], [r2.id, r1.id, r3.id])
+
+        res = self.client.get(RECIPES_URL, {"ordering": "-price"})
+        self.assertEqual(
+            [recipe["id"] for recipe in res.data], [r3.id, r1.id, r2.id])
+
+    def test_keyset_pagination(self):
+        """Test paging through recipes sorted by a key with ties."""
+        prices = ["4.00", "1.00", "4.00", "2.00", "4.00", "3.00", "1.00"]
+        recipes = [
+            create_recipe(user=self.user, price=Decimal(price))
+            for price in prices
+        ]
+        expected = [
+            recipe.id
+            for recipe in sorted(recipes, key=lambda r: (r.price, r.id))
+        ]
+
+        ids = []
+        params = {"ordering": "price", "page_size": 3}
+        res = self.client.get(RECIPES_URL, params)
+        while True:
+            self.assertLessEqual(len(res.data["results"]), 3)
+            ids += [recipe["id"] for recipe in res.data["results"]]
+            if res.data["next"] is None:
+                break
+            res = self.client.get(res.data["next"])
+
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        """Test cursors of another ordering are rejected."""
+        create_recipe(user=self.user)
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL, {"page_size": 1})
+
+        query = urlparse(res.data["next"]).query
+        cursor = parse_qs(query)["cursor"][0]
+        self.assertEqual(
+            self.client.get(RECIPES_URL, {"page_size": 1, "cursor": cursor})
+            .status_code,
+            status.HTTP_200_OK,
+        )
+        params = {"ordering": "price", "page_size": 1, "cursor": cursor}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        """Test cursors with values of the wrong type are rejected."""
+        create_recipe(user=self.user)
+        pagination = KeysetPagination()
+        for values in (["abc", 1], [None, 1], [{"a": 1}, 1], ["1.00", []]):
+            cursor = pagination.encode_cursor(["price", "id"], values)
+            params = {"ordering": "price", "page_size": 1, "cursor": cursor}
+
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(res.data["detail"], "Invalid cursor.")
+
 
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
@@ -492,6 +594,30 @@ class ImageUploadTests(TestCase):
         self.assertIn("image", res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_stores_metadata(self):
+        """Test image metadata is stored on the recipe when uploading."""
+        url = image_upload_url(self.recipe.id)
+
+        with tempfile.NamedTemporaryFile(suffix=".png") as image_file:
+            img = Image.new("RGB", (30, 12), (0, 0, 255))
+            img.save(image_file, format="PNG")
+            size = image_file.tell()
+            image_file.seek(0)
+            payload = {"image": image_file}
+            res = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_width, 30)
+        self.assertEqual(self.recipe.image_height, 12)
+        self.assertEqual(self.recipe.image_size, size)
+        self.assertEqual(self.recipe.image_color, "#0000ff")
+        self.assertTrue(self.recipe.image_placeholder)
+        # list serializer exposes metadata without touching the file
+        serializer = RecipeSerializer(self.recipe)
+        self.assertEqual(serializer.data["image_width"], 30)
+        self.assertEqual(res.data["image_color"], "#0000ff")
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image."""
         url = image_upload_url(self.recipe.id)
@@ -499,3 +625,119 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format="multipart")
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_image_wrong_magic_bytes(self):
+        """Test uploading a file that is not an image is rejected."""
+        url = image_upload_url(self.recipe.id)
+        fake = SimpleUploadedFile("image.jpg", b"not really a jpeg file")
+        res = self.client.post(url, {"image": fake}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=50 * 50)
+    def test_upload_image_too_many_pixels(self):
+        """Test images declaring huge dimensions are rejected."""
+        url = image_upload_url(self.recipe.id)
+
+        with tempfile.NamedTemporaryFile(suffix=".png") as image_file:
+            img = Image.new("RGB", (100, 100))
+            img.save(image_file, format="PNG")
+            image_file.seek(0)
+            payload = {"image": image_file}
+            res = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["image"][0].code, "too_large")
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_image_too_large(self):
+        """Test uploads larger than the configured size are rejected."""
+        url = image_upload_url(self.recipe.id)
+
+        with tempfile.NamedTemporaryFile(suffix=".png") as image_file:
+            img = Image.effect_noise((64, 64), 100).convert("RGB")
+            img.save(image_file, format="PNG")
+            image_file.seek(0)
+            payload = {"image": image_file}
+            res = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_images_batch_too_large(self):
+        """Test an oversize file fails alone, later files are uploaded."""
+        recipe2 = create_recipe(user=self.user)
+        large = tempfile.NamedTemporaryFile(suffix=".png")
+        Image.effect_noise((64, 64), 100).convert("RGB").save(
+            large, format="PNG")
+        large.seek(0)
+        small = tempfile.NamedTemporaryFile(suffix=".png")
+        Image.new("RGB", (8, 8)).save(small, format="PNG")
+        small.seek(0)
+        payload = {str(self.recipe.id): large, str(recipe2.id): small}
+
+        res = self.client.post(
+            image_batch_upload_url(), payload, format="multipart")
+        large.close()
+        small.close()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = {item["id"]: item["status"] for item in res.data}
+        self.assertEqual(results, {
+            self.recipe.id: status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            recipe2.id: status.HTTP_200_OK,
+        })
+        self.recipe.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+        self.assertEqual(recipe2.image_width, 8)
+        recipe2.image.delete()
+
+    def test_upload_images_batch(self):
+        """Test uploading images to many recipes in one request."""
+        other_user = create_user(email="other@example.com", password="pw123")
+        recipe2 = create_recipe(user=self.user)
+        other_recipe = create_recipe(user=other_user)
+        files = []
+        for _ in range(3):
+            image_file = tempfile.NamedTemporaryFile(suffix=".png")
+            Image.new("RGB", (8, 8)).save(image_file, format="PNG")
+            image_file.seek(0)
+            files.append(image_file)
+        payload = {
+            str(self.recipe.id): files[0],
+            str(recipe2.id): files[1],
+            str(other_recipe.id): files[2],
+            "notanid": SimpleUploadedFile("a.png", b"x"),
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(
+                image_batch_upload_url(), payload, format="multipart")
+        for image_file in files:
+            image_file.close()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = {str(item["id"]): item for item in res.data}
+        self.assertEqual(results[str(self.recipe.id)]["status"], 200)
+        self.assertEqual(results[str(recipe2.id)]["status"], 200)
+        self.assertEqual(results[str(other_recipe.id)]["status"], 404)
+        self.assertEqual(results["notanid"]["status"], 400)
+        # single ownership query and a single UPDATE for the batch
+        sql = [query["sql"] for query in queries.captured_queries]
+        self.assertEqual(
+            len([q for q in sql if q.startswith('SELECT "core_recipe"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith("UPDATE")]), 1)
+
+        self.recipe.refresh_from_db()
+        recipe2.refresh_from_db()
+        other_recipe.refresh_from_db()
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(recipe2.image_width, 8)
+        self.assertFalse(other_recipe.image)
+        recipe2.image.delete()
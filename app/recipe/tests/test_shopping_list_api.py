@@ -0,0 +1,71 @@
+"""
+Tests for the shopping list API.
+"""
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient
+from recipe.tests.test_recipe_api import create_recipe, create_user
+
+SHOPPING_LIST_URL = reverse("recipe:recipe-shopping-list")
+
+
+class PrivateShoppingListApiTests(TestCase):
+    """Test shopping lists of the authenticated user's recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+
+        self.items = {
+            name: Ingredient.objects.create(user=self.user, name=name)
+            for name in ("Eggs", "Flour", "Milk")
+        }
+        self.pancakes = self._recipe("Eggs", "Flour", "Milk")
+        self.omelette = self._recipe("Eggs", "Milk")
+        self.bread = self._recipe("Flour")
+
+    def _recipe(self, *names):
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(*(self.items[name] for name in names))
+        return recipe
+
+    def _get(self, *recipes):
+        return self.client.get(SHOPPING_LIST_URL, {
+            "recipes": ",".join(str(recipe.id) for recipe in recipes),
+        })
+
+    def test_merged_ingredients(self):
+        """Test ingredients are listed once with their recipe counts."""
+        with self.assertNumQueries(1):
+            res = self._get(self.pancakes, self.omelette)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {"id": self.items["Eggs"].id, "name": "Eggs", "recipe_count": 2},
+            {"id": self.items["Flour"].id, "name": "Flour", "recipe_count": 1},
+            {"id": self.items["Milk"].id, "name": "Milk", "recipe_count": 2},
+        ])
+
+    def test_other_users_recipes_ignored(self):
+        """Test recipes of other users add nothing to the list."""
+        other = create_user(email="other@example.com", password="test123")
+        recipe = create_recipe(user=other)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=other, name="Caviar"))
+
+        res = self._get(self.bread, recipe)
+
+        self.assertEqual(
+            [item["name"] for item in res.data], ["Flour"])
+
+    def test_invalid_recipes(self):
+        """Test the recipes must be a list of ids."""
+        for params in ({}, {"recipes": "pancakes"}):
+            res = self.client.get(SHOPPING_LIST_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
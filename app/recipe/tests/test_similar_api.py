@@ -0,0 +1,148 @@
+"""
+Tests for the similar recipes API and the recipe feature index.
+"""
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, RecipeFeature, Tag
+from recipe.tests.test_recipe_api import create_recipe, create_user
+
+
+def similar_url(recipe_id):
+    """Create and return the similar recipes URL of a recipe."""
+    return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
+def indexed(recipe):
+    """Return the (kind, name) features indexed for recipe."""
+    names = {
+        RecipeFeature.TAG: dict(Tag.objects.values_list("id", "name")),
+        RecipeFeature.INGREDIENT: dict(
+            Ingredient.objects.values_list("id", "name")),
+    }
+    return {
+        (kind, names[kind][feature_id])
+        for kind, feature_id in recipe.features.values_list(
+            "kind", "feature_id")
+    }
+
+
+class RecipeFeatureIndexTests(TestCase):
+    """Test the feature index follows the recipe links."""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="test123")
+        self.recipe = create_recipe(user=self.user)
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.tofu = Ingredient.objects.create(user=self.user, name="Tofu")
+        self.rice = Ingredient.objects.create(user=self.user, name="Rice")
+
+    def test_add_and_remove(self):
+        """Test links added and removed either way are indexed."""
+        self.recipe.tags.add(self.vegan)
+        self.recipe.ingredients.add(self.tofu, self.rice)
+        self.assertEqual(indexed(self.recipe), {
+            ("t", "Vegan"), ("i", "Tofu"), ("i", "Rice")})
+
+        self.recipe.ingredients.remove(self.tofu)
+        self.rice.recipe_set.clear()
+        self.assertEqual(indexed(self.recipe), {("t", "Vegan")})
+
+        self.vegan.recipe_set.add(create_recipe(user=self.user))
+        self.recipe.tags.clear()
+        self.assertEqual(indexed(self.recipe), set())
+        self.assertEqual(RecipeFeature.objects.count(), 1)
+
+    def test_delete(self):
+        """Test deleting a tag or a recipe removes its features."""
+        self.recipe.tags.add(self.vegan)
+        self.recipe.ingredients.add(self.tofu)
+
+        self.vegan.delete()
+        self.assertEqual(indexed(self.recipe), {("i", "Tofu")})
+
+        self.recipe.delete()
+        self.assertFalse(RecipeFeature.objects.exists())
+
+
+class PrivateSimilarApiTests(TestCase):
+    """Test similar recipes of the authenticated user."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+
+        self.tags = {
+            name: Tag.objects.create(user=self.user, name=name)
+            for name in ("Vegan", "Quick")
+        }
+        self.items = {
+            name: Ingredient.objects.create(user=self.user, name=name)
+            for name in ("Tofu", "Rice", "Soy", "Flour")
+        }
+        self.bowl = self._recipe("Bowl", "Vegan", "Tofu", "Rice", "Soy")
+        self._recipe("Stir fry", "Vegan", "Tofu", "Soy")
+        self._recipe("Rice", "Quick", "Rice")
+        self._recipe("Bread", "Flour")
+
+    def _recipe(self, title, *names):
+        recipe = create_recipe(user=self.user, title=title)
+        recipe.tags.add(*(self.tags[n] for n in names if n in self.tags))
+        recipe.ingredients.add(
+            *(self.items[n] for n in names if n in self.items))
+        return recipe
+
+    def test_ranked_by_similarity(self):
+        """Test recipes sharing features are ranked by Jaccard index."""
+        res = self.client.get(similar_url(self.bowl.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r["title"], r["similarity"]) for r in res.data],
+            [("Stir fry", 0.75), ("Rice", 0.2)],
+        )
+
+    def test_limit(self):
+        """Test the number of recipes is limited."""
+        res = self.client.get(similar_url(self.bowl.id), {"limit": 1})
+
+        self.assertEqual([r["title"] for r in res.data], ["Stir fry"])
+
+    def test_other_users_recipes(self):
+        """Test other users' recipes are neither matched nor readable."""
+        other = create_user(email="other@example.com", password="test123")
+        recipe = create_recipe(user=other)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=other, name="Tofu"))
+
+        res = self.client.get(similar_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.get(similar_url(self.bowl.id))
+        self.assertEqual(len(res.data), 2)
+
+    def test_stale_feature_rows(self):
+        """Test features left by a deleted recipe are skipped."""
+        stale = create_recipe(user=self.user, title="Stale")
+        stale_id = stale.id
+        stale.delete()
+        RecipeFeature.objects.bulk_create(
+            RecipeFeature(
+                user=self.user,
+                kind=kind,
+                feature_id=feature_id,
+                recipe_id=stale_id,
+            )
+            for kind, feature_id in self.bowl.features.values_list(
+                "kind", "feature_id")
+        )
+
+        res = self.client.get(similar_url(self.bowl.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r["title"] for r in res.data], ["Stir fry", "Rice"])
@@ -3,6 +3,8 @@ Tests for the tags API.
 """
 
 from decimal import Decimal
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
@@ -10,9 +12,11 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from core.models import Tag, Recipe
 
+from recipe import autocomplete
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse("recipe:tag-list")
+AUTOCOMPLETE_URL = reverse("recipe:tag-autocomplete")
 
 
 def create_user(email="test@example.com", password="test123"):
@@ -92,6 +96,17 @@ class PrivateTagsApiTests(TestCase):
         self.assertEqual(tag.name, payload["name"])
         self.assertEqual(tag.user, self.user)
 
+    def test_update_tag_name_taken(self):
+        """Test renaming a tag to another tag's name, in any case, fails."""
+        create_tag(name="Vegan", user=self.user)
+        tag = create_tag(user=self.user)
+
+        res = self.client.patch(detail_url(tag.id), {"name": "vegan"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, "English")
+
     def test_delete_tag(self):
         """Test deleting a tag successful."""
         tag = create_tag(user=self.user)
@@ -144,3 +159,89 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_tags_recipe_count(self):
+        """Test listing tags with the number of recipes using them."""
+        tag1 = create_tag(user=self.user, name="Breakfast")
+        create_tag(user=self.user, name="Lunch")
+        for title in ("Pancakes", "Porridge"):
+            Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=Decimal("5.00"),
+                user=self.user,
+            ).tags.add(tag1)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                TAGS_URL, {"assigned_only": 1, "recipe_count": 1})
+
+        self.assertEqual(
+            res.data,
+            [{"id": tag1.id, "name": "Breakfast", "recipe_count": 2}],
+        )
+
+        res = self.client.get(TAGS_URL, {"recipe_count": 1})
+
+        self.assertEqual([tag["recipe_count"] for tag in res.data], [2, 0])
+
+
+@patch("recipe.autocomplete.trigram_available", return_value=False)
+class TagAutocompleteApiTests(TestCase):
+    """Test autocomplete of tag names."""
+
+    def setUp(self):
+        autocomplete.cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+        for name in ("Vegan", "vegetarian", "Breakfast", "Not vegan"):
+            create_tag(user=self.user, name=name)
+        create_tag(user=create_user(email="other@example.com"), name="Veg")
+
+    def _names(self, params):
+        res = self.client.get(AUTOCOMPLETE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [tag["name"] for tag in res.data]
+
+    def test_prefix_matches_first(self, _):
+        """Test case insensitive prefix matches come before others."""
+        self.assertEqual(
+            self._names({"q": "VEG"}), ["Vegan", "vegetarian", "Not vegan"])
+        self.assertEqual(self._names({"q": "veg", "limit": 1}), ["Vegan"])
+
+    def test_short_terms_prefix_only(self, _):
+        """Test terms too short for fuzzy matching only match prefixes."""
+        self.assertEqual(self._names({"q": "b"}), ["Breakfast"])
+        self.assertEqual(self._names({"q": "e"}), [])
+
+    def test_invalid_params(self, _):
+        """Test q is required and limit bounded."""
+        for params in ({}, {"q": "veg", "limit": 500}):
+            res = self.client.get(AUTOCOMPLETE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_until_change(self, _):
+        """Test repeated terms are served from memory until tags change."""
+        self._names({"q": "veg"})
+
+        with self.assertNumQueries(0):
+            self._names({"q": "veg"})
+
+        create_tag(user=self.user, name="Vegetables")
+        self.assertIn("Vegetables", self._names({"q": "veg"}))
+
+    def test_cache_expires(self, _):
+        """Test entries are searched again once their TTL passed."""
+        now = 1000.0
+        with patch("recipe.autocomplete.time.monotonic", lambda: now):
+            self._names({"q": "veg"})
+            # no signal, as if another worker's version bump didn't reach
+            Tag.objects.bulk_create([Tag(user=self.user, name="Vegetables")])
+
+            now += autocomplete.cache.ttl - 1
+            self.assertNotIn("Vegetables", self._names({"q": "veg"}))
+
+            now += 1
+            self.assertIn("Vegetables", self._names({"q": "veg"}))
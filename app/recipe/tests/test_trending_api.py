@@ -0,0 +1,137 @@
+"""
+Tests for recipe view counters and the trending recipes API.
+"""
+from unittest.mock import patch
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import RecipePopularity
+from recipe import popularity, signals
+from recipe.tests.test_recipe_api import create_recipe, create_user, detail_url
+
+TRENDING_URL = reverse("recipe:recipe-trending")
+HALF_LIFE = 3600
+
+
+@override_settings(
+    RECIPE_VIEWS_FLUSH_INTERVAL=3600, RECIPE_TRENDING_HALF_LIFE=HALF_LIFE)
+class PrivateTrendingApiTests(TestCase):
+    """Test trending recipes of the authenticated user."""
+
+    def setUp(self):
+        popularity.flush()
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+        self.soup = create_recipe(user=self.user, title="Soup")
+        self.salad = create_recipe(user=self.user, title="Salad")
+
+    def _view(self, recipe, times=1):
+        for _ in range(times):
+            self.client.get(detail_url(recipe.id))
+
+    def test_views_written_behind(self):
+        """Test views are counted in memory then written in one query."""
+        self._view(self.soup, 3)
+        self._view(self.salad)
+        self.assertFalse(RecipePopularity.objects.exists())
+
+        with self.assertNumQueries(1):
+            popularity.flush()
+
+        self.assertEqual(
+            dict(RecipePopularity.objects.values_list("recipe", "views")),
+            {self.soup.id: 3, self.salad.id: 1},
+        )
+
+    def test_flush_when_due(self):
+        """Test the counts are written after a request once due."""
+        with override_settings(RECIPE_VIEWS_FLUSH_INTERVAL=0):
+            self._view(self.soup)
+
+        self.assertEqual(RecipePopularity.objects.get().views, 1)
+
+    def test_flush_after_request(self):
+        """Test counting a view doesn't write, the request end does."""
+        with override_settings(RECIPE_VIEWS_FLUSH_INTERVAL=0):
+            with self.assertNumQueries(0):
+                popularity.record_view(self.soup)
+            self.assertFalse(RecipePopularity.objects.exists())
+
+            signals.flush_views(sender=None)
+
+        self.assertEqual(RecipePopularity.objects.get().views, 1)
+
+    def test_recent_views_weigh_more(self):
+        """Test trending ranks recent views above older ones."""
+        now = 1_000_000_000
+        with patch("recipe.popularity.time.time", return_value=now):
+            self._view(self.soup, 3)
+            popularity.flush()
+        # two half lives later the soup views count as 3 / 4
+        with patch("recipe.popularity.time.time",
+                   return_value=now + 2 * HALF_LIFE):
+            self._view(self.salad)
+            popularity.flush()
+            self._view(self.soup)
+            popularity.flush()
+
+            res = self.client.get(TRENDING_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r["title"], r["views"]) for r in res.data],
+            [("Soup", 4), ("Salad", 1)],
+        )
+        self.assertAlmostEqual(res.data[0]["decayed_views"], 1.75)
+        self.assertAlmostEqual(res.data[1]["decayed_views"], 1)
+
+    def test_deleted_and_other_users_recipes(self):
+        """Test deleted recipes are skipped and other users' not listed."""
+        other = create_user(email="other@example.com", password="test123")
+        popularity.record_view(create_recipe(user=other))
+        self._view(self.soup)
+        self._view(self.salad)
+        self.salad.delete()
+        popularity.flush()
+
+        res = self.client.get(TRENDING_URL)
+
+        self.assertEqual([r["title"] for r in res.data], ["Soup"])
+        self.assertEqual(RecipePopularity.objects.count(), 2)
+
+    def test_views_written_to_primary(self):
+        """Test views of recipes read from the replica go to the primary."""
+        self.soup._state.db = "replica"
+
+        popularity.record_view(self.soup)
+        popularity.flush()
+
+        self.assertEqual(RecipePopularity.objects.get().views, 1)
+
+    def test_failed_database_kept(self):
+        """Test only the counts of a failing database are kept."""
+        write = popularity._write
+
+        def fail_other(alias, rows):
+            if alias == "other":
+                raise DatabaseError("down")
+            write(alias, rows)
+
+        self._view(self.soup)
+        popularity._pending[("other", self.user.id, self.salad.id)] += 2
+        with patch("recipe.popularity._write", side_effect=fail_other):
+            with self.assertRaises(DatabaseError):
+                popularity.flush()
+
+        self.assertEqual(RecipePopularity.objects.get().views, 1)
+        self.assertEqual(
+            popularity._pending,
+            {("other", self.user.id, self.salad.id): 2},
+        )
+        popularity._pending.clear()
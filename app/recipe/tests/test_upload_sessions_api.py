@@ -0,0 +1,262 @@
+"""
+Tests for the chunked image upload session API.
+"""
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Job, Recipe, ImageUploadSession
+from recipe.tasks import expire_upload_session
+
+SESSIONS_URL = reverse("recipe:upload-session-list")
+SESSION_ROOT = tempfile.mkdtemp()
+
+
+def detail_url(session_id):
+    """Return upload session detail URL."""
+    return reverse("recipe:upload-session-detail", args=[session_id])
+
+
+def finalize_url(session_id):
+    """Return upload session finalize URL."""
+    return reverse("recipe:upload-session-finalize", args=[session_id])
+
+
+def create_recipe(user):
+    """Create and return a sample recipe."""
+    return Recipe.objects.create(
+        user=user,
+        title="Sample recipe",
+        time_minutes=10,
+        price=Decimal("2.50"),
+    )
+
+
+def create_image_bytes():
+    """Return the bytes of a sample PNG image."""
+    buffer = io.BytesIO()
+    Image.effect_noise((24, 24), 100).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@override_settings(
+    RECIPE_UPLOAD_CHUNK_SIZE=512,
+    RECIPE_UPLOAD_SESSION_ROOT=SESSION_ROOT,
+)
+class ImageUploadSessionApiTests(TestCase):
+    """Test chunked image uploads."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+        self.data = create_image_bytes()
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        self.recipe.image.delete()
+        shutil.rmtree(SESSION_ROOT, ignore_errors=True)
+
+    def _create_session(self):
+        payload = {
+            "recipe": self.recipe.id,
+            "filename": "image.png",
+            "size": len(self.data),
+        }
+        res = self.client.post(SESSIONS_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data
+
+    def _put_chunk(self, session_id, index):
+        start = index * 512
+        chunk = self.data[start:start + 512]
+        return self.client.put(
+            detail_url(session_id),
+            chunk,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=(
+                f"bytes {start}-{start + len(chunk) - 1}/{len(self.data)}"
+            ),
+        )
+
+    def test_create_session(self):
+        """Test creating a session lists every chunk as missing."""
+        session = self._create_session()
+
+        num_chunks = -(-len(self.data) // 512)
+        self.assertEqual(session["chunk_size"], 512)
+        self.assertEqual(session["missing_chunks"], list(range(num_chunks)))
+
+    def test_create_session_other_users_recipe(self):
+        """Test a session cannot target another user's recipe."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="test123",
+        )
+        payload = {
+            "recipe": create_recipe(other).id,
+            "filename": "image.png",
+            "size": len(self.data),
+        }
+        res = self.client.post(SESSIONS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resume_and_finalize(self):
+        """Test chunks can arrive in any order and be retried."""
+        session = self._create_session()
+        chunks = session["missing_chunks"]
+
+        # send every other chunk, then only what is reported missing
+        for index in chunks[::2]:
+            self.assertEqual(
+                self._put_chunk(session["id"], index).status_code,
+                status.HTTP_200_OK,
+            )
+        res = self.client.get(detail_url(session["id"]))
+        self.assertEqual(res.data["missing_chunks"], chunks[1::2])
+
+        res = self.client.post(finalize_url(session["id"]))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for index in res.data["missing_chunks"]:
+            self._put_chunk(session["id"], index)
+        res = self.client.post(finalize_url(session["id"]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(self.recipe.image_size, len(self.data))
+        self.assertFalse(
+            ImageUploadSession.objects.filter(id=session["id"]).exists())
+        self.assertFalse(os.path.exists(
+            os.path.join(SESSION_ROOT, str(session["id"]))))
+
+    def test_put_misaligned_range(self):
+        """Test a range that does not match a chunk is rejected."""
+        session = self._create_session()
+        res = self.client.put(
+            detail_url(session["id"]),
+            b"x" * 10,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes 5-14/{len(self.data)}",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_put_chunk_over_body_limit(self):
+        """Test chunks are streamed, not bounded by the request body size."""
+        session = self._create_session()
+
+        res = self._put_chunk(session["id"], 0)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn(0, res.data["missing_chunks"])
+
+    def test_put_body_shorter_than_range(self):
+        """Test a body not matching the range length is rejected."""
+        session = self._create_session()
+        res = self.client.put(
+            detail_url(session["id"]),
+            b"x" * 100,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes 0-511/{len(self.data)}",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            os.listdir(os.path.join(SESSION_ROOT, str(session["id"]))), [])
+
+    def test_finalize_invalid_image(self):
+        """Test assembled data is validated as an image."""
+        self.data = b"x" * 1000
+        session = self._create_session()
+        for index in session["missing_chunks"]:
+            self._put_chunk(session["id"], index)
+
+        res = self.client.post(finalize_url(session["id"]))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def _session_dir(self, session_id):
+        return os.path.join(SESSION_ROOT, str(session_id))
+
+    def test_session_expires(self):
+        """Test a job deletes the unfinished session and its chunks."""
+        session = self._create_session()
+        self._put_chunk(session["id"], 0)
+
+        job = Job.objects.get(name="expire_upload_session")
+        self.assertGreater(job.run_at, timezone.now() + timedelta(hours=23))
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_upload_session(**job.kwargs)
+
+        self.assertFalse(ImageUploadSession.objects.exists())
+        self.assertFalse(os.path.exists(self._session_dir(session["id"])))
+
+    def test_delete_session(self):
+        """Test deleting a session removes its chunks."""
+        session = self._create_session()
+        self._put_chunk(session["id"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(detail_url(session["id"]))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(self._session_dir(session["id"])))
+
+    def test_recipe_deleted(self):
+        """Test deleting the recipe removes the chunks of its sessions."""
+        session = self._create_session()
+        self._put_chunk(session["id"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(id=self.recipe.id).delete()
+            self.assertTrue(os.path.exists(self._session_dir(session["id"])))
+
+        self.assertFalse(os.path.exists(self._session_dir(session["id"])))
+        self.recipe = create_recipe(self.user)
+
+    def test_expire_command(self):
+        """Test the command deletes old sessions and orphaned chunks."""
+        old = self._create_session()
+        recent = self._create_session()
+        for session in (old, recent):
+            self._put_chunk(session["id"], 0)
+        ImageUploadSession.objects.filter(id=old["id"]).update(
+            created_at=timezone.now() - timedelta(days=2))
+        orphan = self._session_dir("orphan")
+        os.makedirs(orphan)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("expire_upload_sessions", stdout=io.StringIO())
+
+        self.assertEqual(
+            [str(session_id) for session_id in ImageUploadSession.objects
+             .values_list("id", flat=True)],
+            [recent["id"]],
+        )
+        self.assertFalse(os.path.exists(self._session_dir(old["id"])))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(self._session_dir(recent["id"])))
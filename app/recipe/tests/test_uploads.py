@@ -0,0 +1,106 @@
+"""
+Tests for recipe image upload handling.
+"""
+import io
+from unittest import skipUnless
+
+from PIL import Image
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile, StopUpload
+from django.test import SimpleTestCase
+
+from rest_framework.serializers import ValidationError
+
+from recipe.tests.test_images import create_image_file
+from recipe.uploads import (
+    BoundedTemporaryFileUploadHandler,
+    validate_image_file,
+)
+
+
+def mpo_writable():
+    """Return whether Pillow can write multi-picture JPEGs (9.3+)."""
+    Image.init()
+    return "MPO" in Image.SAVE
+
+
+class UploadHandlerTests(SimpleTestCase):
+    """Test the bounded upload handler."""
+
+    def test_skips_file_exceeding_max_size(self):
+        """Test a file is skipped once its data passes the limit."""
+        handler = BoundedTemporaryFileUploadHandler(
+            max_size=10, max_request_size=100)
+        handler.new_file("image", "image.png", "image/png", None)
+
+        handler.receive_data_chunk(b"x" * 8, 0)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b"x" * 8, 8)
+        self.assertEqual(handler.too_large, ["image"])
+
+        # the next file is still received
+        handler.new_file("other", "other.png", "image/png", None)
+        handler.receive_data_chunk(b"x" * 8, 0)
+        handler.file_complete(8).close()
+
+    def test_stops_when_request_exceeds_max_size(self):
+        """Test upload stops once the files of the request pass the limit."""
+        handler = BoundedTemporaryFileUploadHandler(
+            max_size=10, max_request_size=20)
+        for name in ("first", "second"):
+            handler.new_file(name, "image.png", "image/png", None)
+            handler.receive_data_chunk(b"x" * 8, 0)
+            handler.file_complete(8).close()
+
+        handler.new_file("third", "image.png", "image/png", None)
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b"x" * 8, 0)
+
+    def test_streams_to_temporary_file(self):
+        """Test uploaded data is written to disk, not kept in memory."""
+        handler = BoundedTemporaryFileUploadHandler(max_size=1024)
+        handler.new_file("image", "image.png", "image/png", None)
+
+        handler.receive_data_chunk(b"x" * 8, 0)
+        uploaded = handler.file_complete(8)
+
+        self.assertTrue(uploaded.temporary_file_path())
+        uploaded.close()
+
+
+class ValidateImageFileTests(SimpleTestCase):
+    """Test validating image headers."""
+
+    def test_valid_image(self):
+        """Test a valid image passes and is rewound."""
+        image_file = create_image_file(fmt="JPEG")
+
+        self.assertIs(validate_image_file(image_file), image_file)
+        self.assertEqual(image_file.tell(), 0)
+
+    def test_webp_image(self):
+        """Test WebP images are accepted."""
+        image_file = create_image_file(fmt="WEBP")
+
+        self.assertIs(validate_image_file(image_file), image_file)
+
+    @skipUnless(mpo_writable(), "Pillow can't write MPO")
+    def test_multi_picture_jpeg(self):
+        """Test JPEGs holding several pictures, opened as MPO, pass."""
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(
+            buffer, "MPO", save_all=True,
+            append_images=[Image.new("RGB", (4, 4))])
+        image_file = SimpleUploadedFile("photo.jpg", buffer.getvalue())
+
+        self.assertIs(validate_image_file(image_file), image_file)
+
+    def test_mismatched_format(self):
+        """Test a file whose content does not match its magic bytes."""
+        image_file = create_image_file(fmt="PNG")
+        image_file.file.seek(0)
+        image_file.file.write(b"\xff\xd8\xff")
+
+        with self.assertRaises(ValidationError):
+            validate_image_file(image_file)
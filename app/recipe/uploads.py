@@ -0,0 +1,273 @@
+"""
+Upload handling for recipe images.
+
+Images are streamed to a temporary file instead of memory and checked from
+their header (magic bytes, declared dimensions) before Pillow decodes them.
+Large images can also be sent in chunks through a resumable upload session.
+Sessions left unfinished expire after RECIPE_UPLOAD_SESSION_TTL seconds, a
+job queued with each session deletes it with its chunks.
+"""
+import os
+import re
+import shutil
+import tempfile
+import uuid
+import warnings
+from contextlib import contextmanager
+from datetime import timedelta
+
+from PIL import Image
+
+from django.conf import settings
+from django.utils import timezone
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import (
+    SkipFile,
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.utils.translation import gettext as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.serializers import ValidationError
+
+from core.models import ImageUploadSession
+
+# leading bytes of the accepted image formats, mapped to the Pillow formats
+# opening them: JPEGs holding several pictures (most phone cameras) open as
+# MPO
+IMAGE_SIGNATURES = [
+    (re.compile(rb"\xff\xd8\xff"), {"JPEG", "MPO"}),
+    (re.compile(rb"\x89PNG\r\n\x1a\n"), {"PNG"}),
+    (re.compile(rb"GIF8[79]a"), {"GIF"}),
+    (re.compile(rb"RIFF.{4}WEBP", re.DOTALL), {"WEBP"}),
+]
+
+
+class RequestEntityTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _("Upload is too large.")
+    default_code = "too_large"
+
+
+class BoundedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream each uploaded file to disk, skipping those over max size.
+
+    Memory use stays at one chunk per request whatever the upload size. The
+    field names of skipped files are listed in `too_large`, the other files
+    of the request are still parsed. Parsing stops once the files of the
+    request exceed max_request_size.
+    """
+
+    def __init__(self, request=None, max_size=None, max_request_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        self.max_request_size = max_request_size or self.max_size
+        self.received = 0
+        self.too_large = []
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_request_size:
+            self.file.close()
+            raise StopUpload(connection_reset=True)
+        if start + len(raw_data) > self.max_size:
+            # the parser reads past the rest of this file
+            self.file.close()
+            self.too_large.append(self.field_name)
+            raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
+
+
+def use_image_upload_handlers(request, max_request_size=None):
+    """Switch the request to bounded, disk backed upload handling.
+
+    Must be called before request data is accessed. Returns the handler,
+    listing the files skipped for their size once the data is parsed.
+    """
+    max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+    max_request_size = max_request_size or max_size
+    # reject early on the declared size, before reading the body
+    content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    if content_length > max_request_size:
+        raise RequestEntityTooLarge()
+
+    handler = BoundedTemporaryFileUploadHandler(
+        request._request, max_size, max_request_size)
+    # DRF request proxies upload handlers of the wrapped django request
+    request._request.upload_handlers = [handler]
+    return handler
+
+
+def validate_image_file(image_file):
+    """Validate an uploaded image from its header, without decoding it."""
+    image_file.seek(0)
+    header = image_file.read(16)
+    image_file.seek(0)
+    expected = next(
+        (
+            formats for magic, formats in IMAGE_SIGNATURES
+            if magic.match(header)
+        ),
+        None,
+    )
+    if expected is None:
+        raise ValidationError(_("Unsupported image type."), code="invalid")
+
+    max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+    try:
+        with warnings.catch_warnings():
+            # pillow warns below its own bomb limit, treat it as an error
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            # open only parses the header, pixel data is not decoded
+            with Image.open(image_file) as img:
+                fmt = img.format
+                width, height = img.size
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ValidationError(_("Image dimensions are too large."),
+                              code="too_large")
+    except Exception:
+        raise ValidationError(_("Invalid image file."), code="invalid")
+    finally:
+        image_file.seek(0)
+
+    if fmt not in expected:
+        raise ValidationError(_("Invalid image file."), code="invalid")
+    if width * height > max_pixels:
+        raise ValidationError(_("Image dimensions are too large."),
+                              code="too_large")
+
+    return image_file
+
+
+# Chunked upload sessions
+# Each received chunk is stored as its own file, so a retried chunk simply
+# replaces the previous attempt and missing chunks are found by listing.
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+# bytes of a chunk read from the request at a time
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+def session_dir(session):
+    return os.path.join(settings.RECIPE_UPLOAD_SESSION_ROOT, str(session.id))
+
+
+def _chunk_path(session, index):
+    return os.path.join(session_dir(session), f"{index}.part")
+
+
+def parse_content_range(session, header):
+    """Return the chunk index addressed by a Content-Range header."""
+    match = CONTENT_RANGE_RE.match(header or "")
+    if not match:
+        raise ValidationError(
+            {"content_range": _("Expected 'bytes start-end/size'.")})
+    start, end, size = (int(value) for value in match.groups())
+    index, offset = divmod(start, session.chunk_size)
+    if (
+        size != session.size
+        or offset
+        or index >= session.num_chunks
+        or end - start + 1 != session.chunk_length(index)
+    ):
+        raise ValidationError(
+            {"content_range": _("Range does not match a chunk boundary.")})
+
+    return index
+
+
+def write_chunk(session, index, stream):
+    """Store one chunk read from stream, replacing an earlier attempt.
+
+    The chunk is copied to disk a buffer at a time, it may be larger than
+    DATA_UPLOAD_MAX_MEMORY_SIZE, which bounds request.body.
+    """
+    length = session.chunk_length(index)
+    path = _chunk_path(session, index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write aside then rename, a chunk file is either complete or absent
+    tmp_path = f"{path}.{uuid.uuid4().hex}"
+    received = 0
+    try:
+        with open(tmp_path, "wb") as chunk_file:
+            # one byte past the chunk tells a longer body apart
+            while stream is not None and received <= length:
+                data = stream.read(
+                    min(COPY_BUFFER_SIZE, length + 1 - received))
+                if not data:
+                    break
+                chunk_file.write(data)
+                received += len(data)
+        if received != length:
+            raise ValidationError(
+                {"content_range": _("Body length does not match the range.")})
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def missing_chunks(session):
+    """Return the indexes of chunks not yet received."""
+    try:
+        names = set(os.listdir(session_dir(session)))
+    except FileNotFoundError:
+        names = set()
+    return [
+        index for index in range(session.num_chunks)
+        if f"{index}.part" not in names
+    ]
+
+
+@contextmanager
+def assemble_chunks(session):
+    """Yield the received chunks joined into a single uploaded file."""
+    root = settings.RECIPE_UPLOAD_SESSION_ROOT
+    os.makedirs(root, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=root, suffix=".upload") as tmp:
+        for index in range(session.num_chunks):
+            with open(_chunk_path(session, index), "rb") as chunk_file:
+                shutil.copyfileobj(chunk_file, tmp)
+        tmp.flush()
+        tmp.seek(0)
+        yield UploadedFile(
+            file=tmp,
+            name=session.filename,
+            size=session.size,
+        )
+
+
+def discard_chunks(session):
+    """Remove the stored chunks of a session."""
+    shutil.rmtree(session_dir(session), ignore_errors=True)
+
+
+def expire_sessions(using, ttl=None):
+    """Delete the sessions on `using` older than ttl seconds.
+
+    Their chunks are removed by the post_delete handler of the sessions.
+    Returns the number of sessions deleted.
+    """
+    ttl = settings.RECIPE_UPLOAD_SESSION_TTL if ttl is None else ttl
+    expired = ImageUploadSession.objects.using(using).filter(
+        created_at__lt=timezone.now() - timedelta(seconds=ttl))
+    return expired.delete()[0]
+
+
+def discard_orphan_chunks(session_ids):
+    """Remove the chunk directories of sessions not in session_ids."""
+    root = settings.RECIPE_UPLOAD_SESSION_ROOT
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0
+    live = {str(session_id) for session_id in session_ids}
+    orphans = [
+        entry.path for entry in entries
+        if entry.is_dir() and entry.name not in live
+    ]
+    for path in orphans:
+        shutil.rmtree(path, ignore_errors=True)
+    return len(orphans)
@@ -14,6 +14,11 @@ router = DefaultRouter()
 router.register("recipes", views.RecipeViewSet)
 router.register("tags", views.TagViewSet)
 router.register("ingredients", views.IngredientViewSet)
+router.register(
+    "upload-sessions",
+    views.ImageUploadSessionViewSet,
+    basename="upload-session",
+)
 
 app_name = "recipe"
 
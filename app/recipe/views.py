@@ -6,37 +6,112 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.utils.translation import gettext as _
+
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Recipe, Tag, Ingredient
-from . import serializers
+from core import sharding
+from core.jobs import enqueue
+from core.models import Recipe, Tag, Ingredient, ImageUploadSession
+from . import (
+    autocomplete, bulk, pantry, popularity, sampling, serializers, uploads)
+from .duplicates import find_duplicates
+from .similar import similar_recipes
+from .cache import versioned_key
+from .facets import recipe_facets
+from .images import attach_image
+from .pagination import KeysetPagination
+from .tasks import expire_upload_session
+
+
+class UserShardMixin:
+    """Route queries of the request to the authenticated user's shard."""
+
+    _shard_token = None
+
+    def initial(self, request, *args, **kwargs):
+        # authentication happens in initial, the user is known afterwards
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            self._shard_token = sharding.activate(
+                sharding.shard_for_user(request.user))
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # also when the view raises, the shard mustn't leak into the
+            # next request of the thread
+            if self._shard_token is not None:
+                sharding.deactivate(self._shard_token)
+                self._shard_token = None
+
+
+def not_found(item_id, message):
+    """Return the outcome of a bulk operation for an id not owned."""
+    return {
+        "id": item_id,
+        "status": status.HTTP_404_NOT_FOUND,
+        "errors": {"id": [message]},
+    }
+
+
+# OpenApiParameter to provide details of the params acceptable
+# to API request
+RECIPE_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        "tags",
+        OpenApiTypes.STR,
+        description="Comma separated list of tag IDs to filter",
+    ),
+    OpenApiParameter(
+        "ingredients",
+        OpenApiTypes.STR,
+        description="Comma separated list of ingredient IDs to filter",
+    ),
+    OpenApiParameter("min_price", OpenApiTypes.DECIMAL),
+    OpenApiParameter("max_price", OpenApiTypes.DECIMAL),
+    OpenApiParameter("min_time_minutes", OpenApiTypes.INT),
+    OpenApiParameter("max_time_minutes", OpenApiTypes.INT),
+]
 
 
 # extend_schema_view to extend schema generated by drf-spectacular
 @extend_schema_view(
     # extend for list endpoint
     list=extend_schema(
-        parameters=[
-            # OpenApiParameter to provide details of the params acceptable
-            # to API request
+        parameters=RECIPE_FILTER_PARAMETERS + [
             OpenApiParameter(
-                "tags",
+                "ordering",
                 OpenApiTypes.STR,
-                description="Comma separated list of tag IDs to filter",
+                enum=list(serializers.RecipeFilterSerializer.ORDERINGS),
+                description="Sort key, descending with '-' (default -id).",
             ),
+        ]
+    ),
+    facets=extend_schema(parameters=RECIPE_FILTER_PARAMETERS),
+    random=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS + [
             OpenApiParameter(
-                "ingredients",
-                OpenApiTypes.STR,
-                description="Comma separated list of ingredient IDs to filter",
+                "count",
+                OpenApiTypes.INT,
+                description="Number of recipes (default 1, max 20).",
             ),
         ]
-    )
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(UserShardMixin, viewsets.ModelViewSet):
     """View from manage recipe APIs"""
 
     # All request methods requires 'RecipeDetailSerializer' except list
@@ -44,37 +119,68 @@ class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     authentication_classes = [TokenAuthentication]  # allow log-in by token
     permission_classes = [IsAuthenticated]  # checks if logged-in
+    pagination_class = KeysetPagination
 
     def _params_to_ints(self, qs):
         """Convert list of strings to integers."""
         return [int(str_id) for str_id in qs.split(",")]
 
+    def _list_params(self):
+        """Return validated range filters and ordering of the request."""
+        params = serializers.RecipeFilterSerializer(
+            data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
     def get_queryset(self):
         """Retrieve only recipes for authenticated user."""
         tags = self.request.query_params.get("tags")
         ingredients = self.request.query_params.get("ingredients")
         queryset = self.queryset
+        if self.action in ("list", "facets", "random"):
+            params = self._list_params()
+            # backed by the (user, price/time_minutes, id) indexes
+            for field in ("price", "time_minutes"):
+                if f"min_{field}" in params:
+                    queryset = queryset.filter(
+                        **{f"{field}__gte": params[f"min_{field}"]})
+                if f"max_{field}" in params:
+                    queryset = queryset.filter(
+                        **{f"{field}__lte": params[f"max_{field}"]})
+            ordering = serializers.RecipeFilterSerializer.ORDERINGS[
+                params["ordering"]]
+        else:
+            ordering = ("-id",)
         # check if tags are passed, if true filter on tags
+        # recipes with any of the ids in their link arrays (GIN indexed),
+        # no join to de-duplicate
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.filter(tag_ids__overlap=tag_ids)
 
         # check if ingredients are passed, if true filter on ingredients
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = queryset.filter(ingredient_ids__overlap=ingredient_ids)
 
-        return queryset.filter(
-            user=self.request.user).order_by("-id").distinct()
+        return queryset.filter(user=self.request.user).order_by(*ordering)
 
     # Set serializer_class depending on request
     # https://www.django-rest-framework.org/api-guide/generic-views/#get_serializer_classself # noqa
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action in ("list", "random", "bulk_update"):
             return serializers.RecipeSerializer
-        elif self.action == "upload_image":
+        elif self.action in ("upload_image", "upload_images"):
             # here action is custom action
             return serializers.RecipeImageSerializer
+        elif self.action == "facets":
+            return serializers.RecipeFacetsSerializer
+        elif self.action == "cookable":
+            return serializers.CookableRecipeSerializer
+        elif self.action in ("similar", "duplicates"):
+            return serializers.SimilarRecipeSerializer
+        elif self.action == "trending":
+            return serializers.TrendingRecipeSerializer
         return self.serializer_class
 
     # overrides object creation to save model in viewset
@@ -84,16 +190,330 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # On authenticated user save new object after validating data
         serializer.save(user=self.request.user)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "skip_duplicates",
+                OpenApiTypes.BOOL,
+                description=(
+                    "Return an existing near-duplicate recipe (200) "
+                    "instead of creating the recipe."
+                ),
+            ),
+        ]
+    )
+    def create(self, request, *args, **kwargs):
+        """Create a recipe, or find a duplicate of it for imports."""
+        params = serializers.CreateParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if params.validated_data["skip_duplicates"]:
+            found = find_duplicates(
+                request.user,
+                serializer.validated_data["title"],
+                [
+                    ingredient["name"]
+                    for ingredient in serializer.validated_data.get(
+                        "ingredients", [])
+                ],
+                limit=1,
+            )
+            if found:
+                return Response(self.get_serializer(found[0]).data)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a recipe, counting the view for trending recipes."""
+        recipe = self.get_object()
+        popularity.record_view(recipe)
+        return Response(self.get_serializer(recipe).data)
+
+    @action(methods=["GET"], detail=False)
+    def facets(self, request):
+        """Count filtered recipes per tag, ingredient, price and time."""
+        # the same filters in another order share a cache entry
+        params = [
+            sorted(self._params_to_ints(value)) if value else []
+            for value in (
+                request.query_params.get("tags"),
+                request.query_params.get("ingredients"),
+            )
+        ]
+        filters = sorted(
+            f"{name}={value}"
+            for name, value in self._list_params().items()
+            if name != "ordering"
+        )
+        key = versioned_key("facets", request.user.id, *params, *filters)
+        data = cache.get(key)
+        if data is None:
+            facets = recipe_facets(self.get_queryset())
+            data = self.get_serializer(facets).data
+            cache.set(key, data, settings.RECIPE_FACETS_CACHE_TIMEOUT)
+        return Response(data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ingredients",
+                OpenApiTypes.STR,
+                required=True,
+                description="Comma separated list of ingredient IDs at hand",
+            ),
+            OpenApiParameter(
+                "max_missing",
+                OpenApiTypes.INT,
+                description="Ingredients a recipe may miss (default 1).",
+            ),
+            OpenApiParameter("limit", OpenApiTypes.INT),
+        ]
+    )
+    @action(methods=["GET"], detail=False)
+    def cookable(self, request):
+        """List recipes cookable with the ingredients, complete ones first."""
+        params = serializers.CookableParamsSerializer(
+            data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ingredient_ids = params.validated_data["ingredients"]
+
+        recipes = pantry.cookable(
+            Recipe.objects.filter(user=request.user),
+            ingredient_ids,
+            params.validated_data["max_missing"],
+            params.validated_data["limit"],
+        )
+        serializer = self.get_serializer(
+            recipes,
+            many=True,
+            context={
+                **self.get_serializer_context(),
+                "pantry": ingredient_ids,
+            },
+        )
+        return Response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Maximum number of recipes (default 10).",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=True)
+    def similar(self, request, pk=None):
+        """List the recipes sharing the most tags and ingredients."""
+        params = serializers.LimitParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        recipes = similar_recipes(
+            self.get_object(), params.validated_data["limit"])
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Maximum number of recipes (default 10).",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=True)
+    def duplicates(self, request, pk=None):
+        """List near-duplicates of the recipe by title and ingredients."""
+        params = serializers.LimitParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        recipe = self.get_object()
+        recipes = find_duplicates(
+            request.user,
+            recipe.title,
+            recipe.ingredient_names,
+            exclude=recipe.id,
+            limit=params.validated_data["limit"],
+        )
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "recipes",
+                OpenApiTypes.STR,
+                required=True,
+                description="Comma separated list of recipe IDs (max 100)",
+            ),
+        ],
+        responses=serializers.IngredientSerializer(many=True),
+    )
+    @action(methods=["GET"], detail=False, url_path="shopping-list")
+    def shopping_list(self, request):
+        """List the ingredients of the recipes with the recipes using each."""
+        params = serializers.ShoppingListParamsSerializer(
+            data=request.query_params)
+        params.is_valid(raise_exception=True)
+        # one query grouped by ingredient over the links of the user's
+        # recipes, ids of other users' recipes match nothing
+        items = (
+            Ingredient.objects.filter(
+                recipe__id__in=params.validated_data["recipes"],
+                recipe__user=request.user,
+            )
+            .values("id", "name")
+            .annotate(recipe_count=Count("recipe"))
+            .order_by("name", "id")
+        )
+        return Response(
+            serializers.IngredientSerializer(items, many=True).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Maximum number of recipes (default 10).",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False)
+    def trending(self, request):
+        """List the most viewed recipes, recent views weighing more."""
+        params = serializers.LimitParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        recipes = popularity.trending(
+            request.user, params.validated_data["limit"])
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @action(methods=["GET"], detail=False)
+    def random(self, request):
+        """List random recipes matching the filters."""
+        params = serializers.SampleParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        recipes = sampling.sample(
+            self.get_queryset(),
+            params.validated_data["count"],
+            within=Recipe.objects.filter(user=request.user),
+        )
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @extend_schema(request=serializers.BulkRecipeUpdateSerializer)
+    @action(methods=["PATCH"], detail=False, url_path="bulk")
+    def bulk_update(self, request):
+        """Change fields and tags/ingredients of many recipes at once."""
+        params = serializers.BulkRecipeUpdateSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        updated = bulk.update_recipes(
+            request.user,
+            data["ids"],
+            data.get("changes", {}),
+            data,
+            sharding.shard_for_user(request.user),
+        )
+        recipes = Recipe.objects.filter(user=request.user).in_bulk(updated)
+        results = []
+        for recipe_id in dict.fromkeys(data["ids"]):
+            if recipe_id in recipes:
+                results.append({
+                    "id": recipe_id,
+                    "status": status.HTTP_200_OK,
+                    **self.get_serializer(recipes[recipe_id]).data,
+                })
+            else:
+                results.append(not_found(recipe_id, _("Recipe not found.")))
+        return Response(results)
+
+    @extend_schema(request=serializers.BulkIdsSerializer)
+    @bulk_update.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete many recipes at once."""
+        params = serializers.BulkIdsSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        ids = params.validated_data["ids"]
+        deleted = set(bulk.delete_recipes(
+            request.user, ids, sharding.shard_for_user(request.user)))
+        return Response([
+            {"id": recipe_id, "status": status.HTTP_204_NO_CONTENT}
+            if recipe_id in deleted
+            else not_found(recipe_id, _("Recipe not found."))
+            for recipe_id in dict.fromkeys(ids)
+        ])
+
     @action(methods=["POST"], detail=True, url_path="upload-image")
     # custom accepts only post and only of detail type.
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
+        handler = uploads.use_image_upload_handlers(request)
         serializer = self.get_serializer(recipe, data=request.data)
+        if handler.too_large:
+            raise uploads.RequestEntityTooLarge()
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=["POST"], detail=False, url_path="upload-images")
+    def upload_images(self, request):
+        """Upload images for many recipes, keyed by recipe id."""
+        handler = uploads.use_image_upload_handlers(
+            request, settings.RECIPE_IMAGE_BATCH_MAX_UPLOAD_SIZE)
+        files = {}
+        results = []
+        for key, image in request.FILES.items():
+            try:
+                files[int(key)] = image
+            except ValueError:
+                results.append({
+                    "id": key,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": {"id": ["Invalid recipe id."]},
+                })
+        # skipped by the upload handler, the other files are still parsed
+        for key in handler.too_large:
+            results.append({
+                "id": int(key) if key.isdigit() else key,
+                "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                "errors": {
+                    "image": [uploads.RequestEntityTooLarge.default_detail],
+                },
+            })
+
+        # one query checks ownership of every recipe in the batch
+        recipes = Recipe.objects.filter(user=request.user, id__in=files)
+        recipes = {recipe.id: recipe for recipe in recipes}
+        updated = []
+        for recipe_id, image in files.items():
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                results.append({
+                    "id": recipe_id,
+                    "status": status.HTTP_404_NOT_FOUND,
+                    "errors": {"id": ["Recipe not found."]},
+                })
+                continue
+            serializer = self.get_serializer(recipe, data={"image": image})
+            if not serializer.is_valid():
+                results.append({
+                    "id": recipe_id,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": serializer.errors,
+                })
+                continue
+            attach_image(recipe, serializer.validated_data["image"])
+            updated.append(recipe)
+
+        Recipe.objects.bulk_update(
+            updated, ["image"] + serializers.IMAGE_METADATA_FIELDS)
+        for recipe in updated:
+            results.append({
+                "id": recipe.id,
+                "status": status.HTTP_200_OK,
+                **self.get_serializer(recipe).data,
+            })
+
+        return Response(results, status=status.HTTP_200_OK)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -104,10 +524,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 enum=[0, 1],
                 description="Filter by items assigned to recipes.",
             ),
+            OpenApiParameter(
+                "recipe_count",
+                OpenApiTypes.INT,
+                enum=[0, 1],
+                description="Include the number of recipes using each item.",
+            ),
         ]
     )
 )
 class BaseRecipeAttrViewSet(
+    UserShardMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
@@ -117,19 +544,131 @@ class BaseRecipeAttrViewSet(
     authentication_classes = [TokenAuthentication]  # allow log-in by token
     permission_classes = [IsAuthenticated]  # checks if logged-in
 
+    # M2M through model linking recipes to items and its item field name,
+    # set by subclasses
+    recipe_links = None
+    link_field = None
+
     def get_queryset(self):
         """Retrieve only tags for authenticated user."""
         # parse assigned_only to bool depending on presence
         assigned_only = bool(
             int(self.request.query_params.get("assigned_only", 0)))
-        queryset = self.queryset
+        recipe_count = bool(
+            int(self.request.query_params.get("recipe_count", 0)))
+        queryset = self.queryset.filter(user=self.request.user)
+        # correlated subqueries on the links, one row per item without
+        # joining and de-duplicating every link
+        links = self.recipe_links.objects.filter(
+            **{self.link_field: OuterRef("pk")})
         if assigned_only:
             # filter values that has recipe assigned
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(Exists(links))
+        if recipe_count:
+            counts = (
+                links.order_by()
+                .values(self.link_field)
+                .annotate(count=Count("*"))
+                .values("count")
+            )
+            queryset = queryset.annotate(
+                recipe_count=Coalesce(Subquery(counts), 0))
+
+        return queryset.order_by("name")
 
-        return (
-            queryset.filter(user=self.request.user).order_by("name").distinct()
-        )  # distinct for unique values only
+    def perform_update(self, serializer):
+        # the (user, lower(name)) constraint rejects a rename to the name of
+        # another item
+        try:
+            with transaction.atomic(using=serializer.instance._state.db):
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {"name": [_("An item with this name already exists.")]})
+
+    @extend_schema(request=serializers.BulkItemUpdateSerializer)
+    @action(methods=["PATCH"], detail=False, url_path="bulk")
+    def bulk_update(self, request):
+        """Rename many items at once."""
+        params = serializers.BulkItemUpdateSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        renames = {
+            item["id"]: item["name"]
+            for item in params.validated_data["items"]
+        }
+        try:
+            renamed, taken = bulk.rename_items(
+                self.queryset.model,
+                request.user,
+                renames,
+                sharding.shard_for_user(request.user),
+            )
+        except IntegrityError:
+            raise ValidationError(
+                {"items": [_("An item with this name already exists.")]})
+        renamed = {item.id: item for item in renamed}
+        results = []
+        for item_id in renames:
+            if item_id in renamed:
+                results.append({
+                    "id": item_id,
+                    "status": status.HTTP_200_OK,
+                    **self.get_serializer(renamed[item_id]).data,
+                })
+            elif item_id in taken:
+                results.append({
+                    "id": item_id,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": {
+                        "name": [_("An item with this name already exists.")]
+                    },
+                })
+            else:
+                results.append(not_found(item_id, _("Item not found.")))
+        return Response(results)
+
+    @extend_schema(request=serializers.BulkIdsSerializer)
+    @bulk_update.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete many items at once, unlinking them from their recipes."""
+        params = serializers.BulkIdsSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        ids = params.validated_data["ids"]
+        deleted = set(bulk.delete_items(
+            self.queryset.model,
+            request.user,
+            ids,
+            sharding.shard_for_user(request.user),
+        ))
+        return Response([
+            {"id": item_id, "status": status.HTTP_204_NO_CONTENT}
+            if item_id in deleted
+            else not_found(item_id, _("Item not found."))
+            for item_id in dict.fromkeys(ids)
+        ])
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("q", OpenApiTypes.STR, required=True),
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Maximum number of names (default 10).",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="autocomplete")
+    def autocomplete(self, request):
+        """List names starting with, or else similar to, q."""
+        params = serializers.AutocompleteSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        matches = autocomplete.find_matches(
+            self.queryset.filter(user=request.user),
+            request.user.id,
+            params.validated_data["q"],
+            params.validated_data["limit"],
+        )
+        return Response(self.get_serializer(matches, many=True).data)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -137,6 +676,8 @@ class TagViewSet(BaseRecipeAttrViewSet):
 
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    recipe_links = Recipe.tags.through
+    link_field = "tag"
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -144,3 +685,84 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    recipe_links = Recipe.ingredients.through
+    link_field = "ingredient"
+
+
+class ImageUploadSessionViewSet(
+    UserShardMixin,
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Resumable recipe image uploads.
+
+    Create a session, PUT each chunk with a Content-Range header (retrying
+    only the chunks listed as missing) then finalize to attach the image.
+    """
+
+    serializer_class = serializers.ImageUploadSessionSerializer
+    queryset = ImageUploadSession.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Retrieve only upload sessions for authenticated user."""
+        return self.queryset.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        """Create a new upload session."""
+        session = serializer.save(
+            user=self.request.user,
+            chunk_size=settings.RECIPE_UPLOAD_CHUNK_SIZE,
+        )
+        enqueue(
+            expire_upload_session,
+            user=self.request.user,
+            delay=settings.RECIPE_UPLOAD_SESSION_TTL,
+            session_id=str(session.id),
+            using=session._state.db,
+        )
+
+    def update(self, request, *args, **kwargs):
+        """Store one chunk of the upload."""
+        session = self.get_object()
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        if content_length > session.chunk_size:
+            raise uploads.RequestEntityTooLarge()
+
+        index = uploads.parse_content_range(
+            session, request.META.get("HTTP_CONTENT_RANGE"))
+        # streamed, request.body is bounded by DATA_UPLOAD_MAX_MEMORY_SIZE
+        uploads.write_chunk(session, index, request.stream)
+
+        serializer = self.get_serializer(session)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=["POST"], detail=True)
+    def finalize(self, request, pk=None):
+        """Assemble the chunks and attach the image to the recipe."""
+        session = self.get_object()
+        missing = uploads.missing_chunks(session)
+        if missing:
+            return Response(
+                {"missing_chunks": missing},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with uploads.assemble_chunks(session) as image_file:
+            serializer = serializers.RecipeImageSerializer(
+                session.recipe, data={"image": image_file})
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic(using=session._state.db):
+                # lock the session so concurrent finalize calls attach once
+                locked = self.get_queryset().select_for_update().filter(
+                    pk=session.pk)
+                if not locked.exists():
+                    raise Http404
+                serializer.save()
+                locked.delete()
+
+        uploads.discard_chunks(session)
+        return Response(serializer.data, status=status.HTTP_200_OK)
@@ -9,6 +9,9 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from core.models import UserDeletion
+from recipe.serializers import FacetCountSerializer, FacetRangeSerializer
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object."""
@@ -63,3 +66,23 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs["user"] = user
         return attrs
+
+
+class UserDeletionSerializer(serializers.ModelSerializer):
+    """Serializer for the deletion of a user account."""
+
+    class Meta:
+        model = UserDeletion
+        fields = ["status", "progress", "requested_at"]
+        read_only_fields = fields
+
+    progress = serializers.FloatField(read_only=True)
+
+
+class UserStatsSerializer(serializers.Serializer):
+    """Serializer for the recipe statistics of a user."""
+
+    recipe_count = serializers.IntegerField()
+    average_time_minutes = serializers.FloatField(allow_null=True)
+    price = FacetRangeSerializer(many=True)
+    top_tags = FacetCountSerializer(many=True)
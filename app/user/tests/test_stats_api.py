@@ -0,0 +1,114 @@
+"""
+Tests for the user statistics API and their incremental maintenance.
+"""
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, UserStat
+from recipe.stats import rebuild
+from recipe.tests.test_recipe_api import create_recipe, create_user
+
+STATS_URL = reverse("user:stats")
+
+
+def counters(user):
+    """Return the non-zero counters of user."""
+    return dict(
+        UserStat.objects.filter(user=user)
+        .exclude(value=0)
+        .values_list("name", "value")
+    )
+
+
+class PublicUserStatsApiTests(TestCase):
+    """Test unauthenticated requests."""
+
+    def test_auth_required(self):
+        """Test authentication is required for statistics."""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateUserStatsApiTests(TestCase):
+    """Test statistics of the authenticated user."""
+
+    def setUp(self):
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = Tag.objects.create(user=self.user, name="Quick")
+
+    def test_stats(self):
+        """Test counts, average time, price ranges and top tags."""
+        create_recipe(
+            user=self.user, time_minutes=10, price=Decimal("3.00"),
+        ).tags.add(self.vegan, self.quick)
+        create_recipe(
+            user=self.user, time_minutes=30, price=Decimal("12.50"),
+        ).tags.add(self.vegan)
+        other = create_user(email="other@example.com", password="test123")
+        create_recipe(user=other)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["recipe_count"], 2)
+        self.assertEqual(res.data["average_time_minutes"], 20)
+        self.assertEqual(
+            [bucket["count"] for bucket in res.data["price"]],
+            [1, 0, 1, 0, 0],
+        )
+        self.assertEqual(res.data["top_tags"], [
+            {"id": self.vegan.id, "name": "Vegan", "count": 2},
+            {"id": self.quick.id, "name": "Quick", "count": 1},
+        ])
+
+    def test_no_recipes(self):
+        """Test statistics of a user without recipes."""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["recipe_count"], 0)
+        self.assertIsNone(res.data["average_time_minutes"])
+        self.assertEqual(res.data["top_tags"], [])
+
+    def test_incremental_matches_rebuild(self):
+        """Test counters maintained by signals equal recomputed ones."""
+        recipe = create_recipe(user=self.user, price=Decimal("8.00"))
+        recipe.tags.add(self.vegan, self.quick)
+        kept = create_recipe(user=self.user)
+        self.vegan.recipe_set.add(kept)
+
+        recipe.price = Decimal("60.00")
+        recipe.time_minutes = 90
+        recipe.save()
+        recipe.tags.remove(self.quick)
+        self.vegan.recipe_set.clear()
+        kept.tags.add(self.quick)
+        self.client.patch(
+            reverse("recipe:recipe-detail", args=[kept.id]),
+            {"tags": [{"name": "Vegan"}]},
+            format="json",
+        )
+        Recipe.objects.filter(id=recipe.id).delete()
+        incremental = counters(self.user)
+
+        rebuild(self.user, "default")
+
+        self.assertEqual(incremental, counters(self.user))
+        self.assertEqual(incremental["recipes"], 1)
+
+    def test_tag_deleted(self):
+        """Test a deleted tag leaves the top tags."""
+        create_recipe(user=self.user).tags.add(self.vegan)
+
+        self.vegan.delete()
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["top_tags"], [])
@@ -1,13 +1,20 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, authentication, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.purge import schedule_user_deletion
+from core.sharding import shard_for_user
+from recipe.stats import user_stats
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    UserDeletionSerializer,
+    UserStatsSerializer,
 )
 
 
@@ -26,7 +33,7 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user."""
 
     serializer_class = UserSerializer
@@ -37,3 +44,25 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """Retrieve and return the authenticated user."""
         return self.request.user
+
+    @extend_schema(responses={202: UserDeletionSerializer})
+    def delete(self, request, *args, **kwargs):
+        """Deactivate the user now and delete their data in background."""
+        deletion = schedule_user_deletion(self.get_object())
+        return Response(
+            UserDeletionSerializer(deletion).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class UserStatsView(generics.GenericAPIView):
+    """Recipe statistics of the authenticated user."""
+
+    serializer_class = UserStatsSerializer
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        """Return the counters maintained as the user's recipes change."""
+        stats = user_stats(request.user, shard_for_user(request.user))
+        return Response(self.get_serializer(stats).data)
@@ -5,6 +5,12 @@ server {
         alias /vol/static;
     }
 
+    location /api/recipe/recipes/upload-images/ {
+        uwsgi_pass              ${APP_HOST}:${APP_PORT};
+        include                 /etc/nginx/uwsgi_params;
+        client_max_body_size    100M;
+    }
+
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;
@@ -2,8 +2,11 @@
 
 set -e
 
+# also read by the startup checks, several workers need a shared cache
+export WEB_WORKERS="${WEB_WORKERS:-4}"
+
 python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+uwsgi --socket :9000 --workers "$WEB_WORKERS" --master --enable-threads --module app.wsgi